@@ -0,0 +1,313 @@
+"""
+Biblioteca JavaScript injetada nas páginas do SEI pelo motor Selenium.
+
+Cada clique, busca de elemento ou troca de frame feita pelo WebDriver é
+uma ida e volta até o navegador; numa VPN, dezenas delas por documento. A
+biblioteca expõe as ações da inclusão (localizar e clicar, escolher o
+tipo, preencher a data, marcar os radios) e executa uma sequência inteira
+de passos dentro do navegador, numa única chamada execute_async_script,
+que devolve o tempo de cada passo e, em caso de erro, qual deles não se
+completou.
+"""
+
+import logging
+
+
+VERSAO = 3
+
+# Intervalo, em segundos, entre as verificações feitas dentro do navegador.
+# Não custa idas e voltas, por isso é bem menor que o dos perfis de tempo.
+INTERVALO = 0.05
+
+# Nós da árvore do processo com documentos do tipo. Faz parte da biblioteca
+# e também é usada sozinha pela leitura da árvore em condicoes.py
+FUNCAO_LISTAR = r"""
+    function listar(doc, tipo) {
+        var nos = doc.querySelectorAll("a[id^='anchor']");
+        var lista = [];
+        for (var i = 0; i < nos.length; i++) {
+            var texto = (nos[i].textContent || '').trim();
+            if (texto.indexOf(tipo) === 0) {
+                lista.push({
+                    id: nos[i].id,
+                    texto: texto,
+                    titulo: nos[i].getAttribute('title') || ''
+                });
+            }
+        }
+        return lista;
+    }
+"""
+
+BIBLIOTECA = r"""
+(function (w) {
+    if (w.__autobot && w.__autobot.versao === %(versao)d) {
+        return;
+    }
+
+    // Documento do frame pelo nome, a partir da página atual. Enquanto o
+    // frame carrega retorna null: os scripts do SEI podem ainda não ter
+    // registrado os eventos dos campos.
+    function documento(frame) {
+        if (!frame) {
+            return document;
+        }
+        var el = document.getElementsByName(frame)[0] || document.getElementById(frame);
+        var doc = null;
+        try {
+            doc = el && el.contentDocument;
+        } catch (e) {
+            return null;
+        }
+        if (!doc || doc.readyState === 'loading' || doc.URL === 'about:blank') {
+            return null;
+        }
+        return doc;
+    }
+
+    function texto(el) {
+        return (el.textContent || '').trim();
+    }
+
+    function visivel(el) {
+        return !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length));
+    }
+
+    function disparar(el, tipo) {
+        var Evento = el.ownerDocument.defaultView.Event;
+        el.dispatchEvent(new Evento(tipo, {bubbles: true}));
+    }
+
+%(listar)s
+
+    // Cada ação recebe o documento e o passo. Retorna undefined enquanto a
+    // página não estiver pronta; qualquer outro valor conclui o passo.
+    var acoes = {
+        listar_documentos: function (doc, p) {
+            var lista = listar(doc, p.tipo);
+            return lista.length >= p.minimo ? lista : undefined;
+        },
+        clicar_link: function (doc, p) {
+            var links = doc.getElementsByTagName('a');
+            for (var i = 0; i < links.length; i++) {
+                var link = links[i];
+                if (link.href.indexOf(p.href) < 0) {
+                    continue;
+                }
+                if (p.imagem && !link.querySelector('img[src*="' + p.imagem + '"]')) {
+                    continue;
+                }
+                if (p.texto && texto(link) !== p.texto) {
+                    continue;
+                }
+                if (p.classe && link.className !== p.classe) {
+                    continue;
+                }
+                link.click();
+                return true;
+            }
+        },
+        aguardar_elementos: function (doc, p) {
+            for (var i = 0; i < p.ids.length; i++) {
+                var el = doc.getElementById(p.ids[i]);
+                if (!el || el.disabled) {
+                    return;
+                }
+            }
+            return true;
+        },
+        selecionar: function (doc, p) {
+            var select = doc.getElementById(p.id);
+            if (!select) {
+                return;
+            }
+            for (var i = 0; i < select.options.length; i++) {
+                if (texto(select.options[i]) === p.texto) {
+                    if (select.selectedIndex !== i) {
+                        select.selectedIndex = i;
+                        disparar(select, 'change');
+                    }
+                    return true;
+                }
+            }
+        },
+        preencher: function (doc, p) {
+            var campo = doc.getElementById(p.id);
+            if (!campo) {
+                return;
+            }
+            if (campo.value !== p.valor) {
+                campo.value = p.valor;
+                disparar(campo, 'input');
+                disparar(campo, 'change');
+            }
+            return campo.value === p.valor ? true : undefined;
+        },
+        marcar: function (doc, p) {
+            // Espera o contêiner ficar visível, como o clique do WebDriver
+            var div = doc.getElementById(p.div);
+            var opcao = doc.getElementById(p.id);
+            if (!visivel(div) || !opcao || opcao.disabled) {
+                return;
+            }
+            if (!opcao.checked) {
+                // O clique no radio também chega aos eventos do contêiner
+                opcao.click();
+            }
+            return opcao.checked ? true : undefined;
+        },
+        aguardar_texto: function (doc, p) {
+            var el = doc.getElementById(p.id);
+            return el && texto(el).indexOf(p.texto) >= 0 ? true : undefined;
+        },
+        clicar_botao: function (doc, p) {
+            var botoes = doc.querySelectorAll("button[type='submit']");
+            for (var i = 0; i < botoes.length; i++) {
+                if (texto(botoes[i]).indexOf(p.texto) >= 0 && !botoes[i].disabled) {
+                    botoes[i].click();
+                    return true;
+                }
+            }
+        }
+    };
+
+    // Executa os passos em ordem, cada um com seu limite de tempo, e chama
+    // pronto com {ok, indice, erro, carregada, tempos, valores}
+    function executar(passos, opcoes, pronto) {
+        var resultado = {
+            ok: true, indice: null, erro: null, carregada: false, tempos: {}, valores: {}
+        };
+        var indice = 0;
+        var inicio = performance.now();
+        var ultimoErro = null;
+
+        function medir(p, agora) {
+            if (p.nome) {
+                resultado.tempos[p.nome] = (resultado.tempos[p.nome] || 0) + (agora - inicio);
+            }
+        }
+
+        function seguir() {
+            while (indice < passos.length) {
+                var p = passos[indice];
+                var acao = acoes[p.acao];
+                var valor;
+                var doc = null;
+                if (!acao) {
+                    resultado.ok = false;
+                    resultado.indice = indice;
+                    resultado.erro = 'ação desconhecida: ' + p.acao;
+                    pronto(resultado);
+                    return;
+                }
+                try {
+                    doc = documento(p.frame);
+                    valor = doc ? acao(doc, p) : undefined;
+                } catch (e) {
+                    // A página pode ter sido trocada no meio da verificação
+                    ultimoErro = String(e);
+                    valor = undefined;
+                }
+                var agora = performance.now();
+                if (valor === undefined) {
+                    if (agora - inicio > p.limite) {
+                        medir(p, agora);
+                        resultado.ok = false;
+                        resultado.indice = indice;
+                        resultado.erro = ultimoErro;
+                        // O documento do passo estava carregado e a ação
+                        // não se completou nele
+                        resultado.carregada = !!doc && ultimoErro === null;
+                        pronto(resultado);
+                        return;
+                    }
+                    setTimeout(seguir, opcoes.intervalo);
+                    return;
+                }
+                medir(p, agora);
+                if (p.chave) {
+                    resultado.valores[p.chave] = valor;
+                }
+                indice++;
+                inicio = agora;
+                ultimoErro = null;
+            }
+            pronto(resultado);
+        }
+
+        seguir();
+    }
+
+    w.__autobot = {versao: %(versao)d, acoes: acoes, executar: executar};
+})(window);
+""" % {"versao": VERSAO, "listar": FUNCAO_LISTAR}
+
+# Usa a biblioteca da página; se ela não estiver lá (sem CDP), pede a injeção
+SCRIPT_EXECUTAR = """
+    var pronto = arguments[arguments.length - 1];
+    var autobot = window.__autobot;
+    if (!autobot || autobot.versao !== arguments[2]) {
+        pronto({instalar: true});
+        return;
+    }
+    autobot.executar(arguments[0], arguments[1], pronto);
+"""
+
+
+def passo(acao, limite, mensagem, nome=None, frame=None, chave=None, **parametros):
+    """
+    Um passo da sequência. `limite` é o tempo máximo (s) para a ação se
+    completar, `mensagem` o erro se ela não se completar, `nome` a etapa
+    em que o tempo é registrado e `chave` o nome do valor devolvido. Com
+    pagina_pronta=True, o passo é feito numa página já carregada: se ela
+    estiver lá e a ação não se completar, o elemento não existe.
+    """
+    return {
+        "acao": acao,
+        "limite": limite * 1000,
+        "mensagem": mensagem,
+        "nome": nome,
+        "frame": frame,
+        "chave": chave,
+        **parametros,
+    }
+
+
+def limite_total(passos):
+    """Tempo máximo (s) da sequência inteira, com folga para a chamada em si."""
+    return sum(p["limite"] for p in passos) / 1000 + 5
+
+
+def instalar(driver, logger=None):
+    """
+    Registra a biblioteca, pelo protocolo de depuração do Chrome, para ser
+    avaliada em toda página e frame novos. Sem isso ela é injetada pela
+    primeira chamada em cada página.
+    """
+    try:
+        driver.execute_cdp_cmd(
+            "Page.addScriptToEvaluateOnNewDocument", {"source": BIBLIOTECA}
+        )
+        return True
+    except Exception as e:
+        (logger or logging.getLogger(__name__)).debug(
+            f"Biblioteca de ações será injetada a cada página: {str(e)}"
+        )
+        return False
+
+
+def executar(driver, passos):
+    """
+    Executa os passos no contexto atual do driver (página ou frame) numa
+    única chamada. Retorna o dicionário do navegador, com os tempos em
+    segundos.
+    """
+    opcoes = {"intervalo": INTERVALO * 1000}
+    resultado = driver.execute_async_script(SCRIPT_EXECUTAR, passos, opcoes, VERSAO)
+    if resultado.get("instalar"):
+        driver.execute_script(BIBLIOTECA)
+        resultado = driver.execute_async_script(SCRIPT_EXECUTAR, passos, opcoes, VERSAO)
+    resultado["tempos"] = {
+        nome: duracao / 1000 for nome, duracao in resultado["tempos"].items()
+    }
+    return resultado
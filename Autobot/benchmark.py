@@ -0,0 +1,246 @@
+"""
+Mede a vazão da automação contra o servidor local que imita o SEI, sem
+acessar o sistema de produção. Para cada tamanho de lote são gerados PDFs
+sintéticos numa pasta temporária e o resultado mostra documentos por minuto
+e a latência de cada etapa.
+
+Uso:
+    python benchmark.py                       # lotes de 10, 100 e 1000 pelo motor HTTP
+    python benchmark.py --lotes 10 --motor selenium --latencia 80 --variacao 40
+    python benchmark.py --saida atual.json --referencia base.json
+
+Com --referencia, a execução termina com código 1 se a vazão de algum lote
+ficar abaixo da referência além da tolerância, para acusar regressões antes
+de uma versão nova.
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+from functools import partial
+
+import mock_sei
+from metricas import RegistroTempos
+from registro import iniciar_registro
+
+
+TAMANHOS_PADRAO = (10, 100, 1000)
+
+
+def pdf_sintetico(texto):
+    """PDF mínimo de uma página, válido, com o texto informado."""
+    conteudo = f"BT /F1 12 Tf 72 720 Td ({texto}) Tj ET".encode("latin-1")
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(conteudo), conteudo),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = bytearray(b"%PDF-1.4\n")
+    posicoes = []
+    for numero, objeto in enumerate(objetos, start=1):
+        posicoes.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (numero, objeto)
+    inicio_xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicao in posicoes:
+        pdf += b"%010d 00000 n \n" % posicao
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objetos) + 1,
+        inicio_xref,
+    )
+    return bytes(pdf)
+
+
+def gerar_lote(diretorio, quantidade, ano=2024, por_processo=1):
+    """
+    Cria quantidade PDFs distintos, por_processo arquivos para cada processo
+    (00001.2024.pdf, 00001.2024_2.pdf, ...).
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    for indice in range(1, quantidade + 1):
+        processo, ordem = divmod(indice - 1, por_processo)
+        sufixo = f"_{ordem + 1}" if ordem else ""
+        nome = f"{processo + 1:05d}.{ano}{sufixo}.pdf"
+        with open(os.path.join(diretorio, nome), "wb") as arquivo:
+            arquivo.write(pdf_sintetico(f"Comprovante sintetico {indice}"))
+
+
+def criar_fabrica(motor):
+    if motor == "http":
+        from http_handler import SEIHttpAutomation
+
+        return partial(SEIHttpAutomation, fallback_selenium=False)
+    from selenium_handler import SEIAutomation
+
+    return partial(SEIAutomation, headless=True)
+
+
+def executar_lote(quantidade, args, base):
+    """Roda um lote completo num servidor novo e retorna o resultado medido."""
+    pasta = os.path.join(base, f"lote_{quantidade}")
+    gerar_lote(pasta, quantidade, por_processo=args.por_processo)
+    estado = mock_sei.EstadoSEI(
+        latencia=args.latencia / 1000,
+        variacao=args.variacao / 1000,
+        taxa_erro=args.taxa_erro,
+        semente=args.semente,
+    )
+    servidor, url = mock_sei.iniciar_em_segundo_plano(estado=estado)
+    # Cada lote usa seu próprio servidor e seus próprios caches
+    os.environ["SEI_URL"] = url
+    os.environ["AUTOBOT_DADOS"] = os.path.join(pasta, "dados")
+
+    # Sem --logs as medidas ficam só em memória
+    metricas = RegistroTempos(diretorio=args.logs)
+    fabrica = criar_fabrica(args.motor)
+    try:
+        if args.navegadores > 1:
+            from pool import PoolNavegadores
+
+            pool = PoolNavegadores(
+                args.navegadores, fabrica=fabrica, diretorio_logs=os.path.join(pasta, "logs")
+            )
+            pool.metricas = metricas
+            resumo = pool.executar("benchmark", "benchmark", pasta)
+        else:
+            automacao = fabrica()
+            automacao.metricas = metricas
+            resumo = automacao.executar("benchmark", "benchmark", pasta)
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    etapas, _ = metricas.resumo()
+    metricas.finalizar()
+    return {
+        "arquivos": quantidade,
+        "sucessos": len(resumo.sucessos),
+        "falhas": len(resumo.falhas),
+        "erros_injetados": estado.erros_injetados,
+        "duracao": round(resumo.duracao, 2),
+        "documentos_por_minuto": round(resumo.documentos_por_minuto, 1),
+        "etapas": {
+            nome: {chave: round(valor, 4) for chave, valor in dados.items()}
+            for nome, dados in etapas.items()
+        },
+    }
+
+
+def texto_resultado(resultado):
+    linhas = [
+        f"Lote de {resultado['arquivos']} arquivo(s): "
+        f"{resultado['sucessos']} sucesso(s), {resultado['falhas']} falha(s), "
+        f"{resultado['erros_injetados']} erro(s) injetado(s), "
+        f"{resultado['duracao']:.1f}s, "
+        f"{resultado['documentos_por_minuto']:.1f} documentos/min",
+        f"  {'Etapa':<26}{'n':>6}{'p50':>9}{'p95':>9}{'max':>9}",
+    ]
+    etapas = sorted(resultado["etapas"].items(), key=lambda item: -item[1]["total"])
+    for nome, dados in etapas:
+        linhas.append(
+            f"  {nome:<26}{dados['n']:>6}"
+            f"{dados['p50'] * 1000:>7.0f}ms{dados['p95'] * 1000:>7.0f}ms"
+            f"{dados['max'] * 1000:>7.0f}ms"
+        )
+    return "\n".join(linhas)
+
+
+def comparar(resultados, referencia, tolerancia):
+    """Retorna as mensagens de regressão em relação à referência."""
+    anteriores = {r["arquivos"]: r for r in referencia.get("resultados", [])}
+    regressoes = []
+    for resultado in resultados:
+        anterior = anteriores.get(resultado["arquivos"])
+        if not anterior or not anterior["documentos_por_minuto"]:
+            continue
+        minimo = anterior["documentos_por_minuto"] * (1 - tolerancia)
+        if resultado["documentos_por_minuto"] < minimo:
+            regressoes.append(
+                f"Lote de {resultado['arquivos']}: "
+                f"{resultado['documentos_por_minuto']:.1f} documentos/min, "
+                f"abaixo de {anterior['documentos_por_minuto']:.1f} da referência"
+            )
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da automação contra o SEI local")
+    parser.add_argument(
+        "--lotes",
+        default=",".join(str(t) for t in TAMANHOS_PADRAO),
+        help="Tamanhos dos lotes, separados por vírgula (padrão: 10,100,1000)",
+    )
+    parser.add_argument("--motor", choices=("http", "selenium"), default="http")
+    parser.add_argument("--navegadores", type=int, default=1)
+    parser.add_argument(
+        "--por-processo", type=int, default=1, help="Arquivos por processo (padrão: 1)"
+    )
+    parser.add_argument("--latencia", type=float, default=0, help="Atraso do servidor, em ms")
+    parser.add_argument("--variacao", type=float, default=0, help="Variação do atraso, em ms")
+    parser.add_argument(
+        "--taxa-erro", type=float, default=0, help="Fração das requisições com erro (0 a 1)"
+    )
+    parser.add_argument("--semente", type=int, default=None)
+    parser.add_argument("--saida", help="Grava os resultados em JSON neste arquivo")
+    parser.add_argument("--referencia", help="JSON de uma execução anterior para comparar")
+    parser.add_argument(
+        "--tolerancia",
+        type=float,
+        default=0.2,
+        help="Queda aceitável de documentos/min em relação à referência (padrão: 0.2)",
+    )
+    parser.add_argument(
+        "--logs", help="Pasta para gravar também o JSONL de tempos de cada lote"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Mostra o log da automação"
+    )
+    args = parser.parse_args(argv)
+
+    iniciar_registro(
+        diretorio=None, nivel=logging.INFO if args.verbose else logging.CRITICAL
+    )
+    tamanhos = [int(t) for t in args.lotes.split(",") if t]
+
+    base = tempfile.mkdtemp(prefix="autobot_benchmark_")
+    resultados = []
+    try:
+        for quantidade in tamanhos:
+            resultado = executar_lote(quantidade, args, base)
+            resultados.append(resultado)
+            print(texto_resultado(resultado), flush=True)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    relatorio = {
+        "motor": args.motor,
+        "navegadores": args.navegadores,
+        "por_processo": args.por_processo,
+        "latencia_ms": args.latencia,
+        "variacao_ms": args.variacao,
+        "taxa_erro": args.taxa_erro,
+        "resultados": resultados,
+    }
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+
+    if args.referencia:
+        with open(args.referencia, encoding="utf-8") as arquivo:
+            regressoes = comparar(resultados, json.load(arquivo), args.tolerancia)
+        for mensagem in regressoes:
+            print(f"REGRESSÃO: {mensagem}")
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import threading
+
+
+class CacheProcessos:
+    """
+    Endereços das páginas de processo já abertas pela sessão do SEI, para
+    abrir o processo de novo sem passar pela pesquisa rápida (nova tentativa,
+    releitura da árvore, modo vigia, próxima execução com o motor aberto).
+
+    O cache fica só na memória e vale só para a sessão que o preencheu: o SEI
+    assina cada link com o infra_hash da sessão, então um endereço guardado
+    não abre o processo em outra. O id_procedimento é estável, mas também
+    não serve, porque o link montado com ele precisaria da assinatura, que
+    só o servidor calcula. Entre sessões a pesquisa rápida é inevitável.
+    """
+
+    def __init__(self):
+        self.sessao = None
+        self.enderecos = {}
+        self.acertos = 0
+        self.faltas = 0
+        self.lock = threading.Lock()
+
+    def _na_sessao(self, sessao):
+        # Chamado com o lock: outra sessão descarta os endereços da anterior
+        if sessao != self.sessao:
+            self.sessao = sessao
+            self.enderecos = {}
+
+    def obter(self, sessao, processo):
+        """Endereço do processo na sessão (a url_inicial dela), ou None."""
+        with self.lock:
+            self._na_sessao(sessao)
+            return self.enderecos.get(processo)
+
+    def gravar(self, sessao, processo, url):
+        with self.lock:
+            self._na_sessao(sessao)
+            self.enderecos[processo] = url
+
+    def invalidar(self, sessao, processo):
+        with self.lock:
+            if sessao == self.sessao:
+                self.enderecos.pop(processo, None)
+
+    def registrar_acerto(self):
+        self.acertos += 1
+
+    def registrar_falta(self):
+        self.faltas += 1
+
+    def zerar(self):
+        self.acertos = 0
+        self.faltas = 0
+
+    def contadores(self):
+        return {
+            "Cache de processos (acertos)": self.acertos,
+            "Cache de processos (faltas)": self.faltas,
+        }
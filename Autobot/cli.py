@@ -0,0 +1,265 @@
+"""
+Execução pela linha de comando, sem a interface gráfica, para tarefas
+agendadas e máquinas sem área de trabalho. Não carrega o PyQt5 e só importa
+o motor escolhido; o upload é sempre feito pelo campo do formulário, sem o
+PyAutoGUI.
+
+Uso:
+    python cli.py --diretorio C:/Lotes/hoje
+    python cli.py --diretorio /lotes --motor http --navegadores 3
+    python cli.py --diretorio /entrada --vigiar --senha-arquivo ~/.sei_senha
+    python cli.py --trabalho recibos.json --motor http
+
+O usuário vem de --usuario ou de SEI_USUARIO e a senha de --senha-arquivo
+ou de SEI_SENHA (as duas variáveis também são lidas do .env). Ctrl+C
+cancela depois do documento atual, como o botão Cancelar da interface.
+Com --trabalho, as contas, unidades e pastas vêm do arquivo do trabalho
+(veja escalonador.py) e --diretorio, --usuario e --navegadores não são
+usados.
+
+O log completo de cada execução fica em logs/autobot_AAAAMMDD_HHMMSS.jsonl
+(veja registro.py), mesmo com --silencioso.
+
+Códigos de saída: 0 quando todos os arquivos foram enviados, 1 quando algum
+falhou, foi rejeitado ou a execução foi interrompida, e 2 para erros nos
+argumentos.
+"""
+
+import time
+
+# Marcado antes dos demais imports para que o tempo de inicialização
+# inclua o carregamento dos módulos
+INICIO = time.perf_counter()
+
+import os
+import sys
+import signal
+import logging
+import argparse
+import multiprocessing
+from functools import partial
+
+from config import motor_padrao
+from lote import ControleExecucao
+from registro import FORMATO_CONSOLE, iniciar_registro
+
+
+def criar_fabrica(motor, headless=False, perfil=None, fallback_navegador=False):
+    """Importa só o motor escolhido e devolve a fábrica das sessões."""
+    from navegador import perfil_navegador
+
+    perfil = perfil_navegador(perfil) if perfil else None
+    if motor == "http":
+        from http_handler import SEIHttpAutomation
+
+        # O navegador só é aberto para as falhas se pedido por
+        # --fallback-navegador, com as mesmas opções do motor Selenium
+        return partial(
+            SEIHttpAutomation,
+            fallback_selenium=fallback_navegador,
+            headless=headless,
+            perfil=perfil,
+        )
+    from selenium_handler import SEIAutomation
+
+    return partial(SEIAutomation, headless=headless, perfil=perfil)
+
+
+def ler_senha(caminho=None):
+    """Senha do arquivo indicado (primeira linha) ou da variável SEI_SENHA."""
+    if caminho:
+        with open(os.path.expanduser(caminho), encoding="utf-8") as arquivo:
+            return arquivo.readline().rstrip("\r\n")
+    return os.getenv("SEI_SENHA")
+
+
+def cancelar_ao_interromper(controle, logger):
+    """Ctrl+C (ou SIGTERM) cancela após o documento atual; o segundo encerra já."""
+
+    def tratar(numero, quadro):
+        if controle.cancelado:
+            raise KeyboardInterrupt
+        logger.warning(
+            "Interrupção recebida: cancelando após o documento atual "
+            "(repita para encerrar imediatamente)"
+        )
+        controle.cancelar()
+
+    signal.signal(signal.SIGINT, tratar)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, tratar)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Inclui no SEI os PDFs de uma pasta, sem interface gráfica"
+    )
+    parser.add_argument("--diretorio", help="Pasta com os PDFs do lote")
+    parser.add_argument(
+        "--trabalho",
+        help="Arquivo JSON com contas, unidades e pastas, enviadas em paralelo",
+    )
+    parser.add_argument("--usuario", help="Usuário do SEI (padrão: SEI_USUARIO)")
+    parser.add_argument(
+        "--senha-arquivo", help="Arquivo cuja primeira linha é a senha (padrão: SEI_SENHA)"
+    )
+    parser.add_argument(
+        "--motor", choices=("selenium", "http"), help="Padrão: SEI_MOTOR ou selenium"
+    )
+    parser.add_argument(
+        "--navegadores", type=int, help="Sessões em paralelo (padrão: SEI_NAVEGADORES ou 1)"
+    )
+    parser.add_argument(
+        "--vigiar",
+        action="store_true",
+        help="Fica aguardando e envia os PDFs conforme chegam na pasta",
+    )
+    parser.add_argument(
+        "--perfil", help="Perfil do navegador: completo ou enxuto (padrão: SEI_PERFIL_NAVEGADOR)"
+    )
+    parser.add_argument(
+        "--fallback-navegador",
+        action="store_true",
+        help="Com o motor http, tenta de novo pelo navegador os arquivos que falharem",
+    )
+    parser.add_argument(
+        "--com-janela",
+        action="store_true",
+        help="Mostra o navegador (por padrão ele roda sem janela)",
+    )
+    parser.add_argument(
+        "--sem-diario", action="store_true", help="Não consulta nem grava o diário do lote"
+    )
+    parser.add_argument(
+        "--sem-validacao", action="store_true", help="Não valida os arquivos antes do login"
+    )
+    parser.add_argument(
+        "-q", "--silencioso", action="store_true", help="Mostra só avisos e erros"
+    )
+    args = parser.parse_args(argv)
+
+    # O arquivo da execução guarda tudo; o console respeita --silencioso
+    registro = iniciar_registro(console=False)
+    console = logging.StreamHandler()
+    console.setLevel(logging.WARNING if args.silencioso else logging.INFO)
+    console.setFormatter(logging.Formatter(FORMATO_CONSOLE))
+    registro.assinar(console)
+    logger = logging.getLogger("autobot")
+
+    try:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+    except ImportError:
+        pass
+
+    if args.trabalho:
+        if args.diretorio or args.vigiar:
+            parser.error("--trabalho não pode ser usado com --diretorio ou --vigiar")
+        from escalonador import carregar_trabalho
+
+        try:
+            trabalho = carregar_trabalho(args.trabalho)
+        except (OSError, ValueError) as e:
+            parser.error(f"trabalho inválido: {e}")
+    else:
+        if not args.diretorio:
+            parser.error("informe --diretorio ou --trabalho")
+        usuario = args.usuario or os.getenv("SEI_USUARIO")
+        try:
+            senha = ler_senha(args.senha_arquivo)
+        except OSError as e:
+            parser.error(f"não foi possível ler a senha: {e}")
+        if not usuario or not senha:
+            parser.error("informe o usuário e a senha (--usuario/SEI_USUARIO e --senha-arquivo/SEI_SENHA)")
+        diretorio = os.path.normpath(args.diretorio)
+        if not os.path.isdir(diretorio):
+            parser.error(f"pasta não encontrada: {diretorio}")
+
+    motor = args.motor or motor_padrao()
+    num_navegadores = args.navegadores or int(os.getenv("SEI_NAVEGADORES", "1"))
+    try:
+        fabrica = criar_fabrica(
+            motor,
+            headless=not args.com_janela,
+            perfil=args.perfil,
+            fallback_navegador=args.fallback_navegador,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    from metricas import RegistroTempos
+
+    controle = ControleExecucao()
+    cancelar_ao_interromper(controle, logger)
+    metricas = RegistroTempos()
+
+    # Até aqui nada de navegador: é o custo fixo de cada execução agendada
+    inicializacao = time.perf_counter() - INICIO
+    metricas.registrar("inicializacao", inicializacao, motor=motor)
+    logger.info(f"Inicialização em {inicializacao * 1000:.0f} ms (motor {motor})")
+
+    try:
+        if args.trabalho:
+            from escalonador import EscalonadorContas
+
+            escalonador = EscalonadorContas(
+                trabalho,
+                fabrica=fabrica,
+                usar_diario=not args.sem_diario,
+                controle=controle,
+                validar=not args.sem_validacao,
+            )
+            escalonador.metricas = metricas
+            resumo = escalonador.executar()
+        elif args.vigiar:
+            from vigia import VigiaPasta
+
+            automacao = fabrica()
+            automacao.metricas = metricas
+            vigia = VigiaPasta(
+                automacao,
+                diretorio,
+                usar_diario=not args.sem_diario,
+                controle=controle,
+                validar=not args.sem_validacao,
+            )
+            resumo = vigia.executar(usuario, senha)
+        elif num_navegadores > 1:
+            from pool import PoolNavegadores
+
+            pool = PoolNavegadores(
+                num_navegadores,
+                fabrica=fabrica,
+                usar_diario=not args.sem_diario,
+                controle=controle,
+                validar=not args.sem_validacao,
+            )
+            pool.metricas = metricas
+            resumo = pool.executar(usuario, senha, diretorio)
+        else:
+            automacao = fabrica()
+            automacao.metricas = metricas
+            automacao.controle = controle
+            automacao.usar_diario = not args.sem_diario
+            automacao.validar = not args.sem_validacao
+            resumo = automacao.executar(usuario, senha, diretorio)
+    except KeyboardInterrupt:
+        logger.error("Execução interrompida")
+        return 1
+    except Exception as e:
+        # O motor já registrou o erro completo no log
+        logger.error(f"Execução abortada: {str(e)}")
+        return 1
+    finally:
+        metricas.finalizar()
+
+    if resumo.falhas or resumo.rejeitados or (resumo.cancelado and not args.vigiar):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # Necessário no executável do Windows para a validação em paralelo
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Condições de espera usadas com o WebDriverWait. Cada uma recebe o driver e
+retorna um valor verdadeiro quando a página chegou no estado esperado.
+"""
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+
+import acoes_js
+
+
+SCRIPT_LISTAR_DOCUMENTOS = acoes_js.FUNCAO_LISTAR + """
+    return listar(document, arguments[0]);
+"""
+
+
+def _entrar_no_frame(driver, frame):
+    driver.switch_to.default_content()
+    if frame:
+        driver.switch_to.frame(driver.find_element(By.NAME, frame))
+
+
+def opcao_selecionada(locator, texto):
+    def _condicao(driver):
+        try:
+            select = driver.find_element(*locator)
+            return driver.execute_script(
+                "var s = arguments[0];"
+                "return s.selectedIndex >= 0 && "
+                "s.options[s.selectedIndex].text.trim() === arguments[1];",
+                select,
+                texto,
+            )
+        except WebDriverException:
+            return False
+
+    return _condicao
+
+
+def link_no_frame(frame, trecho_href):
+    """Verdadeiro quando o frame tem um link cujo endereço contém o trecho."""
+
+    def _condicao(driver):
+        try:
+            _entrar_no_frame(driver, frame)
+            seletor = f'a[href*="{trecho_href}"]'
+            return bool(driver.find_elements(By.CSS_SELECTOR, seletor))
+        except WebDriverException:
+            return False
+        finally:
+            driver.switch_to.default_content()
+
+    return _condicao
+
+
+def listar_documentos_arvore(driver, tipo="Comprovante"):
+    """Nós (id, texto, titulo) dos documentos do tipo na árvore do processo."""
+    try:
+        _entrar_no_frame(driver, "ifrArvore")
+        return driver.execute_script(SCRIPT_LISTAR_DOCUMENTOS, tipo)
+    except WebDriverException:
+        return None
+    finally:
+        driver.switch_to.default_content()
+
+
+def documentos_na_arvore(minimo, tipo="Comprovante"):
+    """Retorna os nós da árvore quando houver ao menos `minimo` documentos do tipo."""
+
+    def _condicao(driver):
+        nos = listar_documentos_arvore(driver, tipo)
+        return nos if nos is not None and len(nos) >= minimo else False
+
+    return _condicao
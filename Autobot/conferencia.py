@@ -0,0 +1,79 @@
+"""
+Conferência, na árvore do processo, dos documentos enviados. Os envios de
+uma visita ao processo ficam pendentes e são conferidos juntos, numa única
+leitura da árvore, quando a automação deixa o processo ou termina o lote.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+
+
+TIPO_DOCUMENTO = "Comprovante"
+
+_DATA = re.compile(r"\b\d{2}/\d{2}/\d{4}\b")
+
+
+@dataclass
+class EnvioPendente:
+    arquivo: str
+    processo: str
+    data: str  # data de elaboração informada no formulário (dd/mm/aaaa)
+    nome_arvore: str  # nome informado para aparecer na árvore
+
+
+def nome_na_arvore(arquivo):
+    """Nome com que o documento aparece na árvore: o do arquivo, sem a extensão."""
+    return os.path.splitext(os.path.basename(arquivo))[0]
+
+
+def _cita(texto, nome):
+    # "00123.2024" não pode casar com o nó de "00123.2024_2"
+    padrao = r"(?<![\w.])" + re.escape(nome) + r"(?![\w.])"
+    return re.search(padrao, texto) is not None
+
+
+def conferir(nos, pendentes, anteriores=(), tipo=TIPO_DOCUMENTO):
+    """
+    Confere os envios pendentes contra os nós da árvore (dicionários com
+    id, texto e titulo). Só contam nós que não existiam antes da visita, do
+    tipo esperado e com o nome do arquivo; se o nó mostrar uma data, ela
+    precisa ser a do envio. Retorna (arquivo, motivo) dos não confirmados.
+    """
+    anteriores = set(anteriores)
+    livres = [
+        no
+        for no in nos
+        if no["id"] not in anteriores and no["texto"].strip().startswith(tipo)
+    ]
+    nao_confirmados = []
+    for pendente in pendentes:
+        candidatos = [
+            no
+            for no in livres
+            if _cita(no["texto"], pendente.nome_arvore)
+            or _cita(no.get("titulo") or "", pendente.nome_arvore)
+        ]
+        if not candidatos:
+            nao_confirmados.append(
+                (
+                    pendente.arquivo,
+                    f"documento {tipo} '{pendente.nome_arvore}' não apareceu na "
+                    "árvore do processo",
+                )
+            )
+            continue
+        datas = []
+        for no in candidatos:
+            datas = _DATA.findall(f"{no['texto']} {no.get('titulo') or ''}")
+            if not datas or pendente.data in datas:
+                livres.remove(no)
+                break
+        else:
+            nao_confirmados.append(
+                (
+                    pendente.arquivo,
+                    f"documento na árvore com data {datas[0]}, esperada {pendente.data}",
+                )
+            )
+    return nao_confirmados
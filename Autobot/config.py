@@ -0,0 +1,62 @@
+import os
+
+
+# As funções leem o ambiente a cada chamada porque o .env só é carregado
+# pela interface depois dos imports
+
+
+def url_sei():
+    """Endereço do SEI. Pode apontar para o servidor local de testes (mock_sei.py)."""
+    return os.getenv("SEI_URL", "https://sei.funprespjud.com.br/")
+
+
+def motor_padrao():
+    """Motor usado para enviar os documentos: "selenium" ou "http"."""
+    return os.getenv("SEI_MOTOR", "selenium")
+
+
+def diretorio_dados():
+    """Pasta onde a automação guarda sessões, caches e perfis do navegador."""
+    diretorio = os.getenv("AUTOBOT_DADOS") or os.path.join(
+        os.path.expanduser("~"), ".autobot"
+    )
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def validade_sessao():
+    """Tempo, em minutos, que uma sessão salva do SEI é considerada válida."""
+    return int(os.getenv("SEI_VALIDADE_SESSAO", "60"))
+
+
+def padrao_processo():
+    """
+    Expressão regular do número do processo obtido do nome do arquivo
+    (00123.2024.pdf -> 00123/2024).
+    """
+    return os.getenv("SEI_PADRAO_PROCESSO", r"\d{1,6}/\d{4}")
+
+
+def tamanho_maximo_mb():
+    """Tamanho máximo, em MB, aceito pelo SEI para um documento externo."""
+    return float(os.getenv("SEI_TAMANHO_MAXIMO_MB", "50"))
+
+
+def reciclar_apos_documentos():
+    """Documentos enviados por um navegador antes de ele ser trocado (0 desativa)."""
+    return int(os.getenv("SEI_RECICLAR_DOCUMENTOS", "300"))
+
+
+def memoria_maxima_navegador_mb():
+    """Memória, em MB, acima da qual o navegador é trocado por um novo (0 desativa)."""
+    return float(os.getenv("SEI_MEMORIA_MAXIMA_MB", "1500"))
+
+
+def tamanho_maximo_log_mb():
+    """Tamanho, em MB, a partir do qual o arquivo de log da execução é girado."""
+    return float(os.getenv("SEI_LOG_TAMANHO_MB", "20"))
+
+
+def copias_log():
+    """Arquivos girados mantidos por execução, além do atual."""
+    return int(os.getenv("SEI_LOG_COPIAS", "5"))
@@ -0,0 +1,239 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+from conferencia import EnvioPendente, nome_na_arvore
+from lote import processo_do_arquivo
+
+
+STATUS_PENDENTE = "pendente"
+STATUS_EM_ANDAMENTO = "em_andamento"
+STATUS_ENVIADO = "enviado"  # salvo no SEI, ainda não conferido na árvore
+STATUS_CONFIRMADO = "confirmado"
+STATUS_FALHA = "falha"
+
+NOME_DIARIO = ".autobot_diario.sqlite3"
+
+
+def _agora():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def hash_arquivo(caminho):
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+class DiarioLote:
+    """
+    Diário em SQLite, gravado dentro da pasta dos arquivos, com o hash do
+    conteúdo, o processo, o status e os horários de cada arquivo. Permite
+    retomar um lote interrompido sem reenviar o que já foi confirmado.
+    """
+
+    def __init__(self, diretorio, caminho=None):
+        self.diretorio = diretorio
+        self.caminho = caminho or os.path.join(diretorio, NOME_DIARIO)
+        self.lock = threading.Lock()
+        self.conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        self.conexao.row_factory = sqlite3.Row
+        self.conexao.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS arquivos (
+                hash TEXT PRIMARY KEY,
+                arquivo TEXT NOT NULL,
+                processo TEXT NOT NULL,
+                tamanho INTEGER,
+                mtime REAL,
+                status TEXT NOT NULL,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                erro TEXT,
+                criado_em TEXT NOT NULL,
+                atualizado_em TEXT NOT NULL,
+                confirmado_em TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_arquivos_nome ON arquivos (arquivo);
+            """
+        )
+        self._hashes = {}
+        # Envios que o lote anterior deixou sem conferência na árvore
+        self._sem_conferencia = {}
+
+    def fechar(self):
+        with self.lock:
+            self.conexao.close()
+
+    def _hash(self, arquivo):
+        """
+        Reaproveita o hash gravado quando nome, tamanho e data de modificação
+        não mudaram, para a retomada não precisar reler todos os PDFs.
+        """
+        info = os.stat(os.path.join(self.diretorio, arquivo))
+        linha = self.conexao.execute(
+            "SELECT hash FROM arquivos WHERE arquivo = ? AND tamanho = ? AND mtime = ?",
+            (arquivo, info.st_size, info.st_mtime),
+        ).fetchone()
+        if linha:
+            return linha["hash"], info
+        return hash_arquivo(os.path.join(self.diretorio, arquivo)), info
+
+    def filtrar(self, arquivos):
+        """
+        Retorna (a_processar, ignorados). Ignora arquivos já confirmados,
+        inclusive os que foram renomeados depois do envio, e arquivos com o
+        mesmo conteúdo de outro do lote. Os que ficaram enviados (ou em
+        andamento) sem conferência seguem para processar, mas antes de um
+        novo envio são procurados na árvore (envio_sem_conferencia).
+        """
+        a_processar, ignorados = [], []
+        vistos = {}
+        with self.lock:
+            for arquivo in arquivos:
+                hash_atual, info = self._hash(arquivo)
+                linha = self.conexao.execute(
+                    "SELECT * FROM arquivos WHERE hash = ?", (hash_atual,)
+                ).fetchone()
+
+                if linha and linha["status"] == STATUS_CONFIRMADO:
+                    if linha["arquivo"] == arquivo:
+                        motivo = f"já enviado ao processo {linha['processo']}"
+                    else:
+                        motivo = (
+                            f"mesmo conteúdo de {linha['arquivo']}, já enviado ao "
+                            f"processo {linha['processo']} (arquivo renomeado)"
+                        )
+                    ignorados.append((arquivo, motivo))
+                    continue
+
+                if hash_atual in vistos:
+                    ignorados.append((arquivo, f"mesmo conteúdo de {vistos[hash_atual]}"))
+                    continue
+                vistos[hash_atual] = arquivo
+
+                if linha and linha["status"] in (STATUS_EM_ANDAMENTO, STATUS_ENVIADO):
+                    data = datetime.fromisoformat(linha["atualizado_em"])
+                    self._sem_conferencia[arquivo] = EnvioPendente(
+                        arquivo,
+                        linha["processo"],
+                        data.strftime("%d/%m/%Y"),
+                        nome_na_arvore(linha["arquivo"]),
+                    )
+
+                agora = _agora()
+                self.conexao.execute(
+                    """
+                    INSERT INTO arquivos (hash, arquivo, processo, tamanho, mtime,
+                                          status, criado_em, atualizado_em)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (hash) DO UPDATE SET
+                        arquivo = excluded.arquivo,
+                        processo = excluded.processo,
+                        tamanho = excluded.tamanho,
+                        mtime = excluded.mtime,
+                        atualizado_em = excluded.atualizado_em
+                    """,
+                    (
+                        hash_atual,
+                        arquivo,
+                        processo_do_arquivo(arquivo),
+                        info.st_size,
+                        info.st_mtime,
+                        STATUS_PENDENTE,
+                        agora,
+                        agora,
+                    ),
+                )
+                self._hashes[arquivo] = hash_atual
+                a_processar.append(arquivo)
+            self.conexao.commit()
+        return a_processar, ignorados
+
+    def acompanhar(self, arquivos):
+        """
+        Volta a registrar arquivos que já passaram por filtrar neste lote,
+        como os reenviados por outro motor, sem filtrá-los de novo.
+        """
+        with self.lock:
+            for arquivo in arquivos:
+                self._hashes[arquivo] = self._hash(arquivo)[0]
+
+    def interrompidos(self):
+        """
+        Arquivos que estavam sendo enviados, ou enviados mas ainda não
+        conferidos na árvore, quando o lote anterior parou.
+        """
+        with self.lock:
+            linhas = self.conexao.execute(
+                "SELECT arquivo FROM arquivos WHERE status IN (?, ?)",
+                (STATUS_EM_ANDAMENTO, STATUS_ENVIADO),
+            ).fetchall()
+        return [linha["arquivo"] for linha in linhas]
+
+    def envio_sem_conferencia(self, arquivo):
+        """
+        EnvioPendente do envio que o lote anterior fez (ou começou) sem
+        conferir na árvore, com a data e o nome daquele envio; None se não
+        houver.
+        """
+        with self.lock:
+            return self._sem_conferencia.get(arquivo)
+
+    def _atualizar(self, arquivo, **campos):
+        hash_atual = self._hashes.get(arquivo)
+        if hash_atual is None:
+            return
+        campos["atualizado_em"] = _agora()
+        atribuicoes = ", ".join(f"{nome} = ?" for nome in campos)
+        with self.lock:
+            self.conexao.execute(
+                f"UPDATE arquivos SET {atribuicoes} WHERE hash = ?",
+                (*campos.values(), hash_atual),
+            )
+            self.conexao.commit()
+
+    def iniciar(self, arquivo):
+        self._atualizar(arquivo, status=STATUS_EM_ANDAMENTO)
+
+    def registrar(self, resultado):
+        """
+        Resultado de uma tentativa de envio. Um envio bem-sucedido fica como
+        enviado até a conferência na árvore (confirmar ou reprovar).
+        """
+        hash_atual = self._hashes.get(resultado.arquivo)
+        if hash_atual is None:
+            return
+        with self.lock:
+            self._sem_conferencia.pop(resultado.arquivo, None)
+            self.conexao.execute(
+                """
+                UPDATE arquivos SET status = ?, erro = ?, tentativas = tentativas + 1,
+                       atualizado_em = ?, confirmado_em = NULL
+                WHERE hash = ?
+                """,
+                (
+                    STATUS_ENVIADO if resultado.sucesso else STATUS_FALHA,
+                    resultado.erro or None,
+                    _agora(),
+                    hash_atual,
+                ),
+            )
+            self.conexao.commit()
+
+    def confirmar(self, arquivo):
+        """Envio conferido na árvore do processo."""
+        with self.lock:
+            self._sem_conferencia.pop(arquivo, None)
+        agora = _agora()
+        self._atualizar(arquivo, status=STATUS_CONFIRMADO, confirmado_em=agora)
+
+    def reprovar(self, resultado):
+        """
+        Envio que não se confirmou na árvore. A tentativa já foi contada
+        por registrar.
+        """
+        self._atualizar(resultado.arquivo, status=STATUS_FALHA, erro=resultado.erro)
@@ -0,0 +1,433 @@
+"""
+Execução de um trabalho com várias contas do SEI, várias unidades e várias
+pastas ao mesmo tempo. O trabalho é descrito num arquivo JSON:
+
+    {
+      "contas": [
+        {"usuario": "operador1", "senha_env": "SEI_SENHA_OPERADOR1", "sessoes": 2},
+        {"usuario": "operador2", "senha_arquivo": "~/.sei_operador2",
+         "unidades": ["FUNPRESPJUD-GECON"]}
+      ],
+      "pastas": [
+        {"diretorio": "D:/Recibos/GEBEN", "unidade": "FUNPRESPJUD-GEBEN"},
+        {"diretorio": "D:/Recibos/GECON", "unidade": "FUNPRESPJUD-GECON"}
+      ]
+    }
+
+Cada conta abre até `sessoes` sessões em paralelo (padrão 1) e atende as
+unidades listadas (todas, se a lista for omitida). Os arquivos de cada pasta
+são agrupados por processo, e cada grupo vai inteiro para uma sessão, que
+troca de unidade no SEI quando o grupo é de outra. Uma pasta sem unidade é
+enviada na unidade em que a sessão estiver.
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+from lote import (
+    STATUS_FALHA,
+    ControleExecucao,
+    ResultadoArquivo,
+    ResumoExecucao,
+    agrupar_por_processo,
+    aplicar_diario,
+    aplicar_validacao,
+    listar_arquivos,
+    processo_do_arquivo,
+)
+from metricas import RegistroTempos
+from navegador import texto_capacidade
+from pool import trabalhar_em_sessao
+from ritmo import ritmo_da_execucao
+
+
+@dataclass
+class Conta:
+    usuario: str
+    senha: str = field(repr=False)
+    sessoes: int = 1  # sessões simultâneas desta conta
+    unidades: tuple = ()  # siglas atendidas; vazia atende qualquer unidade
+
+    def atende(self, unidade):
+        return unidade is None or not self.unidades or unidade in self.unidades
+
+
+@dataclass
+class Pasta:
+    diretorio: str
+    unidade: str = None
+
+
+@dataclass
+class Trabalho:
+    contas: list
+    pastas: list
+
+
+def _senha(dados, base):
+    if dados.get("senha_env"):
+        senha = os.getenv(dados["senha_env"])
+        if not senha:
+            raise ValueError(f"variável {dados['senha_env']} não definida")
+        return senha
+    if dados.get("senha_arquivo"):
+        caminho = os.path.join(base, os.path.expanduser(dados["senha_arquivo"]))
+        with open(caminho, encoding="utf-8") as arquivo:
+            return arquivo.readline().rstrip("\r\n")
+    if dados.get("senha"):
+        return dados["senha"]
+    raise ValueError("informe senha_env, senha_arquivo ou senha")
+
+
+def carregar_trabalho(caminho):
+    """
+    Lê o arquivo do trabalho. Pastas e arquivos de senha relativos são
+    procurados a partir da pasta do próprio arquivo. Erros de conteúdo
+    geram ValueError com a conta ou pasta que os causou.
+    """
+    base = os.path.dirname(os.path.abspath(caminho))
+    try:
+        with open(caminho, encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{caminho} não é um JSON válido: {e}")
+
+    contas = []
+    for indice, conta in enumerate(dados.get("contas") or [], start=1):
+        usuario = conta.get("usuario")
+        if not usuario:
+            raise ValueError(f"conta {indice} sem usuário")
+        try:
+            senha = _senha(conta, base)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"senha da conta {usuario}: {e}")
+        sessoes = int(conta.get("sessoes", 1))
+        if sessoes < 1:
+            raise ValueError(f"conta {usuario}: sessoes precisa ser ao menos 1")
+        contas.append(Conta(usuario, senha, sessoes, tuple(conta.get("unidades") or ())))
+
+    pastas = []
+    for indice, pasta in enumerate(dados.get("pastas") or [], start=1):
+        if not pasta.get("diretorio"):
+            raise ValueError(f"pasta {indice} sem diretório")
+        diretorio = os.path.normpath(
+            os.path.join(base, os.path.expanduser(pasta["diretorio"]))
+        )
+        if not os.path.isdir(diretorio):
+            raise ValueError(f"pasta não encontrada: {diretorio}")
+        if any(p.diretorio == diretorio for p in pastas):
+            raise ValueError(f"pasta repetida: {diretorio}")
+        pastas.append(Pasta(diretorio, pasta.get("unidade") or None))
+
+    if not contas or not pastas:
+        raise ValueError("o trabalho precisa de ao menos uma conta e uma pasta")
+    for pasta in pastas:
+        if not any(conta.atende(pasta.unidade) for conta in contas):
+            raise ValueError(f"nenhuma conta atende a unidade {pasta.unidade}")
+    return Trabalho(contas, pastas)
+
+
+@dataclass
+class LotePasta:
+    """Estado de uma pasta durante a execução: resumo e diário próprios."""
+
+    pasta: Pasta
+    resumo: ResumoExecucao = field(default_factory=ResumoExecucao)
+    diario: object = None
+    arquivos: list = field(default_factory=list)
+
+
+@dataclass
+class Grupo:
+    lote: LotePasta
+    arquivos: list
+    adiado: bool = False
+
+    @property
+    def unidade(self):
+        return self.lote.pasta.unidade
+
+
+class FilaJusta:
+    """
+    Grupos pendentes, separados por unidade. Cada sessão recebe um grupo da
+    unidade menos atendida até ali, para que uma pasta grande não atrase as
+    outras; mas continua na sua unidade enquanto ela não passar `folga`
+    grupos à frente da menos atendida, para não trocar de unidade a cada
+    processo. Os adiados só saem depois que os grupos normais acabarem.
+
+    proximo() espera enquanto outras sessões ainda têm grupos em andamento,
+    que podem voltar para a fila, e só retorna None quando não há mais nada
+    que a sessão possa atender.
+    """
+
+    def __init__(self, folga=5):
+        self.folga = folga
+        self._condicao = threading.Condition()
+        self._grupos = {}
+        self._adiados = deque()
+        self._atendidos = {}
+        self._em_andamento = 0
+
+    def adicionar(self, grupo):
+        with self._condicao:
+            self._grupos.setdefault(grupo.unidade, deque()).append(grupo)
+            self._atendidos.setdefault(grupo.unidade, 0)
+            self._condicao.notify_all()
+
+    def adiar(self, grupo):
+        with self._condicao:
+            self._adiados.append(grupo)
+            self._condicao.notify_all()
+
+    def devolver(self, grupo):
+        """Grupo que uma sessão não pôde atender volta para o início da fila."""
+        with self._condicao:
+            if grupo.adiado:
+                self._adiados.appendleft(grupo)
+            else:
+                self._grupos[grupo.unidade].appendleft(grupo)
+                self._atendidos[grupo.unidade] -= 1
+            self._condicao.notify_all()
+
+    def concluir(self):
+        """Avisa que a sessão terminou o grupo que tinha retirado."""
+        with self._condicao:
+            self._em_andamento -= 1
+            self._condicao.notify_all()
+
+    def proximo(self, atende, unidade_atual=None, controle=None):
+        with self._condicao:
+            while True:
+                grupo = self._retirar(atende, unidade_atual)
+                if grupo is not None:
+                    self._em_andamento += 1
+                    return grupo
+                if not self._em_andamento or (controle and controle.cancelado):
+                    return None
+                self._condicao.wait(timeout=1)
+
+    def _retirar(self, atende, unidade_atual):
+        candidatas = [u for u, grupos in self._grupos.items() if grupos and atende(u)]
+        if candidatas:
+            menor = min(self._atendidos[u] for u in candidatas)
+            if (
+                unidade_atual in candidatas
+                and self._atendidos[unidade_atual] - menor < self.folga
+            ):
+                unidade = unidade_atual
+            else:
+                unidade = min(candidatas, key=lambda u: self._atendidos[u])
+            self._atendidos[unidade] += 1
+            return self._grupos[unidade].popleft()
+        for grupo in self._adiados:
+            if atende(grupo.unidade):
+                self._adiados.remove(grupo)
+                return grupo
+        return None
+
+    def restantes(self):
+        """Retira da fila os grupos que nenhuma sessão atendeu."""
+        with self._condicao:
+            grupos = [g for fila in self._grupos.values() for g in fila]
+            for fila in self._grupos.values():
+                fila.clear()
+            return grupos
+
+
+class EscalonadorContas:
+    """
+    Distribui os arquivos de várias pastas entre as sessões de várias contas
+    do SEI. Cada sessão mantém seu login e retira grupos (arquivos de um
+    processo de uma pasta) da FilaJusta. Todas seguem o mesmo ritmo, como no
+    PoolNavegadores: o SEI é um só, e quando ele fica instável todas esperam.
+
+    O resumo final junta as pastas, com o nome da pasta antes de cada
+    arquivo; o log mostra também o resumo de cada pasta.
+    """
+
+    def __init__(
+        self,
+        trabalho,
+        fabrica=None,
+        diretorio_logs="logs",
+        usar_diario=True,
+        controle=None,
+        validar=True,
+        folga=5,
+    ):
+        if fabrica is None:
+            from selenium_handler import SEIAutomation
+
+            fabrica = SEIAutomation
+        self.trabalho = trabalho
+        self.fabrica = fabrica
+        self.diretorio_logs = diretorio_logs
+        self.usar_diario = usar_diario
+        self.validar = validar
+        self.folga = folga
+        self.metricas = None
+        self.ritmo = None
+        self.memorias = []
+        self.contadores = []
+        self.controle = controle or ControleExecucao()
+        self.logger = logging.getLogger(__name__)
+
+    def executar(self):
+        # O resumo geral nasce aqui para medir a execução inteira
+        resumo = ResumoExecucao()
+        lotes = [LotePasta(pasta) for pasta in self.trabalho.pastas]
+        proprias = self.metricas is None
+        if proprias:
+            self.metricas = RegistroTempos(self.diretorio_logs)
+        try:
+            for lote in lotes:
+                self._preparar(lote)
+            return self._executar(lotes, resumo)
+        finally:
+            if proprias:
+                self.metricas.finalizar()
+                self.metricas = None
+            for lote in lotes:
+                if lote.diario:
+                    lote.diario.fechar()
+
+    def _preparar(self, lote):
+        """Lista, valida e filtra pelo diário os arquivos da pasta, antes do login."""
+        diretorio = lote.pasta.diretorio
+        arquivos = listar_arquivos(diretorio)
+        if self.validar:
+            arquivos = aplicar_validacao(diretorio, arquivos, lote.resumo, self.logger)
+        if self.usar_diario:
+            from diario import DiarioLote
+
+            lote.diario = DiarioLote(diretorio)
+            arquivos = aplicar_diario(lote.diario, arquivos, lote.resumo, self.logger)
+        lote.arquivos = arquivos
+
+    def _executar(self, lotes, resumo):
+        self.ritmo = ritmo_da_execucao(self.ritmo)
+        self.memorias = []
+        self.contadores = []
+        fila = FilaJusta(self.folga)
+        total = 0
+        for lote in lotes:
+            for grupo in agrupar_por_processo(lote.arquivos):
+                fila.adicionar(Grupo(lote, grupo))
+            total += len(lote.arquivos)
+        sessoes = [
+            (conta, indice)
+            for conta in self.trabalho.contas
+            for indice in range(1, conta.sessoes + 1)
+        ]
+        self.logger.info(
+            f"Iniciando {len(sessoes)} sessões de {len(self.trabalho.contas)} "
+            f"conta(s) para {total} arquivos em {len(lotes)} pasta(s)"
+        )
+
+        lock = threading.Lock()
+        tentativas = {}
+        self.controle.iniciar(total)
+        threads = [
+            threading.Thread(
+                target=self._trabalhar,
+                args=(conta, indice, fila, tentativas, lock),
+                name=f"{conta.usuario}.{indice}",
+                daemon=True,
+            )
+            for conta, indice in sessoes
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Grupos que sobraram: execução cancelada ou nenhuma sessão da
+        # unidade conseguiu login
+        for grupo in fila.restantes():
+            if self.controle.cancelado:
+                grupo.lote.resumo.cancelar(grupo.arquivos)
+                continue
+            for arquivo in grupo.arquivos:
+                grupo.lote.resumo.adicionar(
+                    ResultadoArquivo(
+                        arquivo,
+                        processo_do_arquivo(arquivo),
+                        STATUS_FALHA,
+                        erro=f"Nenhuma sessão disponível para a unidade {grupo.unidade}",
+                    )
+                )
+
+        for lote in lotes:
+            lote.resumo.finalizar()
+            nome = os.path.basename(lote.pasta.diretorio)
+            unidade = f" (unidade {lote.pasta.unidade})" if lote.pasta.unidade else ""
+            self.logger.info(f"Pasta {lote.pasta.diretorio}{unidade}:\n{lote.resumo.texto()}")
+            resumo.incorporar(lote.resumo, nome)
+        for contadores in self.contadores:
+            resumo.somar(contadores)
+        resumo.somar(self.ritmo.contadores())
+        resumo.finalizar()
+        self.logger.info(resumo.texto())
+        capacidade = texto_capacidade(self.memorias)
+        if capacidade:
+            self.logger.info(capacidade)
+        return resumo
+
+    def _trabalhar(self, conta, indice, fila, tentativas, lock):
+        nome = f"{conta.usuario}.{indice}"
+        # Unidades em que a troca falhou de novo: ficam para outras sessões
+        falhas_troca = {}
+        recusadas = set()
+
+        def atende(unidade):
+            return conta.atende(unidade) and unidade not in recusadas
+
+        def laco(automacao, logger):
+            while not self.controle.cancelado:
+                grupo = fila.proximo(atende, automacao.unidade_atual, self.controle)
+                if grupo is None:
+                    break
+                try:
+                    automacao.entrar_na_unidade(grupo.unidade)
+                except Exception as e:
+                    # O grupo volta para a fila; na segunda falha a unidade
+                    # fica para as sessões de outras contas
+                    logger.error(
+                        f"Sessão {nome} não entrou na unidade {grupo.unidade}: {str(e)}"
+                    )
+                    falhas_troca[grupo.unidade] = falhas_troca.get(grupo.unidade, 0) + 1
+                    if falhas_troca[grupo.unidade] >= 2:
+                        recusadas.add(grupo.unidade)
+                    fila.devolver(grupo)
+                    fila.concluir()
+                    continue
+                try:
+                    self._enviar_grupo(automacao, nome, grupo, fila, tentativas, lock)
+                finally:
+                    fila.concluir()
+
+        trabalhar_em_sessao(self, nome, indice, conta.usuario, conta.senha, laco, lock)
+
+    def _enviar_grupo(self, automacao, nome, grupo, fila, tentativas, lock):
+        lote = grupo.lote
+        restantes, falhas = automacao.enviar_grupo(
+            lote.pasta.diretorio,
+            grupo.arquivos,
+            lote.resumo,
+            self.controle,
+            tentativas,
+            lote.diario,
+            lock,
+            adiado=grupo.adiado,
+            worker=nome,
+        )
+        if restantes and not grupo.adiado:
+            # O restante do grupo volta para a fila como cancelado
+            fila.devolver(Grupo(lote, restantes))
+        if falhas:
+            fila.adiar(Grupo(lote, falhas, adiado=True))
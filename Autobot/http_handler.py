@@ -0,0 +1,486 @@
+import os
+import logging
+from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from conferencia import TIPO_DOCUMENTO, EnvioPendente, nome_na_arvore
+from config import url_sei
+from sessao import CacheSessao, aplicar_no_requests, cookies_do_requests
+from cache_processos import CacheProcessos
+from lote import ControleExecucao, ErroSEI, ProcessadorLote, processo_do_arquivo
+
+
+# Separadores usados pelo SEI nos campos de tabela dinâmica (hdnAnexos)
+SEPARADOR_COLUNA = "±"
+SEPARADOR_LINHA = "¥"
+
+
+class PaginaHtml(HTMLParser):
+    """
+    Extrai de uma página do SEI apenas o que a automação usa: links,
+    formulários (com seus campos) e iframes.
+    """
+
+    def __init__(self, url, html):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.links = []
+        self.formularios = {}
+        self.iframes = {}
+        self.ids = set()
+        self.textos = []
+        self._link = None
+        self._formulario = None
+        self._select = None
+        self._opcao = None
+        self.feed(html)
+        self.close()
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {nome: valor or "" for nome, valor in attrs}
+        if "id" in attrs:
+            self.ids.add(attrs["id"])
+
+        if tag == "a":
+            self._link = {
+                "id": attrs.get("id", ""),
+                "titulo": attrs.get("title", ""),
+                "href": urljoin(self.url, attrs.get("href", "")),
+                "classe": attrs.get("class", ""),
+                "texto": "",
+                "imagens": [],
+            }
+            self.links.append(self._link)
+        elif tag == "img" and self._link is not None:
+            self._link["imagens"].append(attrs.get("src", ""))
+        elif tag == "iframe":
+            src = urljoin(self.url, attrs.get("src", ""))
+            for chave in (attrs.get("id"), attrs.get("name")):
+                if chave:
+                    self.iframes[chave] = src
+        elif tag == "form":
+            self._formulario = {
+                "action": urljoin(self.url, attrs.get("action", "")),
+                "method": attrs.get("method", "get").lower(),
+                "campos": {},
+                "selects": {},
+            }
+            for chave in (attrs.get("id"), attrs.get("name")):
+                if chave:
+                    self.formularios[chave] = self._formulario
+        elif self._formulario is not None:
+            self._campo(tag, attrs)
+
+    def _campo(self, tag, attrs):
+        nome = attrs.get("name")
+        if tag == "input" and nome:
+            tipo = attrs.get("type", "text").lower()
+            if tipo in ("radio", "checkbox"):
+                if "checked" in attrs:
+                    self._formulario["campos"][nome] = attrs.get("value", "on")
+            elif tipo not in ("file", "submit", "button", "image", "reset"):
+                self._formulario["campos"][nome] = attrs.get("value", "")
+        elif tag == "select" and nome:
+            self._select = self._formulario["selects"].setdefault(nome, [])
+        elif tag == "option" and self._select is not None:
+            self._opcao = {
+                "valor": attrs.get("value"),
+                "texto": "",
+                "selecionada": "selected" in attrs,
+            }
+            self._select.append(self._opcao)
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self._link = None
+        elif tag == "form":
+            self._formulario = None
+        elif tag == "select":
+            self._select = None
+        elif tag == "option":
+            self._opcao = None
+
+    def handle_data(self, data):
+        if self._link is not None:
+            self._link["texto"] += data
+        if self._opcao is not None:
+            self._opcao["texto"] += data
+            if self._opcao["valor"] is None:
+                self._opcao["valor"] = self._opcao["texto"]
+        if data.strip():
+            self.textos.append(data.strip())
+
+    def link(self, acao, texto=None, classe=None, imagem=None):
+        for link in self.links:
+            if f"acao={acao}" not in link["href"]:
+                continue
+            if texto is not None and link["texto"].strip() != texto:
+                continue
+            if classe is not None and link["classe"] != classe:
+                continue
+            if imagem is not None and not any(imagem in src for src in link["imagens"]):
+                continue
+            return link["href"]
+        return None
+
+    def formulario(self, chave):
+        return self.formularios.get(chave)
+
+    def formulario_do_campo(self, campo):
+        """Formulário que contém o campo ou select com o nome indicado."""
+        for formulario in self.formularios.values():
+            if campo in formulario["campos"] or campo in formulario["selects"]:
+                return formulario
+        return None
+
+    def opcao_selecionada(self, formulario, select):
+        opcoes = formulario["selects"].get(select, [])
+        for opcao in opcoes:
+            if opcao["selecionada"]:
+                return opcao["texto"].strip()
+        # Sem "selected" o navegador mostra a primeira
+        return opcoes[0]["texto"].strip() if opcoes else None
+
+    def valor_opcao(self, formulario, select, texto):
+        for opcao in formulario["selects"].get(select, []):
+            if opcao["texto"].strip() == texto:
+                return opcao["valor"]
+        return None
+
+
+class SEIHttpAutomation(ProcessadorLote):
+    """
+    Motor sem navegador: faz login uma vez e executa a pesquisa do processo,
+    a escolha do tipo e o formulário de documento externo como requisições
+    HTTP diretas, reaproveitando as conexões da sessão.
+    """
+
+    nome_motor = "HTTP"
+
+    def __init__(
+        self,
+        logger=None,
+        tamanho_pool=4,
+        timeout=30,
+        fallback_selenium=True,
+        usar_cache_sessao=True,
+        usar_cache_processos=True,
+        headless=False,
+        perfil=None,
+    ):
+        self.logger = logger or logging.getLogger(__name__)
+        # Repassados ao navegador do reprocessamento
+        self.headless = headless
+        self.perfil = perfil
+        self.usar_cache_sessao = usar_cache_sessao
+        self.cache_processos = CacheProcessos() if usar_cache_processos else None
+        self.timeout = timeout
+        self.fallback_selenium = fallback_selenium
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+        self.session.headers["User-Agent"] = "Autobot"
+        self._pagina_atual = None
+        self.usuario_logado = None
+        # Guardadas para o login do navegador no reprocessamento
+        self._credenciais = None
+        self.url_inicial = None
+        self.processo_aberto = None
+        self.reaproveitamentos = 0
+        # Envios da visita atual ao processo, conferidos juntos ao deixá-lo
+        self.envios_pendentes = []
+        self._nos_anteriores = ()
+
+    def fechar(self):
+        self.session.close()
+        self._pagina_atual = None
+
+    def ativo(self):
+        return self._pagina_atual is not None
+
+    def falha_transitoria(self, erro):
+        if isinstance(erro, requests.HTTPError):
+            return erro.response is not None and erro.response.status_code >= 500
+        return isinstance(erro, (requests.Timeout, requests.ConnectionError))
+
+    # Requisições
+
+    def _get(self, url):
+        resposta = self.session.get(url, timeout=self.timeout)
+        return self._pagina(resposta)
+
+    def _enviar(self, formulario, campos=None, arquivos=None):
+        dados = dict(formulario["campos"])
+        dados.update(campos or {})
+        if formulario["method"] == "post":
+            resposta = self.session.post(
+                formulario["action"], data=dados, files=arquivos, timeout=self.timeout
+            )
+        else:
+            resposta = self.session.get(
+                formulario["action"], params=dados, timeout=self.timeout
+            )
+        return self._pagina(resposta)
+
+    def _pagina(self, resposta):
+        if resposta.status_code >= 500:
+            # Falha do servidor, mesmo que ele mostre a página de erro do SEI
+            resposta.raise_for_status()
+        pagina = PaginaHtml(resposta.url, resposta.text)
+        if "divInfraExcecao" in pagina.ids:
+            raise ErroSEI(" ".join(pagina.textos[-1:]) or "Erro retornado pelo SEI")
+        resposta.raise_for_status()
+        return pagina
+
+    # Etapas
+
+    def _pagina_logada(self, url):
+        try:
+            pagina = self._get(url)
+        except (ErroSEI, requests.RequestException):
+            return None
+        if pagina.formulario("frmProtocoloPesquisaRapida") is None:
+            return None
+        return pagina
+
+    def sessao_ativa(self):
+        if self._pagina_atual is None:
+            return False
+        pagina = self._pagina_logada(self._pagina_atual.url)
+        if pagina is None:
+            return False
+        self._pagina_atual = pagina
+        return True
+
+    def aplicar_sessao(self, cookies, url_inicial):
+        aplicar_no_requests(self.session.cookies, cookies)
+        pagina = self._pagina_logada(url_inicial)
+        if pagina is None:
+            self.session.cookies.clear()
+            return False
+        self._pagina_atual = pagina
+        self.url_inicial = url_inicial
+        return True
+
+    def login(self, usuario, senha):
+        self.processo_aberto = None
+        self.unidade_atual = None
+        self._credenciais = (usuario, senha)
+        if self._restaurar_sessao(usuario):
+            return
+
+        pagina = self._get(url_sei())
+        formulario = pagina.formulario("frmLogin")
+        if formulario is None:
+            raise ErroSEI("Formulário de login não encontrado")
+
+        pagina = self._enviar(
+            formulario,
+            {"txtUsuario": usuario, "pwdSenha": senha, "sbmAcessar": "Acessar"},
+        )
+        if pagina.formulario("frmProtocoloPesquisaRapida") is None:
+            raise ErroSEI("Login não concluído: pesquisa rápida não apareceu")
+        self._pagina_atual = pagina
+        self.usuario_logado = usuario
+        self.url_inicial = pagina.url
+        self.logger.info("Login realizado")
+        if self.usar_cache_sessao:
+            CacheSessao(usuario).salvar(self.url_inicial, cookies_do_requests(self.session.cookies))
+
+    def abrir_endereco(self, url):
+        try:
+            pagina = self._get(url)
+        except (ErroSEI, requests.RequestException):
+            return False
+        if "ifrVisualizacao" not in pagina.iframes:
+            return False
+        self._pagina_atual = pagina
+        return True
+
+    def endereco_atual(self):
+        return self._pagina_atual.url
+
+    def pesquisar_processo(self, processo):
+        formulario = self._pagina_atual.formulario("frmProtocoloPesquisaRapida")
+        pagina = self._enviar(formulario, {"txtPesquisaRapida": processo})
+        if "ifrVisualizacao" not in pagina.iframes:
+            raise ErroSEI(f"Página do processo {processo} não carregou")
+        self._pagina_atual = pagina
+
+    def trocar_unidade(self, unidade):
+        if self._pagina_atual is None:
+            raise ErroSEI("Sessão sem página aberta para trocar de unidade")
+        formulario = self._pagina_atual.formulario_do_campo("selInfraUnidades")
+        if formulario is None:
+            raise ErroSEI("Seletor de unidades não encontrado")
+        pagina = self._pagina_atual
+        if pagina.opcao_selecionada(formulario, "selInfraUnidades") == unidade:
+            return
+        valor = pagina.valor_opcao(formulario, "selInfraUnidades", unidade)
+        if valor is None:
+            raise ErroSEI(f"Unidade {unidade} não disponível para o usuário")
+        self.processo_aberto = None
+        pagina = self._enviar(formulario, {"selInfraUnidades": valor})
+        formulario = pagina.formulario_do_campo("selInfraUnidades")
+        if (
+            formulario is None
+            or pagina.opcao_selecionada(formulario, "selInfraUnidades") != unidade
+        ):
+            raise ErroSEI(f"Troca para a unidade {unidade} não foi concluída")
+        self._pagina_atual = pagina
+
+    def _listar_documentos(self, pagina_processo, tipo=TIPO_DOCUMENTO):
+        """Nós (id, texto, titulo) dos documentos do tipo na árvore do processo."""
+        arvore = self._get(pagina_processo.iframes["ifrArvore"])
+        return [
+            {"id": link["id"], "texto": link["texto"].strip(), "titulo": link["titulo"]}
+            for link in arvore.links
+            if link["id"].startswith("anchor")
+            and link["texto"].strip().startswith(tipo)
+        ]
+
+    def ler_arvore(self, minimo):
+        # O salvamento já devolve a página do processo: não há o que esperar
+        return self._listar_documentos(self._pagina_atual)
+
+    def incluir_documento(self, processo, diretorio, nome_arquivo=None):
+        pagina_processo = self._pagina_atual
+        self.logger.info(f"Tentando incluir documento para processo {processo}")
+        # A árvore só é lida no primeiro documento da visita ao processo
+        primeiro = not self.envios_pendentes
+        if primeiro:
+            with self.etapa("incluir.leitura_arvore", processo=processo):
+                anteriores = [no["id"] for no in self._listar_documentos(pagina_processo)]
+
+        # Botão "Incluir Documento" da visualização do processo
+        with self.etapa("incluir.botao", processo=processo):
+            visualizacao = self._get(pagina_processo.iframes["ifrVisualizacao"])
+        url_escolher_tipo = visualizacao.link(
+            "documento_escolher_tipo", imagem="documento_incluir.svg"
+        )
+        if url_escolher_tipo is None:
+            raise ErroSEI("Botão 'Incluir Documento' não encontrado")
+
+        # Link "Externo"
+        with self.etapa("incluir.externo", processo=processo):
+            escolha = self._get(url_escolher_tipo)
+        url_receber = escolha.link("documento_receber", texto="Externo", classe="ancoraOpcao")
+        if url_receber is None:
+            raise ErroSEI("Link 'Externo' não encontrado")
+
+        with self.etapa("incluir.frame", processo=processo):
+            formulario_pagina = self._get(url_receber)
+        cadastro = formulario_pagina.formulario("frmDocumentoCadastro")
+        anexos = formulario_pagina.formulario("frmAnexos")
+        if cadastro is None or anexos is None:
+            raise ErroSEI("Formulário de documento externo não encontrado")
+
+        serie = formulario_pagina.valor_opcao(cadastro, "selSerie", "Comprovante")
+        if serie is None:
+            raise ErroSEI("Tipo 'Comprovante' não disponível")
+
+        # Envio do arquivo, como o SEI faz ao escolher o arquivo no formulário
+        nome_arquivo = nome_arquivo or processo.replace("/", ".") + ".pdf"
+        caminho_arquivo = os.path.join(diretorio, nome_arquivo)
+        self.logger.info("Anexando arquivo")
+        with self.etapa("incluir.upload", processo=processo):
+            with open(caminho_arquivo, "rb") as arquivo:
+                resposta = self.session.post(
+                    anexos["action"],
+                    files={"filArquivo": (nome_arquivo, arquivo, "application/pdf")},
+                    timeout=self.timeout,
+                )
+            resposta.raise_for_status()
+        partes = resposta.text.strip().split("#")
+        if len(partes) < 5 or partes[0] == "ERRO":
+            raise ErroSEI(f"Falha no envio do arquivo: {resposta.text.strip()}")
+        nome_upload, nome_original, _, tamanho, data_upload = partes[:5]
+        hdn_anexos = SEPARADOR_COLUNA.join([nome_upload, nome_original, data_upload, tamanho])
+
+        data_atual = datetime.now().strftime("%d/%m/%Y")
+        nome_arvore = nome_na_arvore(nome_arquivo)
+        with self.etapa("incluir.formulario", processo=processo):
+            pagina = self._enviar(
+                cadastro,
+                {
+                    "selSerie": serie,
+                    "txtDataElaboracao": data_atual,
+                    "txtNomeArvore": nome_arvore,
+                    "rdoFormato": "N",  # nato-digital
+                    "rdoNivelAcesso": "0",  # público
+                    "hdnAnexos": hdn_anexos,
+                    "btnSalvar": "Salvar",
+                },
+            )
+
+        if "ifrArvore" not in pagina.iframes:
+            raise ErroSEI("SEI não retornou para a página do processo após salvar")
+        self._pagina_atual = pagina
+        # Conferido na árvore junto com os outros envios da visita
+        if primeiro:
+            self._nos_anteriores = anteriores
+        self.envios_pendentes.append(
+            EnvioPendente(nome_arquivo, processo, data_atual, nome_arvore)
+        )
+        self.logger.info("Documento enviado; conferência ao deixar o processo")
+
+    def reprocessar_falhas(self, diretorio, resumo):
+        if self.fallback_selenium and self._credenciais:
+            self._reprocessar_com_selenium(*self._credenciais, diretorio, resumo)
+
+    def _reprocessar_com_selenium(self, usuario, senha, diretorio, resumo):
+        """Tenta de novo, pelo navegador, os arquivos que falharam via HTTP."""
+        from selenium_handler import SEIAutomation
+
+        self.logger.warning(
+            f"{len(resumo.falhas)} arquivo(s) falharam via HTTP; tentando pelo navegador"
+        )
+        diario = None
+        automacao = None
+        controle = self.controle or ControleExecucao()
+        try:
+            automacao = SEIAutomation(
+                logger=self.logger, headless=self.headless, perfil=self.perfil
+            )
+        except Exception as e:
+            # Sem navegador os arquivos continuam com a falha do HTTP; os
+            # sucessos já registrados não se perdem
+            self.logger.error(
+                f"Navegador não iniciou ({str(e)}); {len(resumo.falhas)} "
+                "arquivo(s) continuam com falha"
+            )
+            return
+        automacao.metricas = self.metricas
+        # Mesmo ritmo: se o SEI estiver instável, o navegador também espera
+        automacao.ritmo = self.ritmo
+        try:
+            if self.usar_diario:
+                from diario import DiarioLote
+
+                diario = DiarioLote(diretorio)
+                diario.acompanhar([r.arquivo for r in resumo.falhas])
+            with automacao.etapa("login"):
+                automacao.login(usuario, senha)
+            for anterior in resumo.falhas:
+                if not automacao.aguardar_vez(controle) or controle.cancelado:
+                    break
+                automacao.aplicar_conferencia(
+                    resumo, diario, proximo=processo_do_arquivo(anterior.arquivo)
+                )
+                resultado = automacao.enviar_arquivo(diretorio, anterior.arquivo, diario)
+                resumo.substituir(resultado)
+            automacao.aplicar_conferencia(resumo, diario)
+        except Exception as e:
+            self.logger.error(
+                f"Erro no reprocessamento pelo navegador: {str(e)}", exc_info=True
+            )
+        finally:
+            resumo.somar(automacao.contadores())
+            automacao.fechar()
+            if diario:
+                diario.fechar()
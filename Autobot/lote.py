@@ -0,0 +1,826 @@
+import os
+import re
+import time
+import threading
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from dataclasses import dataclass, field, replace
+
+from conferencia import conferir
+from metricas import RegistroTempos
+from registro import campos_log
+from ritmo import ritmo_da_execucao
+from sessao import CacheSessao
+
+
+# Status possíveis de um arquivo ao final do processamento
+STATUS_SUCESSO = "sucesso"
+STATUS_FALHA = "falha"
+
+
+class ErroSEI(Exception):
+    """
+    Erro mostrado pelo próprio SEI ou página diferente da esperada (processo
+    inexistente, botão ausente, formulário sem o tipo). Repete-se a cada
+    tentativa, ao contrário de um tempo esgotado.
+    """
+
+
+# Vários arquivos do mesmo processo: 00123.2024.pdf, 00123.2024_2.pdf, ...
+SUFIXO_ARQUIVO = re.compile(r"_(\d+)$")
+
+
+def listar_arquivos(diretorio):
+    return [f for f in os.listdir(diretorio) if f.lower().endswith(".pdf")]
+
+
+def _nome_sem_extensao(arquivo):
+    nome, extensao = os.path.splitext(arquivo)
+    return nome if extensao.lower() == ".pdf" else arquivo
+
+
+def processo_do_arquivo(arquivo):
+    processo_base = SUFIXO_ARQUIVO.sub("", _nome_sem_extensao(arquivo))
+    return processo_base.replace(".", "/")
+
+
+def ordem_no_processo(arquivo):
+    """1 para 00123.2024.pdf, N para 00123.2024_N.pdf."""
+    sufixo = SUFIXO_ARQUIVO.search(_nome_sem_extensao(arquivo))
+    return int(sufixo.group(1)) if sufixo else 1
+
+
+def agrupar_por_processo(arquivos):
+    """
+    Lista de grupos de arquivos do mesmo processo, na ordem em que cada
+    processo aparece, para que todos sejam incluídos numa única visita.
+    """
+    grupos = {}
+    for arquivo in arquivos:
+        grupos.setdefault(processo_do_arquivo(arquivo), []).append(arquivo)
+    return [sorted(grupo, key=ordem_no_processo) for grupo in grupos.values()]
+
+
+@dataclass
+class ResultadoArquivo:
+    arquivo: str
+    processo: str
+    status: str
+    erro: str = ""
+    duracao: float = 0.0
+    worker: str = ""
+    # Falha que pode ser do SEI instável (tempo esgotado, conexão, erro 5xx)
+    instabilidade: bool = False
+
+    @property
+    def sucesso(self):
+        return self.status == STATUS_SUCESSO
+
+
+@dataclass
+class ResumoExecucao:
+    resultados: list = field(default_factory=list)
+    ignorados: list = field(default_factory=list)
+    rejeitados: list = field(default_factory=list)
+    contadores: dict = field(default_factory=dict)
+    nao_processados: list = field(default_factory=list)
+    cancelado: bool = False
+    inicio: float = field(default_factory=time.monotonic)
+    fim: float = 0.0
+
+    def adicionar(self, resultado):
+        self.resultados.append(resultado)
+
+    def substituir(self, resultado):
+        """Troca o resultado anterior do mesmo arquivo (nova tentativa)."""
+        for indice, anterior in enumerate(self.resultados):
+            if anterior.arquivo == resultado.arquivo:
+                self.resultados[indice] = resultado
+                return
+        self.resultados.append(resultado)
+
+    def reprovar(self, arquivo, erro):
+        """Transforma em falha o resultado de um arquivo cujo envio não se confirmou."""
+        for resultado in self.resultados:
+            if resultado.arquivo == arquivo:
+                resultado.status = STATUS_FALHA
+                resultado.erro = erro
+                return resultado
+        return None
+
+    def ignorar(self, arquivo, motivo):
+        self.ignorados.append((arquivo, motivo))
+
+    def rejeitar(self, arquivo, motivo):
+        self.rejeitados.append((arquivo, motivo))
+
+    def cancelar(self, arquivos_restantes):
+        self.cancelado = True
+        self.nao_processados.extend(arquivos_restantes)
+
+    def incorporar(self, outro, prefixo=""):
+        """
+        Junta ao resumo os resultados de outro lote, com `prefixo` (a pasta)
+        antes do nome de cada arquivo.
+        """
+        def nome(arquivo):
+            return os.path.join(prefixo, arquivo) if prefixo else arquivo
+
+        for resultado in outro.resultados:
+            self.adicionar(replace(resultado, arquivo=nome(resultado.arquivo)))
+        self.ignorados.extend((nome(a), motivo) for a, motivo in outro.ignorados)
+        self.rejeitados.extend((nome(a), motivo) for a, motivo in outro.rejeitados)
+        self.nao_processados.extend(nome(a) for a in outro.nao_processados)
+        self.cancelado = self.cancelado or outro.cancelado
+        self.somar(outro.contadores)
+
+    def somar(self, contadores):
+        for nome, valor in contadores.items():
+            self.contadores[nome] = self.contadores.get(nome, 0) + valor
+
+    def finalizar(self):
+        self.fim = time.monotonic()
+        return self
+
+    @property
+    def sucessos(self):
+        return [r for r in self.resultados if r.sucesso]
+
+    @property
+    def falhas(self):
+        return [r for r in self.resultados if not r.sucesso]
+
+    @property
+    def duracao(self):
+        return (self.fim or time.monotonic()) - self.inicio
+
+    @property
+    def documentos_por_minuto(self):
+        minutos = self.duracao / 60
+        return len(self.sucessos) / minutos if minutos > 0 else 0.0
+
+    def texto(self):
+        linhas = [
+            f"Arquivos processados: {len(self.resultados)}",
+            f"Sucessos: {len(self.sucessos)}",
+            f"Falhas: {len(self.falhas)}",
+            f"Ignorados: {len(self.ignorados)}",
+            f"Rejeitados na validação: {len(self.rejeitados)}",
+            f"Tempo total: {self.duracao:.1f}s",
+            f"Documentos por minuto: {self.documentos_por_minuto:.1f}",
+        ]
+        if self.cancelado:
+            linhas.append(
+                f"Cancelada pelo usuário: {len(self.nao_processados)} "
+                "arquivo(s) não processado(s)"
+            )
+        for nome, valor in self.contadores.items():
+            linhas.append(f"{nome}: {valor}")
+        for resultado in self.falhas:
+            linhas.append(f"  - {resultado.arquivo}: {resultado.erro}")
+        for arquivo, motivo in self.rejeitados:
+            linhas.append(f"  - {arquivo}: rejeitado, {motivo}")
+        return "\n".join(linhas)
+
+
+class ControleExecucao:
+    """
+    Cancelamento cooperativo e aviso de progresso de uma execução. Pode ser
+    compartilhado entre threads: o cancelamento só é atendido entre um
+    documento e outro, nunca no meio de um envio.
+    """
+
+    def __init__(self, ao_progredir=None):
+        # ao_progredir(feitos, total, arquivo_atual); arquivo_atual é None
+        # quando o aviso é de um arquivo concluído
+        self.ao_progredir = ao_progredir
+        self._cancelar = threading.Event()
+        self._lock = threading.Lock()
+        self.total = 0
+        self.feitos = 0
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    @property
+    def cancelado(self):
+        return self._cancelar.is_set()
+
+    def iniciar(self, total):
+        with self._lock:
+            self.total = total
+            self.feitos = 0
+        self._notificar(None)
+
+    def adicionar(self, quantidade=1):
+        """Aumenta o total quando novos arquivos chegam durante a execução."""
+        with self._lock:
+            self.total += quantidade
+        self._notificar(None)
+
+    def comecando(self, arquivo):
+        self._notificar(arquivo)
+
+    def concluido(self):
+        with self._lock:
+            self.feitos += 1
+        self._notificar(None)
+
+    def _notificar(self, arquivo):
+        if self.ao_progredir:
+            self.ao_progredir(self.feitos, self.total, arquivo)
+
+
+def aplicar_validacao(diretorio, arquivos, resumo, logger):
+    """
+    Valida os arquivos antes de qualquer acesso ao SEI e registra no resumo
+    os rejeitados, que são listados no log imediatamente.
+    """
+    from validacao import validar_lote
+
+    arquivos, rejeitados = validar_lote(diretorio, arquivos)
+    if rejeitados:
+        logger.warning(
+            f"{len(rejeitados)} arquivo(s) rejeitado(s) na validação:\n"
+            + "\n".join(f"  - {arquivo}: {motivo}" for arquivo, motivo in rejeitados)
+        )
+    for arquivo, motivo in rejeitados:
+        resumo.rejeitar(arquivo, motivo)
+    return arquivos
+
+
+def aplicar_diario(diario, arquivos, resumo, logger):
+    """Filtra pelo diário os arquivos do lote, registrando os ignorados no resumo."""
+    for arquivo in diario.interrompidos():
+        logger.warning(
+            f"O envio de {arquivo} ficou sem conferência no lote anterior; "
+            "o documento será procurado na árvore do processo antes de um novo "
+            "envio"
+        )
+    arquivos, ignorados = diario.filtrar(arquivos)
+    for arquivo, motivo in ignorados:
+        logger.info(f"Ignorando {arquivo}: {motivo}")
+        resumo.ignorar(arquivo, motivo)
+    return arquivos
+
+
+class ProcessadorLote(ABC):
+    """
+    Fluxo de processamento comum aos motores: execução, sessão salva, cache
+    de processos, envio de cada arquivo e conferência na árvore. A classe que
+    herda precisa ter self.logger e implementar os ganchos abstratos (login,
+    pesquisa e inclusão no SEI, leitura da árvore, troca de unidade); sem
+    eles o motor falha ao ser criado, não no meio do lote.
+    """
+
+    nome_motor = ""  # "navegador" ou "HTTP", mostrado no início da execução
+    usar_diario = True
+    validar = True
+    controle = None  # ControleExecucao opcional, definido por quem executa
+    metricas = None  # RegistroTempos da execução, quando houver
+    ritmo = None  # PoliticaRitmo, compartilhada entre as sessões de uma execução
+    envios_pendentes = ()  # EnvioPendente do processo aberto, ainda não conferidos
+    _nos_anteriores = ()  # ids dos documentos que a árvore já tinha antes deles
+    tentativas_conferencia = 3
+    unidade_atual = None  # sigla da unidade da sessão, depois da primeira troca
+    usar_cache_sessao = False
+    usuario_logado = None
+    url_inicial = None  # página inicial, que identifica a sessão no cache de processos
+    cache_processos = None  # CacheProcessos, quando o motor usa um
+    processo_aberto = None  # processo cuja página é a atual, após o último documento
+    reaproveitamentos = 0
+
+    def executar(self, usuario, senha, diretorio, fechar_navegador=True):
+        proprias = self.metricas is None
+        if proprias:
+            self.metricas = RegistroTempos()
+        try:
+            self.logger.info(f"Iniciando processo de automação ({self.nome_motor})")
+            resumo = ResumoExecucao()
+            arquivos = self.preparar_arquivos(diretorio, resumo)
+            if arquivos:
+                with self.etapa("login"):
+                    self.login(usuario, senha)
+            return self.processar_arquivos(diretorio, arquivos, resumo)
+        except Exception as e:
+            self.logger.error(f"Erro durante a execução: {str(e)}", exc_info=True)
+            raise
+        finally:
+            self.logger.info("Finalizando automação")
+            self.registrar_recursos()
+            if proprias:
+                self.metricas.finalizar()
+                self.metricas = None
+            if fechar_navegador:
+                self.fechar()
+
+    def registrar_recursos(self):
+        """Registra no log o que o motor ocupou, ao fim da execução. Nada por padrão."""
+
+    def memoria_mb(self):
+        """Memória ocupada pelo navegador do motor; None quando não há navegador."""
+        return None
+
+    def etapa(self, nome, **campos):
+        """Mede a duração do bloco como uma etapa da execução."""
+        if self.metricas is None:
+            return nullcontext()
+        return self.metricas.etapa(nome, **campos)
+
+    def registrar_documento(self, resultado):
+        if self.metricas is not None:
+            from metricas import ETAPA_DOCUMENTO
+
+            self.metricas.registrar(
+                ETAPA_DOCUMENTO,
+                resultado.duracao,
+                status="ok" if resultado.sucesso else "erro",
+                arquivo=resultado.arquivo,
+                processo=resultado.processo,
+            )
+
+    def contadores(self):
+        """Estatísticas do motor somadas ao resumo da execução."""
+        contadores = {}
+        if self.reaproveitamentos:
+            contadores["Páginas de processo reaproveitadas"] = self.reaproveitamentos
+            self.reaproveitamentos = 0
+        if self.cache_processos:
+            contadores.update(self.cache_processos.contadores())
+            self.cache_processos.zerar()
+        return contadores
+
+    def reprocessar_falhas(self, diretorio, resumo):
+        """
+        Nova chance para os arquivos que falharam, depois das tentativas do
+        lote e antes do resumo. Nenhuma por padrão.
+        """
+
+    @abstractmethod
+    def login(self, usuario, senha):
+        """Entra no SEI, depois de tentar _restaurar_sessao."""
+
+    @abstractmethod
+    def fechar(self):
+        """Libera o navegador ou as conexões do motor."""
+
+    # Sessão salva
+
+    @abstractmethod
+    def sessao_ativa(self):
+        """Indica se a sessão mantida aberta entre execuções ainda está logada."""
+
+    @abstractmethod
+    def aplicar_sessao(self, cookies, url_inicial):
+        """
+        Passa a usar os cookies de uma sessão salva e abre a página inicial
+        dela; True se o SEI aceitar a sessão.
+        """
+
+    def _restaurar_sessao(self, usuario):
+        # Sessão mantida aberta entre execuções e ainda logada
+        if self.usuario_logado == usuario and self.sessao_ativa():
+            self.logger.info("Sessão já logada; login dispensado")
+            return True
+
+        if not self.usar_cache_sessao:
+            return False
+        cache = CacheSessao(usuario)
+        dados = cache.carregar()
+        if not dados:
+            return False
+
+        if self.aplicar_sessao(dados["cookies"], dados["url_inicial"]):
+            self.logger.info("Sessão salva reaproveitada; login dispensado")
+            self.usuario_logado = usuario
+            return True
+
+        self.logger.info("Sessão salva expirou; fazendo login")
+        cache.invalidar()
+        return False
+
+    # Abertura do processo
+
+    @abstractmethod
+    def pesquisar_processo(self, processo):
+        """
+        Abre a página do processo pela pesquisa rápida; levanta ErroSEI se o
+        SEI mostrar outra página no lugar dela.
+        """
+
+    @abstractmethod
+    def abrir_endereco(self, url):
+        """Abre um endereço do cache de processos; True se o processo abrir."""
+
+    @abstractmethod
+    def endereco_atual(self):
+        """Endereço da página aberta, guardado no cache de processos."""
+
+    def _abrir_do_cache(self, processo):
+        url = self.cache_processos.obter(self.url_inicial, processo)
+        if url is None:
+            self.cache_processos.registrar_falta()
+            return False
+
+        if self.abrir_endereco(url):
+            self.cache_processos.registrar_acerto()
+            self.logger.info(f"Processo {processo} aberto pelo cache")
+            return True
+
+        self.logger.info(
+            f"Endereço em cache do processo {processo} não abre mais; pesquisando"
+        )
+        self.cache_processos.invalidar(self.url_inicial, processo)
+        self.cache_processos.registrar_falta()
+        return False
+
+    def buscar_processo(self, processo):
+        with self.etapa("buscar_processo", processo=processo):
+            if self.cache_processos and self._abrir_do_cache(processo):
+                return
+            self.pesquisar_processo(processo)
+            if self.cache_processos:
+                self.cache_processos.gravar(
+                    self.url_inicial, processo, self.endereco_atual()
+                )
+
+    def antes_de_abrir_processo(self):
+        """Chamado antes de deixar um processo para abrir outro. Nada por padrão."""
+
+    # Envio
+
+    @abstractmethod
+    def incluir_documento(self, processo, diretorio, nome_arquivo=None):
+        """
+        Inclui o arquivo como documento externo no processo aberto e o põe
+        em envios_pendentes, para a conferência ao deixar o processo.
+        """
+
+    def processar_arquivo(self, diretorio, arquivo):
+        """Envia um arquivo e retorna o ResultadoArquivo, sem levantar exceções."""
+        inicio = time.monotonic()
+        processo = processo_do_arquivo(arquivo)
+        try:
+            self.logger.info(f"Processando arquivo: {arquivo}")
+
+            if processo == self.processo_aberto:
+                # Outro arquivo do mesmo processo: a página dele já está aberta
+                self.logger.info(f"Reaproveitando a página do processo {processo}")
+                self.reaproveitamentos += 1
+            else:
+                self.processo_aberto = None
+                self.antes_de_abrir_processo()
+                self.buscar_processo(processo)
+            self.incluir_documento(processo, diretorio, arquivo)
+            self.processo_aberto = processo
+
+            duracao = time.monotonic() - inicio
+            self.logger.info(
+                f"Arquivo {arquivo} processado com sucesso", extra={"duracao": duracao}
+            )
+            return ResultadoArquivo(arquivo, processo, STATUS_SUCESSO, duracao=duracao)
+
+        except Exception as e:
+            self.processo_aberto = None
+            duracao = time.monotonic() - inicio
+            self.logger.error(
+                f"Erro ao processar {arquivo}: {str(e)}",
+                exc_info=True,
+                extra={"duracao": duracao},
+            )
+            return ResultadoArquivo(
+                arquivo,
+                processo,
+                STATUS_FALHA,
+                erro=str(e),
+                duracao=duracao,
+                instabilidade=self.falha_transitoria(e),
+            )
+
+    @abstractmethod
+    def falha_transitoria(self, erro):
+        """
+        Indica se a exceção de um envio pode ser instabilidade do SEI, e não
+        um erro que se repetiria a cada tentativa. Só essas contam para o
+        ritmo.
+        """
+
+    @abstractmethod
+    def trocar_unidade(self, unidade):
+        """
+        Passa a sessão para a unidade (sigla) pelo seletor de unidades do
+        SEI. Cada motor implementa a sua troca.
+        """
+
+    def entrar_na_unidade(self, unidade):
+        """Troca de unidade só quando a sessão estiver em outra."""
+        if not unidade or unidade == self.unidade_atual:
+            return
+        with self.etapa("trocar_unidade", unidade=unidade):
+            self.trocar_unidade(unidade)
+        self.unidade_atual = unidade
+        self.logger.info(f"Sessão na unidade {unidade}")
+
+    @abstractmethod
+    def ler_arvore(self, minimo):
+        """
+        Nós (id, texto, titulo) dos documentos na árvore do processo aberto,
+        de preferência depois de haver ao menos `minimo` deles. Cada motor
+        implementa a sua leitura.
+        """
+
+    def listar_arvore(self, processo, minimo):
+        if self.processo_aberto != processo:
+            # Uma falha no meio da visita trocou a página do processo
+            self.buscar_processo(processo)
+            self.processo_aberto = processo
+        return self.ler_arvore(minimo)
+
+    def conferir_envios(self):
+        """
+        Confere na árvore do processo os envios pendentes e esvazia a lista.
+        Retorna (arquivo, motivo) dos que não foram confirmados.
+        """
+        pendentes, self.envios_pendentes = list(self.envios_pendentes), []
+        if not pendentes:
+            return []
+        processo = pendentes[0].processo
+        minimo = len(self._nos_anteriores) + len(pendentes)
+        for tentativa in range(1, self.tentativas_conferencia + 1):
+            try:
+                nos = self.listar_arvore(processo, minimo)
+                break
+            except Exception as e:
+                # Uma leitura que falhou não diz nada sobre os envios: reabre
+                # o processo e lê de novo antes de dar os envios como falhos
+                self.processo_aberto = None
+                erro = e
+                self.logger.warning(
+                    f"Tentativa {tentativa}: árvore do processo {processo} "
+                    f"não foi lida: {str(e)}"
+                )
+        else:
+            motivo = f"não foi possível conferir na árvore: {str(erro)}"
+            return [(pendente.arquivo, motivo) for pendente in pendentes]
+        return conferir(nos, pendentes, self._nos_anteriores)
+
+    def aplicar_conferencia(self, resumo, diario=None, lock=None, proximo=None):
+        """
+        Confere os envios pendentes, a não ser que o próximo arquivo seja do
+        mesmo processo, e transforma em falha os que não se confirmaram.
+        Retorna os resultados reprovados.
+        """
+        if not self.envios_pendentes or self.envios_pendentes[0].processo == proximo:
+            return []
+        enviados = [pendente.arquivo for pendente in self.envios_pendentes]
+        processo = self.envios_pendentes[0].processo
+        with self.etapa("conferencia", processo=processo):
+            nao_confirmados = self.conferir_envios()
+        self.logger.info(
+            f"Conferência na árvore do processo {processo}: "
+            f"{len(enviados) - len(nao_confirmados)} de {len(enviados)} "
+            "documento(s) confirmado(s)"
+        )
+        if diario:
+            reprovados_arquivos = {arquivo for arquivo, _ in nao_confirmados}
+            for arquivo in enviados:
+                if arquivo not in reprovados_arquivos:
+                    diario.confirmar(arquivo)
+        reprovados = []
+        for arquivo, motivo in nao_confirmados:
+            self.logger.warning(f"Envio de {arquivo} não confirmado: {motivo}")
+            with lock or nullcontext():
+                resultado = resumo.reprovar(arquivo, motivo)
+            if resultado is None:
+                continue
+            if diario:
+                diario.reprovar(resultado)
+            reprovados.append(resultado)
+        return reprovados
+
+    def aguardar_vez(self, controle):
+        """Espera o ritmo liberar o próximo documento; False se cancelado."""
+        if self.ritmo is None:
+            return True
+        return self.ritmo.aguardar(controle)
+
+    def conferir_envio_anterior(self, anterior, diario):
+        """
+        Procura na árvore do processo o documento de um envio que o lote
+        anterior deixou sem conferência. Retorna o resultado quando não há o
+        que enviar (o documento já está lá, ou a árvore não pôde ser lida) e
+        None quando o arquivo precisa ser enviado de novo.
+        """
+        arquivo, processo = anterior.arquivo, anterior.processo
+        inicio = time.monotonic()
+        try:
+            with self.etapa("conferencia.anterior", processo=processo):
+                nos = self.listar_arvore(processo, 0)
+        except Exception as e:
+            # Sem ler a árvore não se sabe se o documento já está lá: não
+            # reenvia, e o diário continua aguardando a conferência
+            self.processo_aberto = None
+            duracao = time.monotonic() - inicio
+            self.logger.error(
+                f"Envio anterior de {arquivo} não foi conferido na árvore: {str(e)}",
+                exc_info=True,
+                extra={"duracao": duracao},
+            )
+            return ResultadoArquivo(
+                arquivo,
+                processo,
+                STATUS_FALHA,
+                erro=f"envio anterior não conferido na árvore: {str(e)}",
+                duracao=duracao,
+                instabilidade=self.falha_transitoria(e),
+            )
+        if conferir(nos, [anterior]):
+            self.logger.info(
+                f"{arquivo} não está na árvore do processo {processo}; "
+                "enviando de novo"
+            )
+            return None
+        diario.confirmar(arquivo)
+        self.logger.info(
+            f"{arquivo} já está na árvore do processo {processo}, enviado no lote "
+            "anterior; não será enviado de novo"
+        )
+        return ResultadoArquivo(
+            arquivo, processo, STATUS_SUCESSO, duracao=time.monotonic() - inicio
+        )
+
+    def enviar_arquivo(self, diretorio, arquivo, diario=None, tentativa=1):
+        """Processa um arquivo registrando-o no diário, nas métricas e no ritmo."""
+        # Os registros de log do envio levam o arquivo, o processo e a tentativa
+        with campos_log(
+            arquivo=arquivo, processo=processo_do_arquivo(arquivo), tentativa=tentativa
+        ):
+            anterior = diario.envio_sem_conferencia(arquivo) if diario else None
+            if anterior is not None:
+                resultado = self.conferir_envio_anterior(anterior, diario)
+                if resultado is not None:
+                    if not resultado.sucesso and self.ritmo is not None:
+                        self.ritmo.registrar(
+                            False, resultado.duracao, resultado.instabilidade
+                        )
+                    return resultado
+            if diario:
+                diario.iniciar(arquivo)
+            resultado = self.processar_arquivo(diretorio, arquivo)
+        self.registrar_documento(resultado)
+        if self.ritmo is not None:
+            self.ritmo.registrar(
+                resultado.sucesso, resultado.duracao, resultado.instabilidade
+            )
+        if diario:
+            diario.registrar(resultado)
+        return resultado
+
+    def reenviar_adiados(self, diretorio, resumo, controle, diario=None):
+        """
+        Tenta de novo, ao final do lote, os arquivos que falharam, para que
+        uma instabilidade passageira do SEI não exija uma nova execução.
+        """
+        tentativas = self.ritmo.tentativas_adiadas if self.ritmo else 0
+        for tentativa in range(1, tentativas + 1):
+            adiados = [r.arquivo for r in resumo.falhas]
+            if not adiados:
+                return
+            self.logger.info(
+                f"Nova tentativa ({tentativa}/{tentativas}) para "
+                f"{len(adiados)} arquivo(s) que falharam"
+            )
+            recuperados = []
+            for arquivo in adiados:
+                if not self.aguardar_vez(controle) or controle.cancelado:
+                    break
+                self.aplicar_conferencia(
+                    resumo, diario, proximo=processo_do_arquivo(arquivo)
+                )
+                controle.comecando(arquivo)
+                resultado = self.enviar_arquivo(
+                    diretorio, arquivo, diario, tentativa=tentativa + 1
+                )
+                resumo.substituir(resultado)
+                recuperados.append(resultado)
+            self.aplicar_conferencia(resumo, diario)
+            for resultado in recuperados:
+                # Depois da conferência, que pode ter reprovado o envio
+                if resultado.sucesso:
+                    self.ritmo.recuperado()
+            if controle.cancelado:
+                return
+
+    def enviar_grupo(
+        self,
+        diretorio,
+        arquivos,
+        resumo,
+        controle,
+        tentativas,
+        diario=None,
+        lock=None,
+        adiado=False,
+        worker="",
+    ):
+        """
+        Envia numa visita os arquivos de um processo e confere o grupo na
+        árvore, para as sessões paralelas, que dividem o resumo e o dicionário
+        de tentativas por (diretorio, arquivo) sob o `lock`. Retorna
+        (restantes, falhas): os arquivos que o cancelamento deixou sem envio
+        e os que falharam e ainda têm direito a uma nova tentativa.
+        """
+        lock = lock or nullcontext()
+        resultados = []
+        restantes = []
+        for indice, arquivo in enumerate(arquivos):
+            if not self.aguardar_vez(controle) or controle.cancelado:
+                restantes = arquivos[indice:]
+                break
+            controle.comecando(arquivo)
+            tentativa = tentativas.get((diretorio, arquivo), 0) + 1 if adiado else 1
+            resultado = self.enviar_arquivo(diretorio, arquivo, diario, tentativa)
+            resultado.worker = worker
+            with lock:
+                if adiado:
+                    resumo.substituir(resultado)
+                else:
+                    resumo.adicionar(resultado)
+            resultados.append(resultado)
+            if not adiado:
+                controle.concluido()
+        # O grupo é de um processo só: uma conferência por grupo
+        self.aplicar_conferencia(resumo, diario, lock)
+
+        limite = self.ritmo.tentativas_adiadas if self.ritmo else 0
+        falhas = []
+        with lock:
+            for resultado in resultados:
+                chave = (diretorio, resultado.arquivo)
+                if resultado.sucesso:
+                    # Depois da conferência, que pode ter reprovado o envio
+                    if adiado and self.ritmo is not None:
+                        self.ritmo.recuperado()
+                elif tentativas.get(chave, 0) < limite:
+                    tentativas[chave] = tentativas.get(chave, 0) + 1
+                    falhas.append(resultado.arquivo)
+        if falhas:
+            self.logger.info(
+                f"{len(falhas)} arquivo(s) adiado(s) para uma nova tentativa"
+            )
+        return restantes, falhas
+
+    def preparar_arquivos(self, diretorio, resumo):
+        """Lista e valida os arquivos do lote, antes do login no SEI."""
+        arquivos = listar_arquivos(diretorio)
+        if self.validar:
+            arquivos = aplicar_validacao(diretorio, arquivos, resumo, self.logger)
+        return arquivos
+
+    def processar_arquivos(self, diretorio, arquivos=None, resumo=None):
+        self.logger.info(f"Iniciando processamento de arquivos em {diretorio}")
+        if resumo is None:
+            resumo = ResumoExecucao()
+        if arquivos is None:
+            arquivos = self.preparar_arquivos(diretorio, resumo)
+
+        # Arquivos do mesmo processo em sequência, reaproveitando a página
+        arquivos = [a for grupo in agrupar_por_processo(arquivos) for a in grupo]
+
+        diario = None
+        if self.usar_diario:
+            from diario import DiarioLote
+
+            diario = DiarioLote(diretorio)
+            arquivos = aplicar_diario(diario, arquivos, resumo, self.logger)
+
+        self.ritmo = ritmo_da_execucao(self.ritmo)
+
+        controle = self.controle or ControleExecucao()
+        controle.iniciar(len(arquivos))
+        try:
+            for indice, arquivo in enumerate(arquivos):
+                if not self.aguardar_vez(controle) or controle.cancelado:
+                    self.logger.warning("Execução cancelada pelo usuário")
+                    resumo.cancelar(arquivos[indice:])
+                    break
+                self.aplicar_conferencia(
+                    resumo, diario, proximo=processo_do_arquivo(arquivo)
+                )
+                controle.comecando(arquivo)
+                resultado = self.enviar_arquivo(diretorio, arquivo, diario)
+                resumo.adicionar(resultado)
+                controle.concluido()
+            self.aplicar_conferencia(resumo, diario)
+            if not controle.cancelado:
+                self.reenviar_adiados(diretorio, resumo, controle, diario)
+        finally:
+            if diario:
+                diario.fechar()
+
+        if not controle.cancelado and resumo.falhas:
+            self.reprocessar_falhas(diretorio, resumo)
+        resumo.somar(self.contadores())
+        resumo.somar(self.ritmo.contadores())
+        self.logger.info(resumo.texto())
+        return resumo.finalizar()
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import registro
+from registro import campos_log
+
+
+ETAPA_DOCUMENTO = "documento"
+
+_sequencia = itertools.count(1)
+
+
+def percentil(valores, p):
+    """Percentil com interpolação linear; valores precisa estar ordenado."""
+    if not valores:
+        return 0.0
+    posicao = (len(valores) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(valores) - 1)
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (
+        posicao - inferior
+    )
+
+
+class RegistroTempos:
+    """
+    Mede a duração de cada etapa da automação e grava um registro JSONL por
+    execução (uma linha por etapa medida). Ao final gera o resumo com
+    p50/p95/máximo por etapa e documentos por minuto. As linhas seguem pela
+    fila do log e são gravadas pela thread dele, fora do tempo medido.
+    """
+
+    def __init__(self, diretorio="logs", caminho=None):
+        if caminho is None and diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+            nome = datetime.now().strftime("tempos_%Y%m%d_%H%M%S_%f.jsonl")
+            caminho = os.path.join(diretorio, nome)
+        self.caminho = caminho
+        self.inicio = time.monotonic()
+        self.duracoes = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.arquivo = None
+        if caminho:
+            # Um logger por registro, com o arquivo como único destino
+            nome_logger = f"{__name__}.tempos{next(_sequencia)}"
+            self.logger_tempos = logging.getLogger(nome_logger)
+            self.logger_tempos.setLevel(logging.INFO)
+            self.arquivo = logging.FileHandler(caminho, encoding="utf-8")
+            self.arquivo.setFormatter(logging.Formatter("%(message)s"))
+            registro.assinar(self.arquivo, self.logger_tempos.name, exclusivo=True)
+
+    @contextmanager
+    def etapa(self, nome, **campos):
+        inicio = time.perf_counter()
+        status = "ok"
+        try:
+            with campos_log(etapa=nome):
+                yield
+        except BaseException:
+            status = "erro"
+            raise
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio, status=status, **campos)
+
+    def registrar(self, nome, duracao, status="ok", **campos):
+        registro = {
+            "momento": datetime.now().isoformat(timespec="milliseconds"),
+            "etapa": nome,
+            "duracao": round(duracao, 4),
+            "status": status,
+            "thread": threading.current_thread().name,
+            **campos,
+        }
+        with self.lock:
+            self.duracoes.setdefault(nome, []).append((duracao, status))
+        if self.arquivo:
+            self.logger_tempos.info(json.dumps(registro, ensure_ascii=False))
+
+    def resumo(self):
+        """{etapa: {"n", "erros", "p50", "p95", "max", "total"}} e documentos por minuto."""
+        with self.lock:
+            etapas = {}
+            for nome, medidas in self.duracoes.items():
+                valores = sorted(duracao for duracao, _ in medidas)
+                etapas[nome] = {
+                    "n": len(valores),
+                    "erros": sum(1 for _, status in medidas if status != "ok"),
+                    "p50": percentil(valores, 50),
+                    "p95": percentil(valores, 95),
+                    "max": valores[-1],
+                    "total": sum(valores),
+                }
+            documentos = sum(
+                1 for _, status in self.duracoes.get(ETAPA_DOCUMENTO, []) if status == "ok"
+            )
+        minutos = (time.monotonic() - self.inicio) / 60
+        por_minuto = documentos / minutos if minutos > 0 else 0.0
+        return etapas, por_minuto
+
+    def texto_resumo(self):
+        etapas, por_minuto = self.resumo()
+        linhas = [
+            f"{'Etapa':<28}{'n':>6}{'erros':>7}{'p50':>9}{'p95':>9}{'max':>9}{'total':>10}"
+        ]
+        for nome, dados in sorted(etapas.items(), key=lambda item: -item[1]["total"]):
+            linhas.append(
+                f"{nome:<28}{dados['n']:>6}{dados['erros']:>7}"
+                f"{dados['p50']:>8.2f}s{dados['p95']:>8.2f}s{dados['max']:>8.2f}s"
+                f"{dados['total']:>9.1f}s"
+            )
+        linhas.append(f"Documentos por minuto: {por_minuto:.1f}")
+        return "\n".join(linhas)
+
+    def finalizar(self):
+        """Registra o resumo no log e no próprio JSONL e fecha o arquivo."""
+        etapas, por_minuto = self.resumo()
+        self.logger.info("Desempenho da execução:\n" + self.texto_resumo())
+        if self.arquivo:
+            resumo = {
+                "momento": datetime.now().isoformat(timespec="milliseconds"),
+                "etapa": "resumo",
+                "etapas": {
+                    nome: {chave: round(valor, 4) for chave, valor in dados.items()}
+                    for nome, dados in etapas.items()
+                },
+                "documentos_por_minuto": round(por_minuto, 2),
+            }
+            self.logger_tempos.info(json.dumps(resumo, ensure_ascii=False))
+            registro.cancelar_assinatura(
+                self.arquivo, self.logger_tempos.name, fechar=True
+            )
+            self.arquivo = None
+        if self.caminho:
+            self.logger.info(f"Tempos por etapa gravados em {self.caminho}")
@@ -0,0 +1,573 @@
+"""
+Servidor local que imita as páginas do SEI usadas pela automação, para testar
+os motores Selenium e HTTP sem acessar o sistema de produção.
+
+Uso:
+    python mock_sei.py --porta 8080
+
+e, no .env da automação:
+    SEI_URL=http://localhost:8080/
+
+Para simular uma rede lenta ou um servidor instável, use --latencia e
+--variacao (em milissegundos) e --taxa-erro (fração das requisições que
+recebem uma página de erro do SEI). Com --unidades o usuário pode trocar
+de unidade; um processo só recebe documentos na unidade em que foi aberto.
+"""
+
+import argparse
+import hashlib
+import hmac
+import html
+import itertools
+import logging
+import random
+import secrets
+import threading
+import time
+from datetime import datetime
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+
+ID_SERIE_COMPROVANTE = "12"
+
+PAGINA = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>SEI - {titulo}</title></head>
+<body>{corpo}</body></html>"""
+
+PESQUISA_RAPIDA = """
+<form id="frmProtocoloPesquisaRapida" method="post" action="{action}">
+  <input type="text" id="txtPesquisaRapida" name="txtPesquisaRapida" value="">
+</form>"""
+
+UNIDADES = """
+<form id="frmInfraUnidades" method="post" action="{action}">
+  <select id="selInfraUnidades" name="selInfraUnidades" onchange="this.form.submit()">{opcoes}</select>
+</form>"""
+
+SCRIPT_UPLOAD = """
+<script>
+document.getElementById('filArquivo').addEventListener('change', function () {
+  var input = this;
+  var form = document.getElementById('frmAnexos');
+  var dados = new FormData();
+  dados.append('filArquivo', input.files[0]);
+  document.getElementById('divArquivoProgresso').textContent = 'Enviando...';
+  fetch(form.action, {method: 'POST', body: dados, credentials: 'same-origin'})
+    .then(function (r) { return r.text(); })
+    .then(function (texto) {
+      var partes = texto.split('#');
+      var hdn = document.getElementById('hdnAnexos');
+      var linha = [partes[0], partes[1], partes[4], partes[3]].join('\\u00b1');
+      hdn.value = hdn.value ? hdn.value + '\\u00a5' + linha : linha;
+      var tr = document.createElement('tr');
+      tr.innerHTML = '<td>' + partes[1] + '</td><td>' + partes[3] + '</td>';
+      document.getElementById('tblAnexos').appendChild(tr);
+      document.getElementById('divArquivoProgresso').textContent = '';
+    });
+});
+document.getElementById('divOptNato').addEventListener('click', function () {
+  document.getElementById('optNato').checked = true;
+  document.getElementById('fldNivelAcesso').style.display = 'block';
+});
+document.getElementById('divOptPublico').addEventListener('click', function () {
+  document.getElementById('optPublico').checked = true;
+});
+</script>"""
+
+
+class EstadoSEI:
+    """Processos, documentos e sessões mantidos em memória pelo servidor."""
+
+    def __init__(
+        self,
+        usuarios=None,
+        processos=None,
+        unidades=None,
+        criar_processos=True,
+        latencia=0.0,
+        variacao=0.0,
+        taxa_erro=0.0,
+        semente=None,
+    ):
+        self.usuarios = usuarios  # None aceita qualquer usuário e senha
+        # Siglas das unidades; a primeira é a do login
+        self.unidades = list(unidades or ["FUNPRESP-JUD"])
+        self.criar_processos = criar_processos
+        # Atraso de cada resposta, em segundos: latencia ± variacao
+        self.latencia = latencia
+        self.variacao = variacao
+        # Fração das ações do controlador que falham com erro do SEI
+        self.taxa_erro = taxa_erro
+        self.erros_injetados = 0
+        self._aleatorio = random.Random(semente)
+        self.lock = threading.Lock()
+        self.sessoes = {}
+        self.processos = {}
+        self.uploads = {}
+        self._ids = itertools.count(1000)
+        # Lista de números ou {número: unidade}
+        if not isinstance(processos, dict):
+            processos = dict.fromkeys(processos or [])
+        for numero, unidade in processos.items():
+            self.obter_processo(numero, criar=True, unidade=unidade)
+
+    def atraso(self):
+        if not self.latencia and not self.variacao:
+            return 0.0
+        with self.lock:
+            desvio = self._aleatorio.uniform(-self.variacao, self.variacao)
+        return max(0.0, self.latencia + desvio)
+
+    def injetar_erro(self):
+        if not self.taxa_erro:
+            return False
+        with self.lock:
+            falhar = self._aleatorio.random() < self.taxa_erro
+            if falhar:
+                self.erros_injetados += 1
+        return falhar
+
+    def obter_processo(self, numero, criar=None, unidade=None):
+        criar = self.criar_processos if criar is None else criar
+        with self.lock:
+            processo = self.processos.get(numero)
+            if processo is None and criar:
+                processo = {
+                    "id": str(next(self._ids)),
+                    "numero": numero,
+                    "unidade": unidade or self.unidades[0],
+                    "documentos": [],
+                }
+                self.processos[numero] = processo
+            return processo
+
+    def processo_por_id(self, id_procedimento):
+        with self.lock:
+            for processo in self.processos.values():
+                if processo["id"] == id_procedimento:
+                    return processo
+        return None
+
+    def criar_sessao(self, usuario):
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.sessoes[token] = {
+                "usuario": usuario,
+                "chave": secrets.token_bytes(16),
+                "unidade": self.unidades[0],
+            }
+        return token
+
+    def encerrar_sessoes(self):
+        """Invalida todas as sessões, como quando o SEI expira os logins."""
+        with self.lock:
+            self.sessoes.clear()
+
+    def registrar_upload(self, nome, conteudo):
+        nome_upload = secrets.token_hex(8)
+        with self.lock:
+            self.uploads[nome_upload] = {"nome": nome, "conteudo": conteudo}
+        return nome_upload
+
+    def incluir_documento(self, processo, serie, data, nome_arquivo, tamanho):
+        with self.lock:
+            documento = {
+                "id": str(next(self._ids)),
+                "serie": serie,
+                "data": data,
+                "nome": nome_arquivo,
+                "tamanho": tamanho,
+            }
+            processo["documentos"].append(documento)
+            return documento
+
+
+class ManipuladorSEI(BaseHTTPRequestHandler):
+    estado = None  # definido por criar_servidor
+
+    def log_message(self, formato, *args):
+        logging.getLogger(__name__).debug(formato % args)
+
+    # Infraestrutura
+
+    def _sessao(self):
+        cookies = self.headers.get("Cookie", "")
+        for cookie in cookies.split(";"):
+            nome, _, valor = cookie.strip().partition("=")
+            if nome == "SEI_SESSAO":
+                return valor, self.estado.sessoes.get(valor)
+        return None, None
+
+    def _assinar(self, sessao, acao, **params):
+        query = urlencode({"acao": acao, **params})
+        assinatura = hmac.new(sessao["chave"], query.encode(), hashlib.sha256)
+        return f"/sei/controlador.php?{query}&infra_hash={assinatura.hexdigest()[:32]}"
+
+    def _href(self, sessao, acao, **params):
+        return html.escape(self._assinar(sessao, acao, **params))
+
+    def _assinatura_valida(self, sessao, query):
+        partes = [p for p in query.split("&") if not p.startswith("infra_hash=")]
+        recebido = parse_qs(query).get("infra_hash", [""])[0]
+        esperado = hmac.new(sessao["chave"], "&".join(partes).encode(), hashlib.sha256)
+        return hmac.compare_digest(recebido, esperado.hexdigest()[:32])
+
+    def _responder(self, status, corpo, tipo="text/html; charset=utf-8", headers=None):
+        dados = corpo.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _pagina(self, titulo, corpo, status=200):
+        self._responder(status, PAGINA.format(titulo=titulo, corpo=corpo))
+
+    def _redirecionar(self, destino, headers=None):
+        self._responder(302, "", headers={"Location": destino, **(headers or {})})
+
+    def _erro(self, mensagem, status=400):
+        self._pagina(
+            "Erro",
+            f'<div id="divInfraExcecao" class="infraExcecao">{html.escape(mensagem)}</div>',
+            status,
+        )
+
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(tamanho) if tamanho else b""
+
+    def _ler_formulario(self):
+        corpo = self._ler_corpo()
+        tipo = self.headers.get("Content-Type", "")
+        if tipo.startswith("multipart/form-data"):
+            mensagem = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {tipo}\r\n\r\n".encode() + corpo
+            )
+            campos, arquivos = {}, {}
+            for parte in mensagem.iter_parts():
+                nome = parte.get_param("name", header="content-disposition")
+                if parte.get_filename():
+                    arquivos[nome] = (parte.get_filename(), parte.get_payload(decode=True))
+                else:
+                    campos[nome] = parte.get_content().strip()
+            return campos, arquivos
+        campos = {k: v[0] for k, v in parse_qs(corpo.decode("utf-8")).items()}
+        return campos, {}
+
+    # Roteamento
+
+    def do_GET(self):
+        self._rotear("GET")
+
+    def do_POST(self):
+        self._rotear("POST")
+
+    def _rotear(self, metodo):
+        atraso = self.estado.atraso()
+        if atraso:
+            time.sleep(atraso)
+        url = urlsplit(self.path)
+        if url.path in ("/", "/sei/", "/sei"):
+            return self._redirecionar("/sip/login.php")
+        if url.path == "/sip/login.php":
+            return self._login(metodo)
+        if url.path != "/sei/controlador.php":
+            return self._erro("Página não encontrada", 404)
+
+        token, sessao = self._sessao()
+        if sessao is None:
+            return self._redirecionar("/sip/login.php")
+        if not self._assinatura_valida(sessao, url.query):
+            return self._erro("Link sem assinatura")
+        if self.estado.injetar_erro():
+            self._ler_corpo()
+            return self._erro("Erro simulado pelo servidor local", 500)
+
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        acao = params.get("acao")
+        handler = getattr(self, f"_acao_{acao}", None)
+        if handler is None:
+            return self._erro(f"Ação desconhecida: {acao}", 404)
+        handler(metodo, sessao, params)
+
+    # Páginas
+
+    def _login(self, metodo):
+        if metodo == "GET":
+            return self._pagina(
+                "Login",
+                """
+                <form id="frmLogin" method="post" action="/sip/login.php">
+                  <input type="hidden" name="hdnAcao" value="2">
+                  <input type="text" id="txtUsuario" name="txtUsuario">
+                  <input type="password" id="pwdSenha" name="pwdSenha">
+                  <button type="submit" id="sbmAcessar" name="sbmAcessar" value="Acessar">Acessar</button>
+                </form>""",
+            )
+        campos, _ = self._ler_formulario()
+        usuario, senha = campos.get("txtUsuario"), campos.get("pwdSenha")
+        usuarios = self.estado.usuarios
+        if not usuario or (usuarios is not None and usuarios.get(usuario) != senha):
+            return self._erro("Usuário ou senha inválidos", 200)
+        token = self.estado.criar_sessao(usuario)
+        sessao = self.estado.sessoes[token]
+        self._redirecionar(
+            self._assinar(sessao, "procedimento_controlar"),
+            headers={"Set-Cookie": f"SEI_SESSAO={token}; Path=/; HttpOnly"},
+        )
+
+    def _pesquisa(self, sessao):
+        opcoes = "".join(
+            f'<option value="{html.escape(unidade)}"'
+            + (" selected" if unidade == sessao["unidade"] else "")
+            + f">{html.escape(unidade)}</option>"
+            for unidade in self.estado.unidades
+        )
+        return PESQUISA_RAPIDA.format(
+            action=self._href(sessao, "protocolo_pesquisa_rapida")
+        ) + UNIDADES.format(action=self._href(sessao, "infra_trocar_unidade"), opcoes=opcoes)
+
+    def _acao_infra_trocar_unidade(self, metodo, sessao, params):
+        campos, _ = self._ler_formulario()
+        unidade = campos.get("selInfraUnidades")
+        if unidade not in self.estado.unidades:
+            return self._erro(f"Unidade {unidade} não disponível para o usuário", 200)
+        sessao["unidade"] = unidade
+        self._redirecionar(self._assinar(sessao, "procedimento_controlar"))
+
+    def _acao_procedimento_controlar(self, metodo, sessao, params):
+        self._pagina(
+            "Controle de Processos",
+            self._pesquisa(sessao) + f'<div id="divUsuario">{sessao["usuario"]}</div>',
+        )
+
+    def _acao_protocolo_pesquisa_rapida(self, metodo, sessao, params):
+        campos, _ = self._ler_formulario()
+        numero = campos.get("txtPesquisaRapida", "").strip()
+        processo = (
+            self.estado.obter_processo(numero, unidade=sessao["unidade"])
+            if numero
+            else None
+        )
+        if processo is None:
+            return self._erro(f"Processo {numero} não encontrado", 200)
+        self._redirecionar(
+            self._assinar(sessao, "procedimento_trabalhar", id_procedimento=processo["id"])
+        )
+
+    def _processo_ou_erro(self, params):
+        processo = self.estado.processo_por_id(params.get("id_procedimento", ""))
+        if processo is None:
+            self._erro("Processo não encontrado", 404)
+        return processo
+
+    def _acao_procedimento_trabalhar(self, metodo, sessao, params):
+        processo = self._processo_ou_erro(params)
+        if processo is None:
+            return
+        arvore = self._href(sessao, "procedimento_visualizar", id_procedimento=processo["id"])
+        visualizacao = self._href(sessao, "arvore_visualizar", id_procedimento=processo["id"])
+        self._pagina(
+            f"Processo {processo['numero']}",
+            self._pesquisa(sessao)
+            + f"""
+            <div id="divArvore"><iframe id="ifrArvore" name="ifrArvore" src="{arvore}"></iframe></div>
+            <div id="divVisualizacao"><iframe id="ifrVisualizacao" name="ifrVisualizacao" src="{visualizacao}"></iframe></div>""",
+        )
+
+    def _acao_procedimento_visualizar(self, metodo, sessao, params):
+        processo = self._processo_ou_erro(params)
+        if processo is None:
+            return
+        nos = [
+            f'<a id="anchorP{processo["id"]}" title="{processo["numero"]}">{processo["numero"]}</a>'
+        ]
+        for documento in processo["documentos"]:
+            nos.append(
+                f'<a id="anchor{documento["id"]}" '
+                f'title="{html.escape(documento["nome"])} - {documento["data"]}">'
+                f'<span id="span{documento["id"]}">{documento["serie"]} '
+                f'{html.escape(documento["nome"])} ({documento["id"]})</span></a>'
+            )
+        self._pagina("Árvore", '<div id="divArvore">' + "<br>".join(nos) + "</div>")
+
+    def _acao_arvore_visualizar(self, metodo, sessao, params):
+        processo = self._processo_ou_erro(params)
+        if processo is None:
+            return
+        if processo["unidade"] != sessao["unidade"]:
+            # Como no SEI: sem andamento aberto na unidade, só consulta
+            return self._pagina(
+                "Visualização",
+                f'<div id="divInformacao">Processo não possui andamento aberto '
+                f'na unidade {html.escape(sessao["unidade"])}.</div>',
+            )
+        incluir = self._href(sessao, "documento_escolher_tipo", id_procedimento=processo["id"])
+        self._pagina(
+            "Visualização",
+            f'<div id="divArvoreAcoes"><a href="{incluir}" tabindex="451">'
+            f'<img src="/svg/documento_incluir.svg" alt="Incluir Documento"></a></div>',
+        )
+
+    def _acao_documento_escolher_tipo(self, metodo, sessao, params):
+        processo = self._processo_ou_erro(params)
+        if processo is None:
+            return
+        receber = self._href(sessao, "documento_receber", id_procedimento=processo["id"])
+        self._pagina(
+            "Gerar Documento",
+            f'<table id="tblSeries"><tr><td><a href="{receber}" class="ancoraOpcao">Externo</a></td></tr></table>',
+        )
+
+    def _acao_documento_receber(self, metodo, sessao, params):
+        processo = self._processo_ou_erro(params)
+        if processo is None:
+            return
+        if metodo == "POST":
+            return self._salvar_documento(sessao, processo)
+        salvar = self._href(sessao, "documento_receber", id_procedimento=processo["id"])
+        upload = self._href(sessao, "documento_upload_anexo")
+        self._pagina(
+            "Registrar Documento Externo",
+            f"""
+            <form id="frmDocumentoCadastro" method="post" action="{salvar}">
+              <select id="selSerie" name="selSerie">
+                <option value="null"></option>
+                <option value="7">Ofício</option>
+                <option value="{ID_SERIE_COMPROVANTE}">Comprovante</option>
+              </select>
+              <input type="text" id="txtDataElaboracao" name="txtDataElaboracao" value="">
+              <input type="text" id="txtNomeArvore" name="txtNomeArvore" value="">
+              <div id="divOptNato"><input type="radio" id="optNato" name="rdoFormato" value="N"> Nato-digital</div>
+              <div id="divOptDigitalizado"><input type="radio" id="optDigitalizado" name="rdoFormato" value="D"> Digitalizado</div>
+              <fieldset id="fldNivelAcesso" style="display:none">
+                <div id="divOptPublico"><input type="radio" id="optPublico" name="rdoNivelAcesso" value="0"> Público</div>
+                <div id="divOptRestrito"><input type="radio" id="optRestrito" name="rdoNivelAcesso" value="1"> Restrito</div>
+              </fieldset>
+              <input type="hidden" id="hdnAnexos" name="hdnAnexos" value="">
+              <input type="hidden" id="hdnIdProcedimento" name="hdnIdProcedimento" value="{processo['id']}">
+              <button type="submit" id="btnSalvar" name="btnSalvar" value="Salvar">Salvar</button>
+            </form>
+            <form id="frmAnexos" method="post" enctype="multipart/form-data" action="{upload}">
+              <label id="lblArquivo" for="filArquivo">Escolher arquivo...</label>
+              <input type="file" id="filArquivo" name="filArquivo">
+            </form>
+            <div id="divArquivoProgresso"></div>
+            <table id="tblAnexos"></table>
+            {SCRIPT_UPLOAD}""",
+        )
+
+    def _acao_documento_upload_anexo(self, metodo, sessao, params):
+        _, arquivos = self._ler_formulario()
+        if "filArquivo" not in arquivos:
+            return self._responder(400, "ERRO#Nenhum arquivo enviado", "text/plain")
+        nome, conteudo = arquivos["filArquivo"]
+        nome_upload = self.estado.registrar_upload(nome, conteudo)
+        data = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        hash_arquivo = hashlib.md5(conteudo).hexdigest()
+        self._responder(
+            200,
+            f"{nome_upload}#{nome}#{hash_arquivo}#{len(conteudo)}#{data}",
+            "text/plain; charset=utf-8",
+        )
+
+    def _salvar_documento(self, sessao, processo):
+        campos, _ = self._ler_formulario()
+        if processo["unidade"] != sessao["unidade"]:
+            return self._erro(f"Processo não está aberto na unidade {sessao['unidade']}")
+        if campos.get("selSerie") != ID_SERIE_COMPROVANTE:
+            return self._erro("Tipo do documento não informado")
+        if not campos.get("txtDataElaboracao"):
+            return self._erro("Data do documento não informada")
+        if campos.get("rdoFormato") != "N" or campos.get("rdoNivelAcesso") != "0":
+            return self._erro("Formato ou nível de acesso não informado")
+        anexos = [linha.split("±") for linha in campos.get("hdnAnexos", "").split("¥") if linha]
+        if not anexos or anexos[0][0] not in self.estado.uploads:
+            return self._erro("Nenhum anexo informado")
+        upload = self.estado.uploads.pop(anexos[0][0])
+        self.estado.incluir_documento(
+            processo,
+            "Comprovante",
+            campos["txtDataElaboracao"],
+            campos.get("txtNomeArvore") or upload["nome"],
+            len(upload["conteudo"]),
+        )
+        self._redirecionar(
+            self._assinar(sessao, "procedimento_trabalhar", id_procedimento=processo["id"])
+        )
+
+
+def criar_servidor(porta=0, estado=None, host="127.0.0.1"):
+    """
+    Cria o servidor (sem iniciá-lo). Com porta=0 o sistema escolhe uma porta
+    livre, disponível em servidor.server_address.
+    """
+    manipulador = type("ManipuladorSEILocal", (ManipuladorSEI,), {})
+    manipulador.estado = estado or EstadoSEI()
+    servidor = ThreadingHTTPServer((host, porta), manipulador)
+    servidor.daemon_threads = True
+    servidor.estado = manipulador.estado
+    return servidor
+
+
+def iniciar_em_segundo_plano(porta=0, estado=None):
+    """Inicia o servidor em uma thread e retorna (servidor, url)."""
+    servidor = criar_servidor(porta, estado)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    host, porta = servidor.server_address
+    return servidor, f"http://{host}:{porta}/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local que imita o SEI")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument(
+        "--processos",
+        default="",
+        help="Números de processo existentes, separados por vírgula. "
+        "Sem esta opção qualquer número pesquisado é criado.",
+    )
+    parser.add_argument(
+        "--unidades",
+        default="",
+        help="Siglas das unidades do usuário, separadas por vírgula; "
+        "a primeira é a do login",
+    )
+    parser.add_argument(
+        "--latencia", type=float, default=0, help="Atraso de cada resposta, em ms"
+    )
+    parser.add_argument(
+        "--variacao", type=float, default=0, help="Variação aleatória do atraso, em ms"
+    )
+    parser.add_argument(
+        "--taxa-erro",
+        type=float,
+        default=0,
+        help="Fração das requisições que recebem erro do SEI (0 a 1)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    processos = [p for p in args.processos.split(",") if p]
+    servidor = criar_servidor(
+        args.porta,
+        EstadoSEI(
+            processos=processos,
+            unidades=[u for u in args.unidades.split(",") if u] or None,
+            criar_processos=not processos,
+            latencia=args.latencia / 1000,
+            variacao=args.variacao / 1000,
+            taxa_erro=args.taxa_erro,
+        ),
+    )
+    logging.info(f"SEI local em http://localhost:{args.porta}/")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
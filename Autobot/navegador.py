@@ -0,0 +1,248 @@
+import os
+import logging
+from dataclasses import dataclass
+
+from config import memoria_maxima_navegador_mb, reciclar_apos_documentos
+
+
+# Recursos que a automação nunca lê: imagens de fundo, fotos e fontes. Os
+# ícones .svg ficam de fora porque os botões do SEI são localizados por eles.
+RECURSOS_BLOQUEADOS = (
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.eot",
+)
+
+
+@dataclass(frozen=True)
+class PerfilNavegador:
+    """
+    Configuração do Chrome usado pela automação. O perfil "enxuto" abre o
+    navegador sem janela, segue assim que o HTML da página fica pronto (as
+    esperas da automação aguardam os elementos de que precisam) e não baixa
+    imagens nem fontes.
+    """
+
+    nome: str
+    headless: bool
+    carregamento: str  # page_load_strategy: "normal" ou "eager"
+    bloquear_recursos: bool
+    desativar_gpu: bool
+    desativar_extensoes: bool
+    janela: tuple = None  # (largura, altura); None mantém o padrão do Chrome
+
+
+PERFIS_NAVEGADOR = {
+    "completo": PerfilNavegador(
+        nome="completo",
+        headless=False,
+        carregamento="normal",
+        bloquear_recursos=False,
+        desativar_gpu=False,
+        desativar_extensoes=False,
+    ),
+    "enxuto": PerfilNavegador(
+        nome="enxuto",
+        headless=True,
+        carregamento="eager",
+        bloquear_recursos=True,
+        desativar_gpu=True,
+        desativar_extensoes=True,
+        janela=(1280, 800),
+    ),
+}
+
+
+def perfil_navegador(nome=None):
+    """Retorna o perfil pelo nome ou pela variável SEI_PERFIL_NAVEGADOR do .env."""
+    nome = nome or os.getenv("SEI_PERFIL_NAVEGADOR", "completo")
+    try:
+        return PERFIS_NAVEGADOR[nome]
+    except KeyError:
+        raise ValueError(
+            f"Perfil de navegador desconhecido: {nome}. "
+            f"Opções: {', '.join(PERFIS_NAVEGADOR)}"
+        )
+
+
+def opcoes_chrome(perfil, headless=False, diretorio_perfil=None):
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.page_load_strategy = perfil.carregamento
+    if headless or perfil.headless:
+        options.add_argument("--headless=new")
+    if perfil.desativar_gpu:
+        options.add_argument("--disable-gpu")
+    if perfil.desativar_extensoes:
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-component-extensions-with-background-pages")
+    if perfil.janela:
+        options.add_argument(f"--window-size={perfil.janela[0]},{perfil.janela[1]}")
+    if diretorio_perfil:
+        # Perfil reaproveitado: cookies e cache do navegador persistem
+        options.add_argument(f"--user-data-dir={diretorio_perfil}")
+    return options
+
+
+def aplicar_bloqueios(driver, perfil, logger=None):
+    """Bloqueia, pelo protocolo de depuração do Chrome, os recursos não usados."""
+    if not perfil.bloquear_recursos:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd(
+            "Network.setBlockedURLs", {"urls": list(RECURSOS_BLOQUEADOS)}
+        )
+    except Exception as e:
+        (logger or logging.getLogger(__name__)).warning(
+            f"Não foi possível bloquear imagens e fontes: {str(e)}"
+        )
+
+
+def _descendentes_proc(pid):
+    """PIDs descendentes de pid, lendo /proc (Linux, sem psutil)."""
+    filhos = {}
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat", encoding="ascii", errors="replace") as stat:
+                # O nome do processo pode ter espaços; o ppid vem depois do ")"
+                ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        filhos.setdefault(ppid, []).append(int(entrada))
+    descendentes, pendentes = [], [pid]
+    while pendentes:
+        atual = pendentes.pop()
+        for filho in filhos.get(atual, []):
+            descendentes.append(filho)
+            pendentes.append(filho)
+    return descendentes
+
+
+def _rss_proc(pid):
+    with open(f"/proc/{pid}/statm", encoding="ascii") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def memoria_processos_mb(pid):
+    """
+    Memória residente (MB) do processo e de todos os seus descendentes, ou
+    None se não houver como medir. É uma soma de RSS, então conta mais de
+    uma vez a memória compartilhada entre os processos do Chrome.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    try:
+        if psutil is not None:
+            processo = psutil.Process(pid)
+            processos = [processo] + processo.children(recursive=True)
+            total = 0
+            for p in processos:
+                try:
+                    total += p.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total / 1024 / 1024
+        if os.path.isdir("/proc"):
+            total = 0
+            for p in [pid] + _descendentes_proc(pid):
+                try:
+                    total += _rss_proc(p)
+                except OSError:
+                    pass
+            return total / 1024 / 1024
+    except Exception:
+        return None
+    return None
+
+
+def memoria_livre_mb():
+    """Memória disponível no sistema, em MB, ou None se não houver como medir."""
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available / 1024 / 1024
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo", encoding="ascii") as meminfo:
+            for linha in meminfo:
+                if linha.startswith("MemAvailable:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def texto_capacidade(memorias):
+    """Resumo da memória por navegador e de quantas sessões ainda cabem."""
+    memorias = [m for m in memorias if m]
+    if not memorias:
+        return None
+    media = sum(memorias) / len(memorias)
+    texto = f"Memória por navegador: média {media:.0f} MB, máximo {max(memorias):.0f} MB"
+    livre = memoria_livre_mb()
+    if livre is not None:
+        texto += (
+            f"; com {livre:.0f} MB livres cabem mais ~{int(livre // max(memorias))} "
+            "sessões"
+        )
+    return texto
+
+
+class GovernadorRecursos:
+    """
+    Decide quando trocar o navegador por um novo: depois de `max_documentos`
+    documentos ou quando a memória do Chrome e do chromedriver passar de
+    `max_memoria_mb`. A memória é medida a cada `intervalo` documentos, já
+    que a medição percorre todos os processos do navegador.
+    """
+
+    def __init__(self, medir, max_documentos=None, max_memoria_mb=None, intervalo=10):
+        self.medir = medir
+        self.max_documentos = (
+            reciclar_apos_documentos() if max_documentos is None else max_documentos
+        )
+        self.max_memoria_mb = (
+            memoria_maxima_navegador_mb() if max_memoria_mb is None else max_memoria_mb
+        )
+        self.intervalo = max(1, intervalo)
+        self.documentos = 0
+        self.memoria = None
+        self._medido_em = 0
+
+    def registrar_documento(self):
+        self.documentos += 1
+
+    def motivo_reciclagem(self):
+        """Motivo para trocar o navegador agora, ou None."""
+        if self.max_documentos and self.documentos >= self.max_documentos:
+            return f"{self.documentos} documentos desde a abertura"
+        if (
+            self.max_memoria_mb
+            and self.documentos - self._medido_em >= self.intervalo
+        ):
+            self._medido_em = self.documentos
+            self.memoria = self.medir()
+            if self.memoria is not None and self.memoria >= self.max_memoria_mb:
+                return f"memória em {self.memoria:.0f} MB"
+        return None
+
+    def reiniciar(self):
+        self.documentos = 0
+        self._medido_em = 0
+        self.memoria = None
@@ -0,0 +1,252 @@
+import queue
+import logging
+import threading
+
+from lote import (
+    STATUS_FALHA,
+    ControleExecucao,
+    ResultadoArquivo,
+    ResumoExecucao,
+    agrupar_por_processo,
+    aplicar_diario,
+    aplicar_validacao,
+    listar_arquivos,
+    processo_do_arquivo,
+)
+import registro
+from diario import DiarioLote
+from metricas import RegistroTempos
+from navegador import texto_capacidade
+from ritmo import ritmo_da_execucao
+
+
+def logger_do_worker(nome, diretorio_logs):
+    """
+    Logger de uma sessão paralela, com seu próprio arquivo da execução em
+    diretorio_logs. O arquivo assina a fila de log, então é gravado fora da
+    thread do worker.
+    """
+    logger = logging.getLogger(f"{__name__}.{nome}")
+    if diretorio_logs:
+        handler = registro.arquivo_da_execucao(diretorio_logs, nome)
+        registro.assinar(handler, logger.name)
+        logger.arquivo_worker = handler
+    return logger
+
+
+def fechar_logger(logger):
+    handler = getattr(logger, "arquivo_worker", None)
+    if handler is not None:
+        registro.cancelar_assinatura(handler, logger.name, fechar=True)
+        del logger.arquivo_worker
+
+
+def trabalhar_em_sessao(executor, nome, indice, usuario, senha, laco, lock):
+    """
+    Sessão paralela de um pool ou escalonador (`executor`): cria o motor com
+    o logger da sessão, faz o login e roda laco(automacao, logger). Ao final
+    guarda os contadores do motor e a memória do navegador em
+    executor.contadores e executor.memorias, sob o `lock`.
+    """
+    logger = logger_do_worker(nome, executor.diretorio_logs)
+    automacao = None
+    try:
+        try:
+            # Só a primeira sessão usa a sessão salva: as outras fazem o
+            # próprio login, para cada uma ter a sua sessão no SEI (e a sua
+            # unidade, que vale para a sessão inteira)
+            automacao = executor.fabrica(logger=logger, usar_cache_sessao=indice == 1)
+            automacao.metricas = executor.metricas
+            automacao.ritmo = executor.ritmo
+            with automacao.etapa("login"):
+                automacao.login(usuario, senha)
+        except Exception as e:
+            logger.error(f"Falha ao iniciar a sessão {nome}: {str(e)}", exc_info=True)
+            return
+
+        logger.info(f"Sessão {nome} logada e aguardando arquivos")
+        laco(automacao, logger)
+
+        # Medida ao final, com as páginas já carregadas
+        memoria = automacao.memoria_mb()
+        if memoria is not None:
+            logger.info(f"Memória do navegador da sessão {nome}: {memoria:.0f} MB")
+        with lock:
+            executor.contadores.append(automacao.contadores())
+            executor.memorias.append(memoria)
+    finally:
+        logger.info(f"Finalizando sessão {nome}")
+        if automacao is not None:
+            automacao.fechar()
+        fechar_logger(logger)
+
+
+class PoolNavegadores:
+    """
+    Executa a automação com vários navegadores em paralelo. Cada worker
+    mantém sua própria sessão logada no SEI e retira arquivos de uma fila
+    compartilhada até que ela se esgote. Os arquivos de um mesmo processo
+    formam um único item da fila e são enviados pelo mesmo worker.
+
+    Todos os workers seguem o mesmo ritmo: quando o SEI fica lento ou
+    instável, os envios diminuem ou param para todos ao mesmo tempo. Os
+    arquivos que falham voltam para uma fila de adiados, tentada depois
+    que a fila principal se esgota.
+    """
+
+    def __init__(
+        self,
+        num_navegadores=2,
+        fabrica=None,
+        diretorio_logs="logs",
+        usar_diario=True,
+        controle=None,
+        validar=True,
+    ):
+        if fabrica is None:
+            from selenium_handler import SEIAutomation
+
+            fabrica = SEIAutomation
+        self.num_navegadores = max(1, int(num_navegadores))
+        self.fabrica = fabrica
+        self.diretorio_logs = diretorio_logs
+        self.usar_diario = usar_diario
+        self.validar = validar
+        self.diario = None
+        self.metricas = None
+        self.ritmo = None
+        self.memorias = []
+        self.contadores = []
+        self.controle = controle or ControleExecucao()
+        self.logger = logging.getLogger(__name__)
+
+    def executar(self, usuario, senha, diretorio):
+        resumo = ResumoExecucao()
+        arquivos = listar_arquivos(diretorio)
+        if self.validar:
+            # Antes de abrir os navegadores
+            arquivos = aplicar_validacao(diretorio, arquivos, resumo, self.logger)
+        if self.usar_diario:
+            self.diario = DiarioLote(diretorio)
+            arquivos = aplicar_diario(self.diario, arquivos, resumo, self.logger)
+        proprias = self.metricas is None
+        if proprias:
+            self.metricas = RegistroTempos(self.diretorio_logs)
+        try:
+            return self._executar(usuario, senha, diretorio, arquivos, resumo)
+        finally:
+            if proprias:
+                self.metricas.finalizar()
+                self.metricas = None
+            if self.diario:
+                self.diario.fechar()
+                self.diario = None
+
+    def _executar(self, usuario, senha, diretorio, arquivos, resumo):
+        self.logger.info(
+            f"Iniciando pool com {self.num_navegadores} navegadores "
+            f"para {len(arquivos)} arquivos em {diretorio}"
+        )
+
+        self.memorias = []
+        self.contadores = []
+        self.ritmo = ritmo_da_execucao(self.ritmo)
+        grupos = agrupar_por_processo(arquivos)
+        fila = queue.Queue()
+        for grupo in grupos:
+            fila.put(grupo)
+        adiados = queue.Queue()
+        tentativas = {}
+
+        lock = threading.Lock()
+        self.controle.iniciar(len(arquivos))
+
+        # Não faz sentido abrir mais navegadores do que processos
+        num_workers = min(self.num_navegadores, len(grupos)) or 1
+        workers = [
+            threading.Thread(
+                target=self._trabalhar,
+                args=(
+                    indice, usuario, senha, diretorio, fila, adiados, tentativas,
+                    resumo, lock,
+                ),
+                name=f"worker{indice}",
+                daemon=True,
+            )
+            for indice in range(1, num_workers + 1)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # Arquivos que sobraram na fila: execução cancelada ou todos os
+        # workers falharam no login
+        while True:
+            try:
+                grupo = fila.get_nowait()
+            except queue.Empty:
+                break
+            if self.controle.cancelado:
+                resumo.cancelar(grupo)
+                continue
+            for arquivo in grupo:
+                resumo.adicionar(
+                    ResultadoArquivo(
+                        arquivo,
+                        processo_do_arquivo(arquivo),
+                        STATUS_FALHA,
+                        erro="Nenhum navegador disponível para processar o arquivo",
+                    )
+                )
+
+        # Os adiados que sobraram já constam como falha no resumo
+        for contadores in self.contadores:
+            resumo.somar(contadores)
+        resumo.somar(self.ritmo.contadores())
+        resumo.finalizar()
+        self.logger.info(resumo.texto())
+        capacidade = texto_capacidade(self.memorias)
+        if capacidade:
+            self.logger.info(capacidade)
+        return resumo
+
+    def _proximo_grupo(self, fila, adiados):
+        """Grupo da fila principal ou, quando ela acabar, da fila de adiados."""
+        try:
+            return fila.get_nowait(), False
+        except queue.Empty:
+            pass
+        try:
+            return adiados.get_nowait(), True
+        except queue.Empty:
+            return None, False
+
+    def _trabalhar(
+        self, indice, usuario, senha, diretorio, fila, adiados, tentativas, resumo, lock
+    ):
+        nome = f"worker{indice}"
+
+        def laco(automacao, logger):
+            while not self.controle.cancelado:
+                grupo, adiado = self._proximo_grupo(fila, adiados)
+                if grupo is None:
+                    break
+                restantes, falhas = automacao.enviar_grupo(
+                    diretorio,
+                    grupo,
+                    resumo,
+                    self.controle,
+                    tentativas,
+                    self.diario,
+                    lock,
+                    adiado=adiado,
+                    worker=nome,
+                )
+                if restantes and not adiado:
+                    # O restante do grupo volta para a fila como cancelado
+                    fila.put(restantes)
+                if falhas:
+                    adiados.put(falhas)
+
+        trabalhar_em_sessao(self, nome, indice, usuario, senha, laco, lock)
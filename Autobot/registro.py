@@ -0,0 +1,310 @@
+"""
+Log da automação fora do caminho dos envios. As threads da automação só
+colocam os registros numa fila; uma thread própria (QueueListener) formata
+e grava cada registro no console, no arquivo da execução e nos assinantes,
+como a janela da interface. Os tracebacks também são formatados lá.
+
+Cada execução grava logs/autobot_AAAAMMDD_HHMMSS.jsonl, um registro JSON
+por linha, girado por tamanho; as sessões paralelas gravam também o seu
+autobot_AAAAMMDD_HHMMSS_<sessão>.jsonl. Além de momento, nível, thread e mensagem,
+os registros levam os campos arquivo, processo, etapa, tentativa e duracao
+quando foram emitidos dentro de um envio (campos_log) ou os receberam por
+extra=. Para a análise posterior:
+
+    import json
+    falhas = [r for r in map(json.loads, open(caminho)) if r["nivel"] == "ERROR"]
+"""
+
+import os
+import copy
+import glob
+import json
+import queue
+import atexit
+import logging
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config import copias_log, tamanho_maximo_log_mb
+
+
+CAMPOS = ("arquivo", "processo", "etapa", "tentativa", "duracao")
+
+# Execuções anteriores mantidas na pasta de logs
+EXECUCOES_MANTIDAS = 30
+
+FORMATO_CONSOLE = "%(asctime)s - %(levelname)s - %(message)s"
+
+_campos = contextvars.ContextVar("campos_log", default={})
+_ativo = None
+
+
+@contextmanager
+def campos_log(**campos):
+    """Anexa os campos a todos os registros emitidos no bloco, nesta thread."""
+    token = _campos.set({**_campos.get(), **campos})
+    try:
+        yield
+    finally:
+        _campos.reset(token)
+
+
+class FormatoJson(logging.Formatter):
+    """Um objeto JSON por registro, com os campos estruturados presentes."""
+
+    def format(self, record):
+        registro = {
+            "momento": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "mensagem": record.getMessage(),
+        }
+        for campo in CAMPOS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                registro[campo] = round(valor, 4) if campo == "duracao" else valor
+        if record.exc_info:
+            registro["traceback"] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+def arquivo_json(caminho):
+    """Handler que grava um registro JSON por linha, girado por tamanho."""
+    handler = RotatingFileHandler(
+        caminho,
+        maxBytes=int(tamanho_maximo_log_mb() * 1024 * 1024),
+        backupCount=copias_log(),
+        encoding="utf-8",
+    )
+    handler.setFormatter(FormatoJson())
+    return handler
+
+
+class _HandlerFila(QueueHandler):
+    """
+    Enfileira o registro sem formatá-lo: a thread da automação só junta a
+    mensagem com os argumentos e anexa os campos do envio atual. O traceback
+    segue como exc_info e é formatado pela thread do log.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        for campo, valor in _campos.get().items():
+            if getattr(record, campo, None) is None:
+                setattr(record, campo, valor)
+        return record
+
+
+class _Cancelamento:
+    """
+    Vai pela fila para que o assinante saia só depois de receber os
+    registros enfileirados antes dele.
+    """
+
+    levelno = logging.CRITICAL
+
+    def __init__(self, handler, fechar):
+        self.handler = handler
+        self.fechar = fechar
+
+
+class _Distribuidor(logging.Handler):
+    """
+    Repassa os registros aos handlers da execução e aos assinantes; roda na
+    thread do log. Os registros de um logger com assinante exclusivo vão só
+    para ele.
+    """
+
+    def __init__(self, handlers=()):
+        super().__init__()
+        self.assinantes = tuple(handlers)
+        self.exclusivos = {}
+
+    def assinar(self, handler, nome_logger=None):
+        with self.lock:
+            if nome_logger:
+                self.exclusivos = {**self.exclusivos, nome_logger: handler}
+            else:
+                self.assinantes = self.assinantes + (handler,)
+
+    def cancelar(self, handler):
+        with self.lock:
+            self.assinantes = tuple(h for h in self.assinantes if h is not handler)
+            self.exclusivos = {
+                nome: h for nome, h in self.exclusivos.items() if h is not handler
+            }
+
+    def handle(self, record):
+        if isinstance(record, _Cancelamento):
+            self.cancelar(record.handler)
+            if record.fechar:
+                record.handler.close()
+            return True
+        return super().handle(record)
+
+    def emit(self, record):
+        exclusivo = self.exclusivos.get(record.name)
+        for handler in (exclusivo,) if exclusivo else self.assinantes:
+            if record.levelno >= handler.level:
+                try:
+                    handler.handle(record)
+                except Exception:
+                    handler.handleError(record)
+
+
+class RegistroExecucao:
+    """
+    Fila de log da execução. iniciar() troca os handlers do logger raiz
+    pelo da fila; parar() grava o que falta e devolve os anteriores.
+    """
+
+    def __init__(self, diretorio="logs", nivel=logging.INFO, console=True):
+        self.diretorio = diretorio
+        self.nivel = nivel
+        self.console = console
+        self.momento = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.caminho = None
+        self.fila = queue.SimpleQueue()
+        self.distribuidor = None
+        self.listener = None
+        self._handler_fila = None
+        self._anteriores = []
+        self._arquivos = []
+
+    def _handlers(self):
+        handlers = []
+        if self.console:
+            console = logging.StreamHandler()
+            console.setFormatter(logging.Formatter(FORMATO_CONSOLE))
+            handlers.append(console)
+        if self.diretorio:
+            os.makedirs(self.diretorio, exist_ok=True)
+            self._apagar_antigos()
+            self.caminho = os.path.join(self.diretorio, f"autobot_{self.momento}.jsonl")
+            arquivo = arquivo_json(self.caminho)
+            self._arquivos.append(arquivo)
+            handlers.append(arquivo)
+        return handlers
+
+    def _apagar_antigos(self):
+        execucoes = sorted(
+            glob.glob(os.path.join(self.diretorio, "autobot_????????_??????.jsonl"))
+        )
+        for caminho in execucoes[: max(0, len(execucoes) - EXECUCOES_MANTIDAS + 1)]:
+            # Com as cópias giradas e os arquivos das sessões paralelas
+            for antigo in glob.glob(caminho[: -len(".jsonl")] + "*"):
+                try:
+                    os.remove(antigo)
+                except OSError:
+                    pass
+
+    def iniciar(self):
+        raiz = logging.getLogger()
+        self._anteriores = list(raiz.handlers)
+        for handler in self._anteriores:
+            raiz.removeHandler(handler)
+        self._handler_fila = _HandlerFila(self.fila)
+        raiz.addHandler(self._handler_fila)
+        raiz.setLevel(self.nivel)
+        self.distribuidor = _Distribuidor(self._handlers())
+        self.listener = QueueListener(self.fila, self.distribuidor)
+        self.listener.start()
+        return self
+
+    def assinar(self, handler, nome_logger=None, exclusivo=False):
+        """
+        Passa a receber os registros na thread do log. Com nome_logger, só
+        os daquele logger (e dos filhos). Com exclusivo, os registros do
+        logger nome_logger vão só para este handler, fora do console e do
+        arquivo da execução.
+        """
+        if exclusivo:
+            self.distribuidor.assinar(handler, nome_logger)
+            return
+        if nome_logger:
+            handler.addFilter(logging.Filter(nome_logger))
+        self.distribuidor.assinar(handler)
+
+    def cancelar_assinatura(self, handler, fechar=False):
+        """Sai depois de gravar o que já está na fila; com fechar, fecha o handler."""
+        self.fila.put(_Cancelamento(handler, fechar))
+
+    def parar(self):
+        if self.listener is None:
+            return
+        raiz = logging.getLogger()
+        raiz.removeHandler(self._handler_fila)
+        # Grava o que ainda está na fila antes de fechar os arquivos
+        self.listener.stop()
+        self.listener = None
+        for handler in self._arquivos:
+            handler.close()
+        for handler in self._anteriores:
+            raiz.addHandler(handler)
+
+
+def iniciar_registro(diretorio="logs", nivel=logging.INFO, console=True):
+    """
+    Liga o log pela fila para o processo inteiro, num arquivo novo; a fila
+    anterior, se houver, é esvaziada e fechada. Encerra sozinho na saída.
+    """
+    global _ativo
+    if _ativo is None:
+        atexit.register(parar_registro)
+    else:
+        _ativo.parar()
+    _ativo = RegistroExecucao(diretorio, nivel, console).iniciar()
+    if _ativo.caminho:
+        logging.getLogger(__name__).info(f"Log da execução em {_ativo.caminho}")
+    return _ativo
+
+
+def parar_registro():
+    global _ativo
+    if _ativo is not None:
+        _ativo.parar()
+        _ativo = None
+
+
+def arquivo_da_execucao(diretorio, nome):
+    """
+    Arquivo JSONL de uma parte da execução, como uma sessão paralela:
+    autobot_AAAAMMDD_HHMMSS_<nome>.jsonl, com o momento da execução atual,
+    girado e apagado junto com o arquivo dela.
+    """
+    if _ativo is not None:
+        momento = _ativo.momento
+    else:
+        momento = datetime.now().strftime("%Y%m%d_%H%M%S")
+    os.makedirs(diretorio, exist_ok=True)
+    return arquivo_json(os.path.join(diretorio, f"autobot_{momento}_{nome}.jsonl"))
+
+
+def assinar(handler, nome_logger=None, exclusivo=False):
+    """
+    Inscreve o handler na fila de log, quando ela estiver ligada; sem ela,
+    ele vai direto no logger (o raiz, se nome_logger não for dado).
+    """
+    if _ativo is not None:
+        _ativo.assinar(handler, nome_logger, exclusivo)
+        return
+    logger = logging.getLogger(nome_logger)
+    logger.addHandler(handler)
+    if exclusivo:
+        logger.propagate = False
+
+
+def cancelar_assinatura(handler, nome_logger=None, fechar=False):
+    if _ativo is not None:
+        _ativo.cancelar_assinatura(handler, fechar)
+        return
+    logging.getLogger(nome_logger).removeHandler(handler)
+    if fechar:
+        handler.close()
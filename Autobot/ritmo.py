@@ -0,0 +1,167 @@
+import time
+import random
+import logging
+import threading
+
+
+class PoliticaRitmo:
+    """
+    Ritmo de envio compartilhado por todas as sessões de uma execução. Acompanha
+    a duração dos documentos e a taxa de erros do SEI e decide quanto esperar
+    antes do próximo documento:
+
+    - após uma falha por instabilidade (tempo esgotado, conexão, erro 5xx),
+      espera exponencial com variação aleatória;
+    - com o SEI mais lento que o normal, espaça os envios;
+    - após `limite_falhas` falhas seguidas, abre o circuito e suspende os
+      envios por um tempo que dobra a cada nova abertura. Passada a pausa,
+      um único documento de teste decide se os envios voltam ao normal.
+
+    Falhas do próprio documento, como processo inexistente ou formulário
+    diferente, se repetiriam a cada tentativa e não dizem nada sobre o SEI:
+    não contam para o ritmo.
+    """
+
+    def __init__(
+        self,
+        limite_falhas=3,
+        espera_base=2.0,
+        espera_maxima=60.0,
+        pausa_circuito=30.0,
+        pausa_maxima=600.0,
+        fator_lentidao=2.0,
+        suavizacao=0.2,
+        tentativas_adiadas=1,
+        aleatorio=None,
+    ):
+        self.limite_falhas = limite_falhas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.pausa_circuito = pausa_circuito
+        self.pausa_maxima = pausa_maxima
+        self.fator_lentidao = fator_lentidao
+        self.suavizacao = suavizacao
+        # Quantas vezes os arquivos que falharam são tentados de novo ao final
+        self.tentativas_adiadas = tentativas_adiadas
+        self._aleatorio = aleatorio or random.Random()
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Volta ao estado inicial, para uma nova execução não herdar uma pausa."""
+        self.latencia = None  # média móvel da duração dos documentos enviados
+        self.referencia = None  # menor média observada: o SEI folgado
+        self.taxa_erro = 0.0  # média móvel da fração de documentos com falha
+        self.falhas_seguidas = 0
+        self.aberturas = 0
+        self.aberto_ate = 0.0
+        self.testando = False
+        self.proximo_envio = 0.0
+        self.pausas = 0
+        self.recuperados = 0
+
+    def _media(self, anterior, valor):
+        if anterior is None:
+            return valor
+        return anterior + self.suavizacao * (valor - anterior)
+
+    def _variacao(self, espera):
+        # Metade fixa e metade aleatória, para as sessões não voltarem juntas
+        return espera * self._aleatorio.uniform(0.5, 1.0)
+
+    def aguardar(self, controle=None):
+        """
+        Bloqueia até a vez do próximo documento. Retorna False se a execução
+        for cancelada durante a espera.
+        """
+        while True:
+            with self.lock:
+                agora = time.monotonic()
+                circuito_aberto = self.aberto_ate > 0
+                espera = max(self.aberto_ate, self.proximo_envio) - agora
+                if espera <= 0 and not (circuito_aberto and self.testando):
+                    if circuito_aberto:
+                        # Pausa encerrada: só este documento passa, como teste
+                        self.testando = True
+                    return True
+            if controle is not None and controle.cancelado:
+                return False
+            time.sleep(min(max(espera, 0.05), 0.5))
+
+    def registrar(self, sucesso, duracao, instabilidade=True):
+        """
+        Resultado de um documento. Uma falha com instabilidade=False (erro
+        do documento, não do SEI) só libera a vez do documento de teste.
+        """
+        with self.lock:
+            if not sucesso and not instabilidade:
+                # O circuito continua como estava: o próximo documento testa
+                self.testando = False
+                return
+            agora = time.monotonic()
+            self.taxa_erro = self._media(self.taxa_erro, 0.0 if sucesso else 1.0)
+            teste = self.testando
+            self.testando = False
+
+            if sucesso:
+                self.falhas_seguidas = 0
+                if teste:
+                    self.logger.info("SEI respondendo de novo; envios retomados")
+                    self.aberto_ate = 0.0
+                    self.aberturas = 0
+                self.latencia = self._media(self.latencia, duracao)
+                if self.referencia is None or self.latencia < self.referencia:
+                    self.referencia = self.latencia
+                excesso = self.latencia - self.fator_lentidao * self.referencia
+                # SEI mais lento que o normal: dá a ele o tempo excedente
+                self.proximo_envio = agora + (
+                    self._variacao(min(excesso, self.espera_maxima)) if excesso > 0 else 0
+                )
+                return
+
+            self.falhas_seguidas += 1
+            if self.aberto_ate > agora and not teste:
+                # Documento que já estava em andamento quando o circuito abriu
+                return
+            if teste or self.falhas_seguidas >= self.limite_falhas:
+                pausa = min(self.pausa_maxima, self.pausa_circuito * 2**self.aberturas)
+                self.aberturas += 1
+                self.pausas += 1
+                self.aberto_ate = agora + self._variacao(pausa)
+                self.logger.warning(
+                    f"SEI instável: {self.falhas_seguidas} falha(s) seguida(s), "
+                    f"taxa de erro {self.taxa_erro:.0%}; envios suspensos por "
+                    f"até {pausa:.0f}s"
+                )
+                return
+            espera = min(
+                self.espera_maxima, self.espera_base * 2 ** (self.falhas_seguidas - 1)
+            )
+            self.proximo_envio = agora + self._variacao(espera)
+
+    def recuperado(self):
+        with self.lock:
+            self.recuperados += 1
+
+    def contadores(self):
+        with self.lock:
+            contadores = {}
+            if self.pausas:
+                contadores["Pausas por instabilidade do SEI"] = self.pausas
+            if self.recuperados:
+                contadores["Arquivos recuperados na nova tentativa"] = self.recuperados
+            self.pausas = 0
+            self.recuperados = 0
+        return contadores
+
+
+def ritmo_da_execucao(ritmo):
+    """
+    Política para a execução que começa: a recebida, zerada, ou uma nova.
+    Um motor mantido aberto entre execuções não herda a pausa da anterior.
+    """
+    if ritmo is None:
+        return PoliticaRitmo()
+    ritmo.reiniciar()
+    return ritmo
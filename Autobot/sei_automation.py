@@ -1,5 +1,9 @@
 import os
 import sys
+import time
+import logging
+import multiprocessing
+from functools import partial
 from PyQt5.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -12,24 +16,132 @@ from PyQt5.QtWidgets import (
     QFileDialog,
     QCheckBox,
     QLabel,
+    QSpinBox,
+    QProgressBar,
+    QPlainTextEdit,
 )
-from selenium_handler import SEIAutomation
+from pool import PoolNavegadores
+from vigia import VigiaPasta
+from lote import ControleExecucao
+from config import motor_padrao
+from registro import assinar, cancelar_assinatura, iniciar_registro
 from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from dotenv import load_dotenv, set_key
 
 
+class SinalLogHandler(logging.Handler):
+    """
+    Encaminha os registros de log para um sinal do Qt. Roda na thread do
+    log; o Qt entrega o sinal na thread da interface.
+    """
+
+    def __init__(self, sinal):
+        super().__init__()
+        self.sinal = sinal
+        self.setFormatter(logging.Formatter("%(asctime)s %(message)s", "%H:%M:%S"))
+
+    def emit(self, record):
+        self.sinal.emit(self.format(record))
+
+
+class ExecucaoThread(QThread):
+    """Executa a automação fora da thread da interface."""
+
+    # feitos, total, arquivo atual, tempo restante estimado em segundos (-1 se desconhecido)
+    progresso = pyqtSignal(int, int, str, float)
+    log = pyqtSignal(str)
+    concluido = pyqtSignal(object)
+    erro = pyqtSignal(str)
+
+    def __init__(
+        self,
+        usuario,
+        senha,
+        diretorio,
+        fabrica,
+        num_navegadores,
+        automacao,
+        manter,
+        vigiar=False,
+    ):
+        super().__init__()
+        self.usuario = usuario
+        self.senha = senha
+        self.diretorio = diretorio
+        self.fabrica = fabrica
+        self.num_navegadores = num_navegadores
+        self.automacao = automacao
+        self.manter = manter
+        self.vigiar = vigiar
+        self.controle = ControleExecucao(self._ao_progredir)
+        self._inicio = None
+        self._arquivo_atual = ""
+
+    def cancelar(self):
+        self.controle.cancelar()
+
+    def _ao_progredir(self, feitos, total, arquivo):
+        if arquivo:
+            self._arquivo_atual = arquivo
+            if self._inicio is None:
+                self._inicio = time.monotonic()
+        eta = -1.0
+        if feitos and self._inicio is not None:
+            eta = (time.monotonic() - self._inicio) / feitos * (total - feitos)
+        self.progresso.emit(feitos, total, self._arquivo_atual, eta)
+
+    def run(self):
+        # Um arquivo de log por execução; a janela recebe os registros da
+        # thread do log, sem atrasar a automação
+        iniciar_registro()
+        handler = SinalLogHandler(self.log)
+        assinar(handler)
+        try:
+            if self.vigiar:
+                if self.automacao is None or not self.automacao.ativo():
+                    self.automacao = self.fabrica()
+                vigia = VigiaPasta(self.automacao, self.diretorio, controle=self.controle)
+                resumo = vigia.executar(
+                    self.usuario, self.senha, fechar_navegador=not self.manter
+                )
+            elif self.num_navegadores > 1:
+                pool = PoolNavegadores(
+                    self.num_navegadores, fabrica=self.fabrica, controle=self.controle
+                )
+                resumo = pool.executar(self.usuario, self.senha, self.diretorio)
+            else:
+                if self.automacao is None or not self.automacao.ativo():
+                    self.automacao = self.fabrica()
+                self.automacao.controle = self.controle
+                resumo = self.automacao.executar(
+                    self.usuario,
+                    self.senha,
+                    self.diretorio,
+                    fechar_navegador=not self.manter,
+                )
+            self.concluido.emit(resumo)
+        except Exception as e:
+            self.erro.emit(str(e))
+        finally:
+            cancelar_assinatura(handler)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Autobot")
-        self.setGeometry(100, 100, 500, 400)  # Largura e altura
-        self.setFixedSize(500, 400)  # Tamanho fixo
+        self.setGeometry(100, 100, 500, 705)  # Largura e altura
+        self.setFixedSize(500, 705)  # Tamanho fixo
         self.setWindowIcon(QIcon("icon.ico"))
         self.setStyleSheet("background-color: #dfdfdf;")
 
         load_dotenv()
 
+        # Automação mantida aberta entre execuções (navegador "aquecido")
+        self.automacao_aquecida = None
+        self.execucao = None
+
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
@@ -80,6 +192,16 @@ class MainWindow(QMainWindow):
 
         self.checkbox_salvar = QCheckBox("Lembrar usuário e senha")
         layout.addWidget(self.checkbox_salvar)
+
+        self.checkbox_manter = QCheckBox("Manter navegador aberto entre execuções")
+        self.checkbox_manter.setChecked(os.getenv("SEI_MANTER_NAVEGADOR") == "1")
+        layout.addWidget(self.checkbox_manter)
+
+        self.checkbox_vigiar = QCheckBox(
+            "Vigiar a pasta e enviar os arquivos novos assim que chegarem"
+        )
+        self.checkbox_vigiar.setChecked(os.getenv("SEI_VIGIAR_PASTA") == "1")
+        layout.addWidget(self.checkbox_vigiar)
         layout.addSpacing(15)
 
         # Campo de diretório
@@ -91,8 +213,25 @@ class MainWindow(QMainWindow):
 
         self.diretorio_input, diretorio_layout = self._create_directory_input()
         layout.addLayout(diretorio_layout)
+        layout.addSpacing(10)
+
+        # Quantidade de navegadores em paralelo
+        navegadores_layout = QHBoxLayout()
+        label_navegadores = QLabel("Navegadores em paralelo:")
+        label_navegadores.setStyleSheet(
+            "font-size: 13px; font-family: Arial; color: #333333;"
+        )
+        self.navegadores_input = QSpinBox()
+        self.navegadores_input.setRange(1, 8)
+        self.navegadores_input.setValue(int(os.getenv("SEI_NAVEGADORES", "1")))
+        self.navegadores_input.setFixedHeight(30)
+        self.navegadores_input.setStyleSheet("background-color: #ffffff; color: black;")
+        navegadores_layout.addWidget(label_navegadores)
+        navegadores_layout.addWidget(self.navegadores_input)
+        navegadores_layout.addStretch()
+        layout.addLayout(navegadores_layout)
 
-        layout.addSpacing(25)
+        layout.addSpacing(15)
 
         # Botão Executar centralizado
         self.btn_executar = QPushButton("Executar")
@@ -102,11 +241,41 @@ class MainWindow(QMainWindow):
         self.btn_executar.setFixedSize(150, 30)
         self.btn_executar.clicked.connect(self.executar_automacao)
 
+        self.btn_cancelar = QPushButton("Cancelar")
+        self.btn_cancelar.setStyleSheet(
+            "background-color: #9a0e0e; color: white; border-radius: 5px; padding: 4px;"
+        )
+        self.btn_cancelar.setFixedSize(150, 30)
+        self.btn_cancelar.setEnabled(False)
+        self.btn_cancelar.clicked.connect(self.cancelar_automacao)
+
         btn_layout = QHBoxLayout()
         btn_layout.addStretch()
         btn_layout.addWidget(self.btn_executar)
+        btn_layout.addWidget(self.btn_cancelar)
         btn_layout.addStretch()
         layout.addLayout(btn_layout)
+        layout.addSpacing(10)
+
+        # Progresso e log da execução
+        self.barra_progresso = QProgressBar()
+        self.barra_progresso.setFixedHeight(20)
+        self.barra_progresso.setValue(0)
+        layout.addWidget(self.barra_progresso)
+
+        self.label_status = QLabel("")
+        self.label_status.setStyleSheet(
+            "font-size: 12px; font-family: Arial; color: #333333;"
+        )
+        layout.addWidget(self.label_status)
+
+        self.log_texto = QPlainTextEdit()
+        self.log_texto.setReadOnly(True)
+        self.log_texto.setMaximumBlockCount(2000)
+        self.log_texto.setStyleSheet(
+            "background-color: #ffffff; color: black; font-family: Consolas, monospace; font-size: 11px;"
+        )
+        layout.addWidget(self.log_texto)
 
         self._carregar_login_salvo()
 
@@ -181,20 +350,110 @@ class MainWindow(QMainWindow):
             set_key(".env", "SEI_USUARIO", usuario)
             set_key(".env", "SEI_SENHA", senha)
 
-        try:
-            automacao = SEIAutomation()
-            automacao.executar(usuario, senha, diretorio)
-            QMessageBox.information(self, "Sucesso", "Automação concluída com sucesso!")
-        except Exception as e:
-            QMessageBox.critical(self, "Erro", str(e))
-        finally:
-            self.usuario_input.clear()
-            self.senha_input.clear()
-            self.diretorio_input.clear()
-            self.checkbox_salvar.setChecked(False)
+        num_navegadores = self.navegadores_input.value()
+        # Os motores são importados aqui para a janela abrir mais rápido
+        if motor_padrao() == "http":
+            from http_handler import SEIHttpAutomation
+
+            fabrica = SEIHttpAutomation
+        else:
+            from selenium_handler import SEIAutomation
+
+            fabrica = partial(SEIAutomation, headless=os.getenv("SEI_HEADLESS") == "1")
+
+        # No modo vigia uma única sessão recebe os arquivos conforme chegam
+        vigiar = self.checkbox_vigiar.isChecked()
+        manter = self.checkbox_manter.isChecked() and (num_navegadores == 1 or vigiar)
+        if not manter:
+            self._fechar_automacao_aquecida()
+
+        self.execucao = ExecucaoThread(
+            usuario,
+            senha,
+            diretorio,
+            fabrica,
+            num_navegadores,
+            self.automacao_aquecida,
+            manter,
+            vigiar,
+        )
+        self.automacao_aquecida = None
+        self.execucao.progresso.connect(self._atualizar_progresso)
+        self.execucao.log.connect(self.log_texto.appendPlainText)
+        self.execucao.concluido.connect(self._execucao_concluida)
+        self.execucao.erro.connect(self._execucao_com_erro)
+        self.execucao.finished.connect(self._execucao_finalizada)
+
+        self.log_texto.clear()
+        self.barra_progresso.setValue(0)
+        self.label_status.setText(
+            "Iniciando a vigia da pasta..." if vigiar else "Iniciando..."
+        )
+        self.btn_executar.setEnabled(False)
+        self.btn_cancelar.setEnabled(True)
+        self.execucao.start()
+
+    def cancelar_automacao(self):
+        if self.execucao is not None:
+            self.execucao.cancelar()
+            self.btn_cancelar.setEnabled(False)
+            self.label_status.setText("Cancelando após o documento atual...")
+
+    def _atualizar_progresso(self, feitos, total, arquivo, eta):
+        self.barra_progresso.setMaximum(max(total, 1))
+        self.barra_progresso.setValue(feitos)
+        status = f"{feitos}/{total}"
+        if arquivo and feitos < total:
+            status += f" - {arquivo}"
+        if eta >= 0 and feitos < total:
+            minutos, segundos = divmod(int(eta), 60)
+            status += f" - restante: {minutos:02d}:{segundos:02d}"
+        if not self.btn_cancelar.isEnabled() and self.execucao.controle.cancelado:
+            status += " (cancelando)"
+        self.label_status.setText(status)
+
+    def _execucao_concluida(self, resumo):
+        if self.execucao.vigiar:
+            titulo = "Vigia encerrada"
+        else:
+            titulo = "Cancelado" if resumo.cancelado else "Sucesso"
+        QMessageBox.information(
+            self, titulo, f"Automação concluída!\n\n{resumo.texto()}"
+        )
+
+    def _execucao_com_erro(self, mensagem):
+        QMessageBox.critical(self, "Erro", mensagem)
+
+    def _execucao_finalizada(self):
+        if self.execucao.manter:
+            self.automacao_aquecida = self.execucao.automacao
+        self.btn_executar.setEnabled(True)
+        self.btn_cancelar.setEnabled(False)
+        self.label_status.setText("")
+        self.execucao = None
+        self.usuario_input.clear()
+        self.senha_input.clear()
+        self.diretorio_input.clear()
+        self.checkbox_salvar.setChecked(False)
+
+    def _fechar_automacao_aquecida(self):
+        if self.automacao_aquecida is not None:
+            self.automacao_aquecida.fechar()
+            self.automacao_aquecida = None
+
+    def closeEvent(self, event):
+        if self.execucao is not None:
+            # Deixa o documento atual terminar antes de fechar
+            self.execucao.cancelar()
+            self.execucao.wait()
+        self._fechar_automacao_aquecida()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
+    # Necessário no executável do Windows para a validação em paralelo
+    multiprocessing.freeze_support()
+    iniciar_registro()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
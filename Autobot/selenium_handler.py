@@ -1,44 +1,224 @@
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support.ui import Select, WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
 import os
-import re
 from datetime import datetime
 import logging
-import traceback
-import pyautogui
 import time
 
+import acoes_js
+import condicoes
+from config import url_sei
+from conferencia import EnvioPendente, nome_na_arvore
+from sessao import CacheSessao
+from cache_processos import CacheProcessos
+from tempos import perfil_tempo
+from navegador import (
+    GovernadorRecursos,
+    aplicar_bloqueios,
+    memoria_processos_mb,
+    opcoes_chrome,
+    perfil_navegador,
+)
+from lote import ErroSEI, ProcessadorLote
+
+
+# Formas de entregar o arquivo ao formulário do SEI
+UPLOAD_INPUT = "input"  # envia o caminho direto ao <input type="file">
+UPLOAD_DIALOGO = "dialogo"  # explorador de arquivos + pyautogui
+
+class SEIAutomation(ProcessadorLote):
+    nome_motor = "navegador"
+
+    def __init__(
+        self,
+        logger=None,
+        modo_upload=UPLOAD_INPUT,
+        headless=False,
+        tempos=None,
+        diretorio_perfil=None,
+        usar_cache_sessao=True,
+        usar_cache_processos=True,
+        perfil=None,
+        governador=None,
+    ):
+        self.perfil = perfil or perfil_navegador()
+        headless = headless or self.perfil.headless
+        if headless and modo_upload == UPLOAD_DIALOGO:
+            raise ValueError(
+                "O upload pelo explorador de arquivos não funciona em modo headless"
+            )
+        self.modo_upload = modo_upload
+        self.headless = headless
+        self.diretorio_perfil = diretorio_perfil
+        self.tempos = tempos or perfil_tempo()
+        self.usar_cache_sessao = usar_cache_sessao
+        self.usuario_logado = None
+        self._credenciais = None
+        self.processo_aberto = None
+        self.reaproveitamentos = 0
+        self.url_inicial = None
+        self.cache_processos = CacheProcessos() if usar_cache_processos else None
+        self.governador = governador or GovernadorRecursos(self.memoria_mb)
+        self.reciclagens = 0
+        self._falhou = False
+        # Envios da visita atual ao processo, conferidos juntos ao deixá-lo
+        self.envios_pendentes = []
+        self._nos_anteriores = ()
+
+        self.logger = logger or logging.getLogger(__name__)
+        self._abrir_navegador()
+
+    def _abrir_navegador(self):
+        options = opcoes_chrome(self.perfil, self.headless, self.diretorio_perfil)
+        self.driver = webdriver.Chrome(options=options)
+        self.wait = self._espera(self.tempos.elemento)
+        aplicar_bloqueios(self.driver, self.perfil, self.logger)
+        acoes_js.instalar(self.driver, self.logger)
+        self._limite_scripts = 0
+
+    def _espera(self, timeout):
+        return WebDriverWait(
+            self.driver, timeout, poll_frequency=self.tempos.intervalo_polling
+        )
+
+    def registrar_recursos(self):
+        memoria = self.memoria_mb()
+        if memoria is not None:
+            self.logger.info(
+                f"Memória do navegador (perfil {self.perfil.nome}): {memoria:.0f} MB"
+            )
 
-class SEIAutomation:
-    def __init__(self):
-        self.driver = webdriver.Chrome()
-        self.wait = WebDriverWait(self.driver, 10)
-        # Configurar logging
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
+    def memoria_mb(self):
+        """Memória ocupada pelo chromedriver e pelos processos do Chrome."""
+        try:
+            return memoria_processos_mb(self.driver.service.process.pid)
+        except Exception:
+            return None
 
-    def executar(self, usuario, senha, diretorio):
+    def fechar(self):
         try:
-            self.logger.info("Iniciando processo de automação")
-            self.login(usuario, senha)
-            self.processar_arquivos(diretorio)
-        except Exception as e:
-            self.logger.error(f"Erro durante a execução: {str(e)}")
-            self.logger.error(traceback.format_exc())
-            raise
-        finally:
-            self.logger.info("Finalizando automação")
+            self.driver.quit()
+        except:
+            pass
+
+    def reciclar(self, motivo):
+        """
+        Troca o navegador por um novo, levando os cookies da sessão, para
+        devolver ao sistema a memória acumulada em lotes longos. O login só
+        é refeito se o SEI não aceitar a sessão no navegador novo.
+        """
+        self.logger.info(f"Reciclando o navegador: {motivo}")
+        with self.etapa("reciclagem", motivo=motivo):
+            try:
+                cookies = self.driver.get_cookies()
+            except WebDriverException:
+                cookies = []
             try:
                 self.driver.quit()
-            except:
+            except WebDriverException:
+                pass
+            self._abrir_navegador()
+            self.processo_aberto = None
+            sessao_mantida = (
+                cookies
+                and self.url_inicial
+                and self.aplicar_sessao(cookies, self.url_inicial)
+            )
+            if not sessao_mantida:
+                self.usuario_logado = None
+                self.login(*self._credenciais)
+        self.governador.reiniciar()
+        self.reciclagens += 1
+
+    def antes_de_abrir_processo(self):
+        # A página vai ser trocada de qualquer forma: é a hora de reciclar
+        if self._credenciais is None:
+            return
+        motivo = self.governador.motivo_reciclagem()
+        if motivo is None and self._falhou and not self.ativo():
+            motivo = "navegador não responde"
+        self._falhou = False
+        if motivo:
+            self.reciclar(motivo)
+
+    def contadores(self):
+        contadores = {}
+        if self.reciclagens:
+            contadores["Navegadores reciclados"] = self.reciclagens
+            self.reciclagens = 0
+        contadores.update(super().contadores())
+        return contadores
+
+    def falha_transitoria(self, erro):
+        # Só o tempo esgotado: erro do SEI e navegador fechado não são lentidão
+        return isinstance(erro, TimeoutException)
+
+    def ativo(self):
+        """Indica se o navegador ainda responde, para ser reaproveitado."""
+        try:
+            self.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def _pagina_logada(self):
+        """Aguarda a página atual mostrar a pesquisa rápida ou o formulário de login."""
+        try:
+            self.driver.switch_to.default_content()
+            elemento = self._espera(self.tempos.navegacao).until(
+                EC.any_of(
+                    EC.presence_of_element_located((By.ID, "txtPesquisaRapida")),
+                    EC.presence_of_element_located((By.ID, "txtUsuario")),
+                )
+            )
+        except (TimeoutException, WebDriverException):
+            return False
+        return elemento.get_attribute("id") == "txtPesquisaRapida"
+
+    def sessao_ativa(self):
+        # Navegador mantido aberto entre execuções
+        if not self._pagina_logada():
+            return False
+        self.url_inicial = self.url_inicial or self.driver.current_url
+        return True
+
+    def aplicar_sessao(self, cookies, url_inicial):
+        # Os cookies só podem ser definidos com uma página do domínio aberta
+        self.driver.get(url_sei())
+        for cookie in cookies:
+            try:
+                self.driver.add_cookie(cookie)
+            except WebDriverException:
                 pass
+        self.driver.get(url_inicial)
+        if self._pagina_logada():
+            self.url_inicial = self.driver.current_url
+            return True
+        return False
 
     def login(self, usuario, senha):
-        self.driver.get("https://sei.funprespjud.com.br/")
+        self.processo_aberto = None
+        self.unidade_atual = None
+        # Guardadas para refazer o login se o navegador for reciclado
+        self._credenciais = (usuario, senha)
+        if self._restaurar_sessao(usuario):
+            return
+
+        self.driver.get(url_sei())
+        if self._pagina_logada():
+            # Perfil do navegador reaproveitado ainda tem a sessão
+            self.logger.info("Navegador já logado; login dispensado")
+            self.usuario_logado = usuario
+            self.url_inicial = self.driver.current_url
+            return
 
         # Login
         self.wait.until(
@@ -46,9 +226,46 @@ class SEIAutomation:
         ).send_keys(usuario)
         self.driver.find_element(By.ID, "pwdSenha").send_keys(senha)
         self.driver.find_element(By.ID, "sbmAcessar").click()
-        # Buscar processo
 
-    def buscar_processo(self, processo):
+        # Login concluído quando a pesquisa rápida estiver disponível
+        self._espera(self.tempos.navegacao).until(
+            EC.presence_of_element_located((By.ID, "txtPesquisaRapida")),
+            "Login não concluído: pesquisa rápida não apareceu",
+        )
+        self.usuario_logado = usuario
+        self.url_inicial = self.driver.current_url
+        if self.usar_cache_sessao:
+            CacheSessao(usuario).salvar(self.url_inicial, self.driver.get_cookies())
+
+    def _pagina_do_processo(self):
+        """Aguarda a página atual mostrar um processo, um erro ou o login."""
+        try:
+            self.driver.switch_to.default_content()
+            elemento = self._espera(self.tempos.navegacao).until(
+                EC.any_of(
+                    EC.presence_of_element_located((By.ID, "ifrVisualizacao")),
+                    EC.presence_of_element_located((By.ID, "divInfraExcecao")),
+                    EC.presence_of_element_located((By.ID, "txtUsuario")),
+                )
+            )
+        except (TimeoutException, WebDriverException):
+            return False
+        return elemento.get_attribute("id") == "ifrVisualizacao"
+
+    def abrir_endereco(self, url):
+        self.driver.get(url)
+        if self._pagina_do_processo():
+            return True
+        # Voltar a uma página com a pesquisa rápida
+        if self.url_inicial:
+            self.driver.get(self.url_inicial)
+        return False
+
+    def endereco_atual(self):
+        return self.driver.current_url
+
+    def pesquisar_processo(self, processo):
+        self.driver.switch_to.default_content()
         campo_pesquisa = self.wait.until(
             EC.presence_of_element_located((By.ID, "txtPesquisaRapida"))
         )
@@ -56,31 +273,59 @@ class SEIAutomation:
         campo_pesquisa.send_keys(processo)
         campo_pesquisa.send_keys(Keys.RETURN)
 
-    def processar_arquivos(self, diretorio):
-        self.logger.info(f"Iniciando processamento de arquivos em {diretorio}")
-        arquivos = [f for f in os.listdir(diretorio) if f.endswith(".pdf")]
-
-        for arquivo in arquivos:
-            try:
-                self.logger.info(f"Processando arquivo: {arquivo}")
-                processo_base = arquivo.replace(".pdf", "")
-                processo = processo_base.replace(".", "/")
-
-                self.buscar_processo(processo)
-                self.incluir_documento(processo, diretorio)
+        # A pesquisa recarrega a página; aguardar o campo antigo sair do DOM
+        self._espera(self.tempos.navegacao).until(
+            EC.staleness_of(campo_pesquisa),
+            f"Página do processo {processo} não carregou",
+        )
+        if not self._pagina_do_processo():
+            # Processo inexistente ou de outra unidade: o SEI mostra o erro
+            # no lugar da página do processo
+            erros = self.driver.find_elements(By.ID, "divInfraExcecao")
+            if erros:
+                raise ErroSEI(
+                    erros[0].text.strip() or f"Processo {processo} não encontrado"
+                )
+            raise TimeoutException(f"Página do processo {processo} não carregou")
 
-                self.logger.info(f"Arquivo {arquivo} processado com sucesso")
+    def trocar_unidade(self, unidade):
+        self.driver.switch_to.default_content()
+        seletor = self.wait.until(
+            EC.presence_of_element_located((By.ID, "selInfraUnidades"))
+        )
+        unidades = Select(seletor)
+        if unidades.first_selected_option.text.strip() == unidade:
+            return
+        try:
+            unidades.select_by_visible_text(unidade)
+        except NoSuchElementException:
+            raise NoSuchElementException(
+                f"Unidade {unidade} não disponível para o usuário"
+            )
+        self.processo_aberto = None
+        # A troca recarrega a página inteira
+        self._espera(self.tempos.navegacao).until(
+            EC.staleness_of(seletor), f"Troca para a unidade {unidade} não carregou"
+        )
+        self._espera(self.tempos.navegacao).until(
+            condicoes.opcao_selecionada((By.ID, "selInfraUnidades"), unidade),
+            f"Troca para a unidade {unidade} não foi concluída",
+        )
 
-            except Exception as e:
-                self.logger.error(f"Erro ao processar {arquivo}: {str(e)}")
-                self.logger.error(traceback.format_exc())
-                continue
+    def processar_arquivo(self, diretorio, arquivo):
+        resultado = super().processar_arquivo(diretorio, arquivo)
+        if not resultado.sucesso:
+            # Na próxima troca de processo, confere se o navegador ainda responde
+            self._falhou = True
+        return resultado
 
     def escrever_texto_robusto(self, texto, intervalo=0.1, tentativas=3):
         """
         Método para digitar o texto com pyautogui.write de forma robusta,
         incluindo tentativas e intervalo entre as teclas.
         """
+        import pyautogui
+
         for tentativa in range(tentativas):
             pyautogui.write(texto, interval=intervalo)
             time.sleep(0.5)  # Aguarda processamento
@@ -88,242 +333,317 @@ class SEIAutomation:
             self.logger.info(f"Tentativa {tentativa + 1}: Texto digitado.")
             break  # Remove esta linha para permitir múltiplas tentativas
 
-    def incluir_documento(self, processo, diretorio):
-        try:
-            self.logger.info(f"Tentando incluir documento para processo {processo}")
-
-            # Esperar a página carregar completamente
-            self.driver.implicitly_wait(5)
-
-            # Tentar clicar no botão várias vezes se necessário
-            max_tentativas = 3
-            for tentativa in range(max_tentativas):
-                try:
-                    self.logger.info(f"Tentativa {tentativa + 1} de clicar no botão")
-
-                    # Esperar explicitamente pela presença do frame principal (se existir)
-                    try:
-                        frame_principal = self.wait.until(
-                            EC.presence_of_element_located((By.NAME, "ifrVisualizacao"))
-                        )
-                        self.driver.switch_to.frame(frame_principal)
-                        self.logger.info("Mudou para o frame principal")
-                    except:
-                        self.logger.info("Não foi necessário mudar de frame")
-
-                    # Script mais robusto para encontrar e clicar no botão
-                    script_click = """
-                        function encontrarEClicar() {
-                            var links = document.getElementsByTagName('a');
-                            for(var i = 0; i < links.length; i++) {
-                                var link = links[i];
-                                if(link.href.includes('acao=documento_escolher_tipo') &&
-                                   link.querySelector('img[src*="documento_incluir.svg"]')) {
-                                    link.click();
-                                    return true;
-                                }
-                            }
-                            return false;
-                        }
-                        return encontrarEClicar();
-                    """
-
-                    clicked = self.driver.execute_script(script_click)
-
-                    if clicked:
-                        self.logger.info("Botão encontrado e clicado com sucesso")
-                        break
-                    else:
-                        self.logger.warning("Botão não encontrado nesta tentativa")
-
-                except Exception as e:
-                    self.logger.error(f"Erro na tentativa {tentativa + 1}: {str(e)}")
-                    if tentativa == max_tentativas - 1:
-                        raise
-
-                # Voltar ao contexto padrão antes da próxima tentativa
-                try:
-                    self.driver.switch_to.default_content()
-                except:
-                    pass
-
-                # Pequena pausa entre tentativas
-                time.sleep(2)
-
-            # Após clicar no botão "Incluir Documento", vamos selecionar o documento externo
-            try:
-                self.logger.info("Tentando selecionar documento externo")
-
-                # Esperar a página carregar
-                self.driver.implicitly_wait(5)
-
-                # Tentar clicar no link "Externo" várias vezes se necessário
-                max_tentativas = 3
-                for tentativa in range(max_tentativas):
-                    try:
-                        self.logger.info(
-                            f"Tentativa {tentativa + 1} de clicar em 'Externo'"
-                        )
-
-                        # Script para encontrar e clicar no link "Externo"
-                        script_click = """
-                            function encontrarEClicarExterno() {
-                                var links = document.getElementsByTagName('a');
-                                for(var i = 0; i < links.length; i++) {
-                                    var link = links[i];
-                                    if(link.href.includes('acao=documento_receber') && 
-                                       link.textContent.trim() === 'Externo' &&
-                                       link.className === 'ancoraOpcao') {
-                                        link.click();
-                                        return true;
-                                    }
-                                }
-                                return false;
-                            }
-                            return encontrarEClicarExterno();
-                        """
-
-                        clicked = self.driver.execute_script(script_click)
-
-                        if clicked:
-                            self.logger.info(
-                                "Link 'Externo' encontrado e clicado com sucesso"
-                            )
-                            break
-                        else:
-                            self.logger.warning(
-                                "Link 'Externo' não encontrado nesta tentativa"
-                            )
-
-                    except Exception as e:
-                        self.logger.error(
-                            f"Erro na tentativa {tentativa + 1}: {str(e)}"
-                        )
-                        if tentativa == max_tentativas - 1:
-                            raise
-
-                    # Pequena pausa entre tentativas
-                    time.sleep(2)
-
-                self.logger.info("Continuando com o preenchimento do formulário")
-
-                # Continuar com o resto do processo
-                self.driver.switch_to.default_content()
-
-                # Mudar para o iframe antes de procurar elementos do formulário
-                self.wait.until(
-                    EC.frame_to_be_available_and_switch_to_it(
-                        (By.ID, "ifrVisualizacao")
-                    )
-                )
-                self.logger.info("Mudou para o iframe 'ifrVisualizacao'")
+    def _anexar_arquivo_input(self, caminho_arquivo):
+        """
+        Entrega o caminho do arquivo diretamente ao input do formulário,
+        sem abrir o explorador de arquivos. Funciona com o Chrome headless.
+        """
+        nome_arquivo = os.path.basename(caminho_arquivo)
+        input_arquivo = self.wait.until(
+            EC.presence_of_element_located((By.ID, "filArquivo"))
+        )
+        input_arquivo.send_keys(caminho_arquivo)
+        self.logger.info(f"Arquivo {nome_arquivo} selecionado")
+
+        # O SEI envia o arquivo assim que o input muda; aguardar ele aparecer
+        # na tabela de anexos e salvar, na mesma chamada ao navegador
+        self._roteiro(
+            [
+                acoes_js.passo(
+                    "aguardar_texto",
+                    self.tempos.upload,
+                    f"Envio do arquivo {nome_arquivo} não terminou",
+                    id="tblAnexos",
+                    texto=nome_arquivo,
+                ),
+                acoes_js.passo(
+                    "clicar_botao",
+                    self.tempos.elemento,
+                    "Botão 'Salvar' não encontrado",
+                    texto="Salvar",
+                ),
+            ],
+            medir=False,
+        )
 
-                # Aguardar e clicar no 'Tipo de Documento'
-                select_element = self.wait.until(
-                    EC.presence_of_element_located((By.ID, "selSerie"))
-                )
-                select_element.click()
-
-                # Aguardar e clicar na opção "Comprovante"
-                self.wait.until(
-                    EC.presence_of_element_located(
-                        (
-                            By.XPATH,
-                            "//select[@id='selSerie']/option[text()='Comprovante']",
-                        )
-                    )
-                ).click()
-
-                # Aguardar um momento para a seleção ser processada
-                time.sleep(1)
-
-                # Preencher a data
-                data_atual = datetime.now().strftime("%d/%m/%Y")
-                self.driver.execute_script(
-                    f"document.getElementById('txtDataElaboracao').value = '{data_atual}';"
-                )
-                time.sleep(2)
-                # Preencher formulário
+    def _aguardar_salvamento(self, formulario):
+        """
+        Espera o formulário do documento sair da página e o botão 'Incluir
+        Documento' voltar ao frame de visualização do processo. Chamado com
+        o driver no frame do formulário; termina na página principal.
+        """
+        espera = self._espera(self.tempos.navegacao)
+        espera.until(
+            EC.staleness_of(formulario), "Salvamento do documento não terminou"
+        )
+        endereco = self.driver.execute_script("return document.location.href")
+        self.driver.switch_to.default_content()
+        if "acao=procedimento_trabalhar" in endereco:
+            # O SEI devolveu a página inteira do processo dentro do frame:
+            # ela passa a ser a página principal, sem frames aninhados
+            self.driver.get(endereco)
+        espera.until(
+            condicoes.link_no_frame("ifrVisualizacao", "acao=documento_escolher_tipo"),
+            "Página do processo não voltou depois do salvamento",
+        )
 
-                # Formato nato-digital
-                self.driver.find_element(By.ID, "divOptNato").click()
+    def _anexar_arquivo_dialogo(self, caminho_arquivo):
+        """
+        Caminho antigo: abre o explorador de arquivos do sistema e digita o
+        caminho com o pyautogui. Exige área de trabalho visível e foco.
+        """
+        # Importado só aqui: o pyautogui exige uma tela e atrasa a inicialização
+        import pyautogui
 
-                # Garantir que o fieldset de nível de acesso esteja visível
-                self.wait.until(
-                    EC.presence_of_element_located((By.ID, "fldNivelAcesso"))
-                )
+        nome_arquivo = os.path.basename(caminho_arquivo)
 
-                # Nível de acesso público
-                self.driver.find_element(By.ID, "divOptPublico").click()
+        # Garantir que o label 'Anexar Arquivo' esteja acessível antes de interagir
+        lbl_arquivo = self.wait.until(
+            EC.element_to_be_clickable((By.ID, "lblArquivo"))
+        )
 
-                # Anexar arquivo
-                self.logger.info("Anexando arquivo")
+        # Clicar no label para abrir o explorador de arquivos
+        lbl_arquivo.click()
+        self.logger.info("Explorador de arquivos acionado")
 
-                # Aguardar a presença da aba de anexos
-                self.wait.until(EC.presence_of_element_located((By.ID, "frmAnexos")))
+        # Aguardar um pequeno intervalo para garantir que o explorador abriu
+        time.sleep(2)
 
-                # Garantir que o label 'Anexar Arquivo' esteja acessível antes de interagir
-                lbl_arquivo = self.wait.until(
-                    EC.element_to_be_clickable((By.ID, "lblArquivo"))
+        # Garantir que o explorador de arquivos está aberto
+        tentativas = 3
+        for tentativa in range(tentativas):
+            if pyautogui.getActiveWindow() is None:
+                self.logger.warning(
+                    f"Tentativa {tentativa + 1}: Explorador não detectado, tentando novamente..."
                 )
-
-                # Clicar no label para abrir o explorador de arquivos
                 lbl_arquivo.click()
-                self.logger.info("Explorador de arquivos acionado")
-
-                # Aguardar um pequeno intervalo para garantir que o explorador abriu
                 time.sleep(2)
+            else:
+                break
 
-                # Garantir que o explorador de arquivos está aberto
-                tentativas = 3
-                for tentativa in range(tentativas):
-                    if pyautogui.getActiveWindow() is None:
-                        self.logger.warning(
-                            f"Tentativa {tentativa + 1}: Explorador não detectado, tentando novamente..."
-                        )
-                        lbl_arquivo.click()
-                        time.sleep(2)
-                    else:
-                        break
-
-                # Definir o nome do arquivo e caminho
-                nome_arquivo = processo.replace("/", ".") + ".pdf"
-                caminho_arquivo = os.path.join(diretorio, nome_arquivo)
-                time.sleep(
-                    2
-                )  # Aguardar um momento para garantir que o explorador está ativo
-
-                # Usar método robusto para digitar o caminho do arquivo
-                self.escrever_texto_robusto(
-                    caminho_arquivo, intervalo=0.025, tentativas=3
-                )
-                time.sleep(2)  # Pequeno intervalo antes de pressionar Enter
-                pyautogui.press("enter")
-                self.logger.info(f"Arquivo {nome_arquivo} selecionado")
-
-                # Aguarde um breve momento para garantir que a janela está ativa
-                time.sleep(2)
+        time.sleep(2)  # Aguardar um momento para garantir que o explorador está ativo
 
-                # Pressiona 'Tab' para mover o foco para o botão de salvar
-                pyautogui.press("tab")
+        # Usar método robusto para digitar o caminho do arquivo
+        self.escrever_texto_robusto(caminho_arquivo, intervalo=0.025, tentativas=3)
+        time.sleep(2)  # Pequeno intervalo antes de pressionar Enter
+        pyautogui.press("enter")
+        self.logger.info(f"Arquivo {nome_arquivo} selecionado")
 
-                # Aguarda um pequeno intervalo para garantir a mudança de foco
-                time.sleep(0.5)
+        # Aguarde um breve momento para garantir que a janela está ativa
+        time.sleep(2)
 
-                # Pressiona 'Enter' para confirmar o salvamento
-                pyautogui.press("enter")
-                time.sleep(3)  # Aguardar o arquivo ser carregado
-                self.logger.info("Documento salvo com sucesso")
+        # Pressiona 'Tab' para mover o foco para o botão de salvar
+        pyautogui.press("tab")
 
-                # Voltar ao contexto principal
-                self.driver.switch_to.default_content()
+        # Aguarda um pequeno intervalo para garantir a mudança de foco
+        time.sleep(0.5)
 
-            except Exception as e:
-                self.logger.error(f"Erro ao incluir documento: {str(e)}")
-                self.logger.error(traceback.format_exc())
-                raise
+        # Pressiona 'Enter' para confirmar o salvamento
+        pyautogui.press("enter")
 
-        except Exception as e:
-            self.logger.error(f"Erro ao incluir documento: {str(e)}")
-            self.logger.error(traceback.format_exc())
-            raise
+    def _roteiro(self, passos, processo=None, medir=True):
+        """
+        Executa os passos da biblioteca injetada numa única chamada ao
+        navegador e registra o tempo de cada um como etapa.
+        """
+        limite = acoes_js.limite_total(passos)
+        if limite > self._limite_scripts:
+            self.driver.set_script_timeout(limite)
+            self._limite_scripts = limite
+        resultado = acoes_js.executar(self.driver, passos)
+        if medir and self.metricas is not None:
+            falho = None if resultado["ok"] else passos[resultado["indice"]]["nome"]
+            for nome, duracao in resultado["tempos"].items():
+                self.metricas.registrar(
+                    nome,
+                    duracao,
+                    status="erro" if nome == falho else "ok",
+                    processo=processo,
+                )
+        if not resultado["ok"]:
+            passo = passos[resultado["indice"]]
+            mensagem = passo["mensagem"]
+            if resultado["erro"]:
+                mensagem += f" ({resultado['erro']})"
+            if passo.get("pagina_pronta") and resultado.get("carregada"):
+                # A página já estava pronta e o elemento não apareceu: não é
+                # lentidão, é uma página diferente da esperada
+                raise ErroSEI(mensagem)
+            raise TimeoutException(mensagem)
+        return resultado["valores"]
+
+    def _passos_formulario(self, data, nome_arvore, listar_arvore=False):
+        """Da leitura da árvore até o formulário do documento externo preenchido."""
+        navegacao, elemento = self.tempos.navegacao, self.tempos.elemento
+        passo = acoes_js.passo
+        passos = []
+        if listar_arvore:
+            # Documentos já existentes, para a conferência não contar com eles
+            passos.append(
+                passo(
+                    "listar_documentos",
+                    elemento,
+                    "Árvore do processo não carregou",
+                    nome="incluir.leitura_arvore",
+                    frame="ifrArvore",
+                    chave="documentos",
+                    tipo="Comprovante",
+                    minimo=0,
+                )
+            )
+        return passos + [
+            passo(
+                "clicar_link",
+                navegacao,
+                "Botão 'Incluir Documento' não encontrado",
+                nome="incluir.botao",
+                pagina_pronta=True,
+                frame="ifrVisualizacao",
+                href="acao=documento_escolher_tipo",
+                imagem="documento_incluir.svg",
+            ),
+            passo(
+                "clicar_link",
+                navegacao,
+                "Link 'Externo' não encontrado",
+                nome="incluir.externo",
+                frame="ifrVisualizacao",
+                href="acao=documento_receber",
+                texto="Externo",
+                classe="ancoraOpcao",
+            ),
+            passo(
+                "aguardar_elementos",
+                navegacao,
+                "Formulário do documento externo não carregou",
+                nome="incluir.frame",
+                frame="ifrVisualizacao",
+                ids=["selSerie", "frmAnexos"],
+            ),
+            passo(
+                "selecionar",
+                elemento,
+                "Tipo 'Comprovante' não foi selecionado",
+                nome="incluir.tipo",
+                pagina_pronta=True,
+                frame="ifrVisualizacao",
+                id="selSerie",
+                texto="Comprovante",
+            ),
+            passo(
+                "preencher",
+                elemento,
+                "Data de elaboração não foi preenchida",
+                nome="incluir.formulario",
+                pagina_pronta=True,
+                frame="ifrVisualizacao",
+                id="txtDataElaboracao",
+                valor=data,
+            ),
+            passo(
+                "preencher",
+                elemento,
+                "Nome na árvore não foi preenchido",
+                nome="incluir.formulario",
+                pagina_pronta=True,
+                frame="ifrVisualizacao",
+                id="txtNomeArvore",
+                valor=nome_arvore,
+            ),
+            passo(
+                "marcar",
+                elemento,
+                "Formato nato-digital não foi marcado",
+                nome="incluir.formulario",
+                pagina_pronta=True,
+                frame="ifrVisualizacao",
+                id="optNato",
+                div="divOptNato",
+            ),
+            passo(
+                "marcar",
+                elemento,
+                "Nível de acesso público não foi marcado",
+                nome="incluir.formulario",
+                pagina_pronta=True,
+                frame="ifrVisualizacao",
+                id="optPublico",
+                div="divOptPublico",
+            ),
+        ]
+
+    def ler_arvore(self, minimo):
+        """
+        Nós dos documentos na árvore do processo, assim que houver ao menos
+        `minimo` deles.
+        """
+        passos = [
+            acoes_js.passo(
+                "listar_documentos",
+                self.tempos.confirmacao,
+                "Documentos enviados não apareceram na árvore do processo",
+                frame="ifrArvore",
+                chave="documentos",
+                tipo="Comprovante",
+                minimo=minimo,
+            )
+        ]
+        self.driver.switch_to.default_content()
+        try:
+            return self._roteiro(passos, medir=False)["documentos"]
+        except TimeoutException:
+            # Lê o que houver, para a conferência apontar quais faltaram
+            passos[0]["minimo"] = 0
+            return self._roteiro(passos, medir=False)["documentos"]
+        except WebDriverException:
+            # A página inteira foi recarregada durante a espera: segue
+            # lendo a árvore pelo WebDriver
+            return self._espera(self.tempos.confirmacao).until(
+                condicoes.documentos_na_arvore(minimo),
+                "Documentos enviados não apareceram na árvore do processo",
+            )
+
+    def incluir_documento(self, processo, diretorio, nome_arquivo=None):
+        # Os erros sobem para processar_arquivo, que os registra uma vez
+        self.governador.registrar_documento()
+        self.logger.info(f"Tentando incluir documento para processo {processo}")
+
+        # Árvore, "Incluir Documento", "Externo" e o formulário numa
+        # única chamada ao navegador
+        self.driver.switch_to.default_content()
+        data_atual = datetime.now().strftime("%d/%m/%Y")
+        nome_arquivo = nome_arquivo or processo.replace("/", ".") + ".pdf"
+        nome_arvore = nome_na_arvore(nome_arquivo)
+        # A árvore só é lida no primeiro documento da visita ao processo
+        primeiro = not self.envios_pendentes
+        valores = self._roteiro(
+            self._passos_formulario(data_atual, nome_arvore, primeiro),
+            processo,
+        )
+        if primeiro:
+            self._nos_anteriores = [no["id"] for no in valores["documentos"]]
+        self.logger.info("Documento externo escolhido e formulário preenchido")
+
+        # Anexar arquivo
+        self.logger.info("Anexando arquivo")
+
+        caminho_arquivo = os.path.abspath(os.path.join(diretorio, nome_arquivo))
+
+        with self.etapa("incluir.upload", processo=processo):
+            self.driver.switch_to.frame("ifrVisualizacao")
+            formulario = self.driver.find_element(By.ID, "selSerie")
+            if self.modo_upload == UPLOAD_DIALOGO:
+                self._anexar_arquivo_dialogo(caminho_arquivo)
+            else:
+                self._anexar_arquivo_input(caminho_arquivo)
+
+        # A página só é reaproveitada pelo próximo arquivo depois que o SEI
+        # terminar de salvar este
+        with self.etapa("incluir.salvamento", processo=processo):
+            self._aguardar_salvamento(formulario)
+
+        # Conferido na árvore junto com os outros envios da visita
+        self.envios_pendentes.append(
+            EnvioPendente(nome_arquivo, processo, data_atual, nome_arvore)
+        )
+        self.logger.info("Documento enviado; conferência ao deixar o processo")
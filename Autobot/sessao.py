@@ -0,0 +1,70 @@
+import os
+import json
+import time
+import hashlib
+
+from config import diretorio_dados, url_sei, validade_sessao
+
+
+class CacheSessao:
+    """
+    Guarda em disco os cookies e a página inicial de uma sessão autenticada
+    do SEI, para que a próxima execução dispense o login enquanto a sessão
+    continuar válida. O arquivo contém a sessão do usuário e só é legível
+    pelo dono.
+    """
+
+    def __init__(self, usuario, validade_minutos=None, diretorio=None):
+        self.validade = 60 * (validade_minutos or validade_sessao())
+        chave = hashlib.sha256(f"{url_sei()}|{usuario}".encode()).hexdigest()[:16]
+        diretorio = diretorio or os.path.join(diretorio_dados(), "sessoes")
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, f"sessao_{chave}.json")
+
+    def carregar(self):
+        """Retorna {"url_inicial", "cookies", "salvo_em"} ou None se expirada."""
+        try:
+            with open(self.caminho, encoding="utf-8") as arquivo:
+                dados = json.load(arquivo)
+        except (OSError, ValueError):
+            return None
+        if time.time() - dados.get("salvo_em", 0) > self.validade:
+            self.invalidar()
+            return None
+        return dados
+
+    def salvar(self, url_inicial, cookies):
+        dados = {"url_inicial": url_inicial, "cookies": cookies, "salvo_em": time.time()}
+        descritor = os.open(self.caminho, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descritor, "w", encoding="utf-8") as arquivo:
+            json.dump(dados, arquivo)
+
+    def invalidar(self):
+        try:
+            os.remove(self.caminho)
+        except OSError:
+            pass
+
+
+def cookies_do_requests(jar):
+    """Converte os cookies de uma requests.Session no formato do Selenium."""
+    return [
+        {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "secure": cookie.secure,
+        }
+        for cookie in jar
+    ]
+
+
+def aplicar_no_requests(jar, cookies):
+    for cookie in cookies:
+        jar.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"),
+        )
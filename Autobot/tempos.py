@@ -0,0 +1,58 @@
+import os
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PerfilTempo:
+    """
+    Tempos máximos (em segundos) de espera por cada tipo de condição da
+    página. Nenhum deles é uma pausa fixa: a automação segue assim que a
+    condição é satisfeita e só espera o valor inteiro quando algo deu errado.
+    """
+
+    nome: str
+    elemento: float  # presença/clique de elementos comuns
+    navegacao: float  # troca de página (pesquisa, login, salvar)
+    upload: float  # envio do arquivo até aparecer na tabela de anexos
+    confirmacao: float  # documento novo aparecer na árvore do processo
+    intervalo_polling: float  # intervalo entre verificações da condição
+
+
+PERFIS_TEMPO = {
+    "lan_rapida": PerfilTempo(
+        nome="lan_rapida",
+        elemento=5,
+        navegacao=10,
+        upload=30,
+        confirmacao=15,
+        intervalo_polling=0.1,
+    ),
+    "padrao": PerfilTempo(
+        nome="padrao",
+        elemento=10,
+        navegacao=20,
+        upload=60,
+        confirmacao=30,
+        intervalo_polling=0.25,
+    ),
+    "vpn_lenta": PerfilTempo(
+        nome="vpn_lenta",
+        elemento=20,
+        navegacao=45,
+        upload=180,
+        confirmacao=60,
+        intervalo_polling=0.5,
+    ),
+}
+
+
+def perfil_tempo(nome=None):
+    """Retorna o perfil pelo nome ou pela variável SEI_PERFIL_TEMPO do .env."""
+    nome = nome or os.getenv("SEI_PERFIL_TEMPO", "padrao")
+    try:
+        return PERFIS_TEMPO[nome]
+    except KeyError:
+        raise ValueError(
+            f"Perfil de tempo desconhecido: {nome}. "
+            f"Opções: {', '.join(PERFIS_TEMPO)}"
+        )
@@ -0,0 +1,372 @@
+"""
+Testes do que roda sem o SEI e sem navegador: conferência na árvore, diário
+do lote, ritmo de envio, fila das sessões e um lote completo pelo motor HTTP
+contra o servidor local (mock_sei.py).
+
+    python -m unittest test_autobot
+"""
+
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from collections import Counter
+
+import benchmark
+import mock_sei
+from conferencia import EnvioPendente, conferir
+from diario import (
+    NOME_DIARIO,
+    STATUS_CONFIRMADO,
+    STATUS_ENVIADO,
+    STATUS_FALHA,
+    DiarioLote,
+)
+from escalonador import FilaJusta, Grupo, LotePasta, Pasta
+from lote import STATUS_FALHA as FALHA, STATUS_SUCESSO, ResultadoArquivo
+from metricas import RegistroTempos
+from ritmo import PoliticaRitmo, ritmo_da_execucao
+
+
+def no(id, texto, titulo=""):
+    return {"id": id, "texto": texto, "titulo": titulo}
+
+
+class TestConferencia(unittest.TestCase):
+    def setUp(self):
+        self.pendente = EnvioPendente(
+            "00123.2024.pdf", "00123/2024", "10/03/2024", "00123.2024"
+        )
+
+    def test_confirma_documento_novo_com_nome_e_data(self):
+        nos = [no("anchor1", "Comprovante 00123.2024 (10/03/2024)")]
+        self.assertEqual(conferir(nos, [self.pendente]), [])
+
+    def test_documento_que_ja_existia_nao_confirma(self):
+        nos = [no("anchor1", "Comprovante 00123.2024")]
+        nao_confirmados = conferir(nos, [self.pendente], anteriores=["anchor1"])
+        self.assertEqual([a for a, _ in nao_confirmados], ["00123.2024.pdf"])
+
+    def test_data_diferente_nao_confirma(self):
+        nos = [no("anchor1", "Comprovante 00123.2024 (11/03/2024)")]
+        (arquivo, motivo), = conferir(nos, [self.pendente])
+        self.assertEqual(arquivo, "00123.2024.pdf")
+        self.assertIn("esperada 10/03/2024", motivo)
+
+    def test_nome_com_sufixo_nao_confirma_o_primeiro(self):
+        nos = [no("anchor1", "Comprovante 00123.2024_2")]
+        self.assertEqual(len(conferir(nos, [self.pendente])), 1)
+
+    def test_cada_no_confirma_um_envio(self):
+        # Dois envios com o mesmo nome precisam de dois nós
+        outro = EnvioPendente("x.pdf", "00123/2024", "10/03/2024", "00123.2024")
+        nos = [no("anchor1", "Comprovante 00123.2024")]
+        nao_confirmados = conferir(nos, [self.pendente, outro])
+        self.assertEqual([a for a, _ in nao_confirmados], ["x.pdf"])
+
+    def test_ignora_nos_de_outro_tipo(self):
+        nos = [no("anchor1", "Despacho 00123.2024")]
+        self.assertEqual(len(conferir(nos, [self.pendente])), 1)
+
+
+class TestDiarioLote(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+        benchmark.gerar_lote(self.pasta, 3)
+        self.arquivos = sorted(os.listdir(self.pasta))
+
+    def abrir(self):
+        diario = DiarioLote(self.pasta)
+        self.addCleanup(diario.fechar)
+        return diario
+
+    def status(self, arquivo):
+        with sqlite3.connect(os.path.join(self.pasta, NOME_DIARIO)) as conexao:
+            return conexao.execute(
+                "SELECT status, tentativas FROM arquivos WHERE arquivo = ?", (arquivo,)
+            ).fetchone()
+
+    def sucesso(self, arquivo):
+        return ResultadoArquivo(arquivo, "", STATUS_SUCESSO)
+
+    def test_conteudo_repetido_no_lote_e_ignorado(self):
+        copia = "00009.2024.pdf"
+        shutil.copy(
+            os.path.join(self.pasta, self.arquivos[0]), os.path.join(self.pasta, copia)
+        )
+        a_processar, ignorados = self.abrir().filtrar(self.arquivos + [copia])
+        self.assertEqual(a_processar, self.arquivos)
+        self.assertEqual(ignorados, [(copia, f"mesmo conteúdo de {self.arquivos[0]}")])
+
+    def test_confirmado_nao_volta_nem_renomeado(self):
+        diario = self.abrir()
+        diario.filtrar(self.arquivos)
+        diario.registrar(self.sucesso(self.arquivos[0]))
+        diario.confirmar(self.arquivos[0])
+        diario.fechar()
+
+        novo_nome = "00042.2024.pdf"
+        os.rename(
+            os.path.join(self.pasta, self.arquivos[0]),
+            os.path.join(self.pasta, novo_nome),
+        )
+        a_processar, ignorados = self.abrir().filtrar([novo_nome] + self.arquivos[1:])
+        self.assertEqual(a_processar, self.arquivos[1:])
+        self.assertEqual([a for a, _ in ignorados], [novo_nome])
+        self.assertIn("arquivo renomeado", ignorados[0][1])
+
+    def test_enviado_sem_conferencia_e_retomado(self):
+        diario = self.abrir()
+        diario.filtrar(self.arquivos)
+        diario.iniciar(self.arquivos[0])
+        diario.registrar(self.sucesso(self.arquivos[0]))
+        diario.iniciar(self.arquivos[1])
+        # O lote parou antes da conferência
+        diario.fechar()
+        self.assertEqual(self.status(self.arquivos[0]), (STATUS_ENVIADO, 1))
+
+        diario = self.abrir()
+        self.assertCountEqual(diario.interrompidos(), self.arquivos[:2])
+        a_processar, ignorados = diario.filtrar(self.arquivos)
+        self.assertEqual((a_processar, ignorados), (self.arquivos, []))
+        anterior = diario.envio_sem_conferencia(self.arquivos[0])
+        self.assertEqual(anterior.processo, "00001/2024")
+        self.assertEqual(anterior.nome_arvore, "00001.2024")
+        self.assertIsNotNone(diario.envio_sem_conferencia(self.arquivos[1]))
+        self.assertIsNone(diario.envio_sem_conferencia(self.arquivos[2]))
+
+        diario.confirmar(self.arquivos[0])
+        self.assertIsNone(diario.envio_sem_conferencia(self.arquivos[0]))
+        self.assertEqual(self.status(self.arquivos[0]), (STATUS_CONFIRMADO, 1))
+
+    def test_reprovado_fica_como_falha_sem_nova_tentativa(self):
+        diario = self.abrir()
+        diario.filtrar(self.arquivos)
+        diario.registrar(self.sucesso(self.arquivos[0]))
+        diario.reprovar(ResultadoArquivo(self.arquivos[0], "", FALHA, erro="sumiu"))
+        self.assertEqual(self.status(self.arquivos[0]), (STATUS_FALHA, 1))
+        self.assertEqual(self.abrir().interrompidos(), [])
+
+
+class TestPoliticaRitmo(unittest.TestCase):
+    def setUp(self):
+        self.ritmo = PoliticaRitmo(
+            limite_falhas=3,
+            espera_base=2.0,
+            pausa_circuito=30.0,
+            aleatorio=random.Random(0),
+        )
+
+    def falhar(self, vezes=1, instabilidade=True):
+        for _ in range(vezes):
+            self.ritmo.registrar(False, 1.0, instabilidade)
+
+    def encerrar_pausa(self):
+        # Sem esperar a pausa e o espaçamento das falhas anteriores
+        self.ritmo.aberto_ate = self.ritmo.proximo_envio = time.monotonic() - 1
+        self.assertTrue(self.ritmo.aguardar())
+        self.assertTrue(self.ritmo.testando)
+
+    def test_espera_exponencial_antes_do_circuito(self):
+        self.falhar()
+        primeira = self.ritmo.proximo_envio - time.monotonic()
+        self.falhar()
+        segunda = self.ritmo.proximo_envio - time.monotonic()
+        # Metade fixa e metade aleatória de 2s e de 4s
+        self.assertTrue(0.9 <= primeira <= 2.0, primeira)
+        self.assertTrue(1.9 <= segunda <= 4.0, segunda)
+        self.assertEqual(self.ritmo.aberto_ate, 0.0)
+
+    def test_circuito_abre_no_limite_e_fecha_com_o_teste(self):
+        self.falhar(3)
+        self.assertGreater(self.ritmo.aberto_ate, time.monotonic() + 14)
+        self.assertEqual(
+            self.ritmo.contadores(), {"Pausas por instabilidade do SEI": 1}
+        )
+
+        self.encerrar_pausa()
+        self.ritmo.registrar(True, 1.0)
+        self.assertEqual((self.ritmo.aberto_ate, self.ritmo.aberturas), (0.0, 0))
+        self.assertEqual(self.ritmo.falhas_seguidas, 0)
+
+    def test_teste_com_falha_dobra_a_pausa(self):
+        self.falhar(3)
+        self.encerrar_pausa()
+        self.falhar()
+        self.assertEqual(self.ritmo.aberturas, 2)
+        self.assertGreater(self.ritmo.aberto_ate, time.monotonic() + 29)
+        self.assertFalse(self.ritmo.testando)
+
+    def test_erro_do_documento_nao_conta(self):
+        self.falhar(5, instabilidade=False)
+        self.assertEqual(self.ritmo.falhas_seguidas, 0)
+        self.assertEqual(self.ritmo.aberto_ate, 0.0)
+
+        # Durante o teste, só libera a vez para o próximo documento testar
+        self.falhar(3)
+        self.encerrar_pausa()
+        self.falhar(instabilidade=False)
+        self.assertFalse(self.ritmo.testando)
+        self.assertEqual(self.ritmo.aberturas, 1)
+
+    def test_nova_execucao_nao_herda_a_pausa(self):
+        self.falhar(3)
+        self.assertIs(ritmo_da_execucao(self.ritmo), self.ritmo)
+        self.assertEqual((self.ritmo.aberto_ate, self.ritmo.falhas_seguidas), (0.0, 0))
+        self.assertEqual(self.ritmo.contadores(), {})
+        self.assertIsInstance(ritmo_da_execucao(None), PoliticaRitmo)
+
+
+class TestFilaJusta(unittest.TestCase):
+    def setUp(self):
+        self.lotes = {u: LotePasta(Pasta(u, u)) for u in "ABC"}
+
+    def grupo(self, unidade, nome, adiado=False):
+        return Grupo(self.lotes[unidade], [nome], adiado)
+
+    def retirar_todos(self, fila, atende=lambda u: True):
+        nomes, unidade = [], None
+        while True:
+            grupo = fila.proximo(atende, unidade)
+            if grupo is None:
+                return nomes
+            nomes.append(grupo.arquivos[0])
+            unidade = grupo.unidade
+            fila.concluir()
+
+    def test_pasta_grande_nao_atrasa_as_outras(self):
+        fila = FilaJusta(folga=2)
+        for i in range(1, 7):
+            fila.adicionar(self.grupo("A", f"A{i}"))
+        fila.adicionar(self.grupo("B", "B1"))
+        fila.adicionar(self.grupo("B", "B2"))
+        # Fica em A até abrir a folga de 2 grupos sobre B, e volta depois
+        self.assertEqual(
+            self.retirar_todos(fila), ["A1", "A2", "B1", "B2", "A3", "A4", "A5", "A6"]
+        )
+
+    def test_adiados_depois_dos_normais(self):
+        fila = FilaJusta()
+        fila.adiar(self.grupo("A", "A0", adiado=True))
+        fila.adicionar(self.grupo("A", "A1"))
+        fila.adicionar(self.grupo("B", "B1"))
+        self.assertEqual(self.retirar_todos(fila), ["A1", "B1", "A0"])
+
+    def test_devolvido_volta_ao_inicio(self):
+        fila = FilaJusta()
+        fila.adicionar(self.grupo("A", "A1"))
+        fila.adicionar(self.grupo("A", "A2"))
+        grupo = fila.proximo(lambda u: True)
+        fila.devolver(grupo)
+        fila.concluir()
+        self.assertEqual(self.retirar_todos(fila), ["A1", "A2"])
+
+    def test_so_unidades_atendidas(self):
+        fila = FilaJusta()
+        fila.adicionar(self.grupo("A", "A1"))
+        fila.adicionar(self.grupo("C", "C1"))
+        self.assertEqual(self.retirar_todos(fila, lambda u: u == "C"), ["C1"])
+        self.assertEqual([g.arquivos for g in fila.restantes()], [["A1"]])
+
+
+class TestLoteNoMock(unittest.TestCase):
+    """Lote completo pelo motor HTTP contra o servidor local."""
+
+    def setUp(self):
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base, ignore_errors=True)
+        self.pasta = os.path.join(base, "lote")
+        benchmark.gerar_lote(self.pasta, 6, por_processo=2)
+        self.servidor, url = mock_sei.iniciar_em_segundo_plano()
+        self.addCleanup(self.servidor.shutdown)
+        self.addCleanup(self.servidor.server_close)
+        ambiente = {"SEI_URL": url, "AUTOBOT_DADOS": os.path.join(base, "dados")}
+        antigo = {nome: os.environ.get(nome) for nome in ambiente}
+        os.environ.update(ambiente)
+        self.addCleanup(self.restaurar_ambiente, antigo)
+
+    def restaurar_ambiente(self, antigo):
+        for nome, valor in antigo.items():
+            if valor is None:
+                os.environ.pop(nome, None)
+            else:
+                os.environ[nome] = valor
+
+    def executar(self):
+        automacao = benchmark.criar_fabrica("http")(usar_cache_sessao=False)
+        automacao.metricas = RegistroTempos(diretorio=None)
+        automacao.ritmo = PoliticaRitmo(espera_base=0.01)
+        return automacao.executar("usuario", "senha", self.pasta)
+
+    def documentos(self):
+        return [
+            documento["nome"]
+            for processo in self.servidor.estado.processos.values()
+            for documento in processo["documentos"]
+        ]
+
+    def diario(self):
+        conexao = sqlite3.connect(os.path.join(self.pasta, NOME_DIARIO))
+        self.addCleanup(conexao.close)
+        return conexao
+
+    def test_lote_conferido_na_arvore(self):
+        resumo = self.executar()
+        self.assertEqual((len(resumo.sucessos), len(resumo.falhas)), (6, 0))
+        self.assertEqual(len(self.documentos()), 6)
+        status = self.diario().execute("SELECT DISTINCT status FROM arquivos")
+        self.assertEqual(status.fetchall(), [(STATUS_CONFIRMADO,)])
+
+    def test_retomada_sem_envio_duplicado(self):
+        self.executar()
+        arquivos = sorted(os.listdir(self.pasta))
+        arquivos.remove(NOME_DIARIO)
+        presente, perdido, interrompido = arquivos[0], arquivos[3], arquivos[4]
+        # O lote anterior parou antes da conferência: um envio está no SEI,
+        # outro não chegou a ser salvo e o último parou no meio
+        diario = self.diario()
+        diario.execute(
+            "UPDATE arquivos SET status = ? WHERE arquivo IN (?, ?)",
+            (STATUS_ENVIADO, presente, perdido),
+        )
+        diario.execute(
+            "UPDATE arquivos SET status = 'em_andamento' WHERE arquivo = ?",
+            (interrompido,),
+        )
+        diario.commit()
+        for processo in self.servidor.estado.processos.values():
+            processo["documentos"] = [
+                d
+                for d in processo["documentos"]
+                if d["nome"] + ".pdf" not in (perdido, interrompido)
+            ]
+        # Cópia com o mesmo conteúdo de um arquivo já enviado
+        shutil.copy(
+            os.path.join(self.pasta, arquivos[1]),
+            os.path.join(self.pasta, "00099.2024.pdf"),
+        )
+
+        resumo = self.executar()
+        self.assertEqual((len(resumo.sucessos), len(resumo.falhas)), (3, 0))
+        self.assertEqual(len(resumo.ignorados), 4)
+        documentos = self.documentos()
+        self.assertEqual(len(documentos), 6)
+        self.assertEqual([n for n, k in Counter(documentos).items() if k > 1], [])
+        linhas = dict(
+            (arquivo, (status, tentativas))
+            for arquivo, status, tentativas in diario.execute(
+                "SELECT arquivo, status, tentativas FROM arquivos"
+            )
+        )
+        # O que já estava no SEI foi só conferido; os outros, reenviados
+        self.assertEqual(linhas[presente], (STATUS_CONFIRMADO, 1))
+        self.assertEqual(linhas[perdido], (STATUS_CONFIRMADO, 2))
+        self.assertEqual(linhas[interrompido], (STATUS_CONFIRMADO, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
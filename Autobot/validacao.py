@@ -0,0 +1,101 @@
+"""
+Validação prévia dos arquivos do lote, feita antes de abrir o navegador:
+número do processo no nome, PDF legível, tamanho dentro do limite do SEI e
+nomes repetidos. Roda num pool de processos para lotes grandes.
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from config import padrao_processo, tamanho_maximo_mb
+from lote import processo_do_arquivo
+
+
+# Abaixo disso o custo de subir os processos supera o ganho
+MINIMO_PARA_PARALELO = 16
+
+# O SEI aceita o cabeçalho em qualquer ponto do primeiro KB e o %%EOF
+# seguido de alguns bytes de lixo no final
+BYTES_CABECALHO = 1024
+BYTES_FINAL = 2048
+
+
+def validar_arquivo(caminho, padrao, tamanho_maximo):
+    """Retorna o motivo da rejeição do arquivo ou None se ele estiver válido."""
+    arquivo = os.path.basename(caminho)
+    processo = processo_do_arquivo(arquivo)
+    if not re.fullmatch(padrao, processo):
+        return f"nome não corresponde a um número de processo ({processo})"
+
+    try:
+        tamanho = os.path.getsize(caminho)
+        if tamanho == 0:
+            return "arquivo vazio"
+        if tamanho > tamanho_maximo:
+            return (
+                f"{tamanho / 1024 / 1024:.1f} MB, acima do limite de "
+                f"{tamanho_maximo / 1024 / 1024:.0f} MB do SEI"
+            )
+        with open(caminho, "rb") as pdf:
+            cabecalho = pdf.read(BYTES_CABECALHO)
+            pdf.seek(max(0, tamanho - BYTES_FINAL))
+            final = pdf.read()
+    except OSError as e:
+        return f"não foi possível ler o arquivo ({e.strerror or e})"
+
+    if b"%PDF-" not in cabecalho:
+        return "não é um PDF (cabeçalho %PDF ausente)"
+    if b"%%EOF" not in final:
+        return "PDF incompleto ou corrompido (marcador %%EOF ausente)"
+    return None
+
+
+def _nomes_repetidos(arquivos):
+    """Arquivos cujo nome só difere de outro do lote pela caixa (.pdf / .PDF)."""
+    vistos = {}
+    repetidos = []
+    # Entre nomes repetidos fica o de extensão .pdf minúscula
+    for arquivo in sorted(arquivos, key=lambda a: (a.lower(), not a.endswith(".pdf"))):
+        chave = arquivo.lower()
+        if chave in vistos:
+            repetidos.append((arquivo, f"mesmo nome de {vistos[chave]}"))
+        else:
+            vistos[chave] = arquivo
+    return repetidos
+
+
+def validar_lote(diretorio, arquivos, max_processos=None):
+    """
+    Retorna (validos, rejeitados), com rejeitados como lista de
+    (arquivo, motivo). A ordem dos válidos é a mesma de arquivos.
+    """
+    repetidos = _nomes_repetidos(arquivos)
+    descartados = {arquivo for arquivo, _ in repetidos}
+    candidatos = [a for a in arquivos if a not in descartados]
+
+    padrao = padrao_processo()
+    tamanho_maximo = int(tamanho_maximo_mb() * 1024 * 1024)
+    caminhos = [os.path.join(diretorio, arquivo) for arquivo in candidatos]
+    parametros = ([padrao] * len(caminhos), [tamanho_maximo] * len(caminhos))
+
+    motivos = None
+    if len(caminhos) >= MINIMO_PARA_PARALELO:
+        try:
+            with ProcessPoolExecutor(max_workers=max_processos) as executor:
+                motivos = list(
+                    executor.map(validar_arquivo, caminhos, *parametros, chunksize=32)
+                )
+        except (OSError, RuntimeError):
+            # Sem suporte a processos (ambiente restrito): valida aqui mesmo
+            motivos = None
+    if motivos is None:
+        motivos = list(map(validar_arquivo, caminhos, *parametros))
+
+    validos, rejeitados = [], list(repetidos)
+    for arquivo, motivo in zip(candidatos, motivos):
+        if motivo:
+            rejeitados.append((arquivo, motivo))
+        else:
+            validos.append(arquivo)
+    return validos, rejeitados
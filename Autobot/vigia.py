@@ -0,0 +1,268 @@
+import os
+import sys
+import time
+import queue
+import select
+import struct
+import logging
+import threading
+
+from lote import ControleExecucao, ResumoExecucao, aplicar_validacao
+from diario import NOME_DIARIO, DiarioLote
+from metricas import RegistroTempos
+from ritmo import ritmo_da_execucao
+
+
+# Eventos do inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENTO = struct.Struct("iIII")
+
+
+def _eh_pdf(nome):
+    return nome.lower().endswith(".pdf") and nome != NOME_DIARIO
+
+
+class NotificacoesInotify:
+    """Avisos do kernel (Linux) sobre arquivos criados ou alterados na pasta."""
+
+    def __init__(self, diretorio):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        mascara = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        if libc.inotify_add_watch(self.fd, os.fsencode(diretorio), mascara) < 0:
+            erro = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(erro, f"inotify_add_watch falhou para {diretorio}")
+
+    def esperar(self, timeout):
+        """Nomes que tiveram algum evento, aguardando no máximo timeout segundos."""
+        prontos, _, _ = select.select([self.fd], [], [], timeout)
+        if not prontos:
+            return set()
+        try:
+            dados = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        nomes = set()
+        posicao = 0
+        while posicao + _EVENTO.size <= len(dados):
+            _, _, _, tamanho = _EVENTO.unpack_from(dados, posicao)
+            posicao += _EVENTO.size
+            nome = dados[posicao : posicao + tamanho].rstrip(b"\0")
+            posicao += tamanho
+            if nome:
+                nomes.add(os.fsdecode(nome))
+        return nomes
+
+    def fechar(self):
+        os.close(self.fd)
+
+
+class NotificacoesPolling:
+    """Alternativa sem inotify: compara o conteúdo da pasta a cada intervalo."""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.anteriores = {}
+
+    def esperar(self, timeout):
+        time.sleep(timeout)
+        atuais = {}
+        for nome in os.listdir(self.diretorio):
+            try:
+                info = os.stat(os.path.join(self.diretorio, nome))
+            except OSError:
+                continue
+            atuais[nome] = (info.st_size, info.st_mtime)
+        alterados = {
+            nome
+            for nome, assinatura in atuais.items()
+            if self.anteriores.get(nome) != assinatura
+        }
+        self.anteriores = atuais
+        return alterados
+
+    def fechar(self):
+        pass
+
+
+def criar_notificacoes(diretorio, logger=None):
+    logger = logger or logging.getLogger(__name__)
+    if sys.platform.startswith("linux"):
+        try:
+            return NotificacoesInotify(diretorio)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify indisponível ({e}); vigiando a pasta por varredura")
+    return NotificacoesPolling(diretorio)
+
+
+class VigiaPasta:
+    """
+    Modo contínuo: mantém uma sessão logada e envia cada PDF que chega na
+    pasta assim que ele para de ser gravado, até a execução ser cancelada.
+    Um arquivo só entra na fila depois de ficar `espera` segundos com o
+    mesmo tamanho e data de modificação.
+    """
+
+    def __init__(
+        self,
+        automacao,
+        diretorio,
+        espera=2.0,
+        intervalo=1.0,
+        usar_diario=True,
+        controle=None,
+        validar=True,
+    ):
+        self.automacao = automacao
+        self.diretorio = diretorio
+        self.espera = espera
+        self.intervalo = intervalo
+        self.usar_diario = usar_diario
+        self.validar = validar
+        self.controle = controle or ControleExecucao()
+        self.fila = queue.Queue()
+        self.logger = automacao.logger
+
+    def executar(self, usuario, senha, fechar_navegador=True):
+        automacao = self.automacao
+        proprias = automacao.metricas is None
+        if proprias:
+            automacao.metricas = RegistroTempos()
+        automacao.ritmo = ritmo_da_execucao(automacao.ritmo)
+        resumo = ResumoExecucao()
+        diario = DiarioLote(self.diretorio) if self.usar_diario else None
+        observador = threading.Thread(
+            target=self._observar, name="vigia", daemon=True
+        )
+        try:
+            with automacao.etapa("login"):
+                automacao.login(usuario, senha)
+            self.controle.iniciar(0)
+            observador.start()
+            self.logger.info(f"Vigiando {self.diretorio}; aguardando novos arquivos")
+            self._consumir(usuario, senha, diario, resumo)
+        finally:
+            # O observador para sozinho ao ver o cancelamento
+            self.controle.cancelar()
+            if observador.is_alive():
+                observador.join()
+            if diario:
+                diario.fechar()
+            resumo.somar(automacao.contadores())
+            resumo.somar(automacao.ritmo.contadores())
+            if proprias:
+                automacao.metricas.finalizar()
+                automacao.metricas = None
+            if fechar_navegador:
+                automacao.fechar()
+        self.logger.info(resumo.texto())
+        return resumo.finalizar()
+
+    def _consumir(self, usuario, senha, diario, resumo):
+        automacao = self.automacao
+        while not self.controle.cancelado:
+            try:
+                arquivo = self.fila.get(timeout=self.intervalo)
+            except queue.Empty:
+                continue
+
+            if self.validar and not aplicar_validacao(
+                self.diretorio, [arquivo], resumo, self.logger
+            ):
+                self.controle.concluido()
+                continue
+
+            if diario:
+                a_processar, ignorados = diario.filtrar([arquivo])
+                for ignorado, motivo in ignorados:
+                    self.logger.info(f"Ignorando {ignorado}: {motivo}")
+                    resumo.ignorar(ignorado, motivo)
+                if not a_processar:
+                    self.controle.concluido()
+                    continue
+
+            if not automacao.aguardar_vez(self.controle):
+                self.fila.put(arquivo)
+                break
+            self.controle.comecando(arquivo)
+            resultado = automacao.enviar_arquivo(self.diretorio, arquivo, diario)
+            resumo.adicionar(resultado)
+            # Não se sabe quando chega o próximo: confere cada envio na hora
+            automacao.aplicar_conferencia(resumo, diario)
+            self.controle.concluido()
+
+            if not resultado.sucesso:
+                # A sessão pode ter expirado durante o dia: confere antes do
+                # próximo arquivo, que de outra forma falharia também
+                try:
+                    with automacao.etapa("login"):
+                        automacao.login(usuario, senha)
+                except Exception as e:
+                    self.logger.error(f"Falha ao renovar a sessão: {str(e)}")
+                    raise
+
+        self.logger.warning("Vigia da pasta encerrada")
+        restantes = []
+        while not self.fila.empty():
+            restantes.append(self.fila.get_nowait())
+        if restantes:
+            resumo.cancelar(restantes)
+
+    def _observar(self):
+        """Recebe os avisos da pasta e enfileira os PDFs que ficaram estáveis."""
+        try:
+            notificacoes = criar_notificacoes(self.diretorio, self.logger)
+        except Exception as e:
+            self.logger.error(f"Não foi possível vigiar {self.diretorio}: {str(e)}")
+            self.controle.cancelar()
+            return
+
+        # nome -> (assinatura, momento em que ela foi vista pela primeira vez)
+        pendentes = {}
+        # nome -> assinatura com que o arquivo foi enfileirado
+        enfileirados = {}
+        candidatos = set(os.listdir(self.diretorio))
+        try:
+            while not self.controle.cancelado:
+                agora = time.monotonic()
+                for nome in candidatos | set(pendentes):
+                    if not _eh_pdf(nome):
+                        continue
+                    try:
+                        info = os.stat(os.path.join(self.diretorio, nome))
+                    except OSError:
+                        pendentes.pop(nome, None)
+                        continue
+                    assinatura = (info.st_size, info.st_mtime)
+                    if enfileirados.get(nome) == assinatura:
+                        continue
+                    anterior = pendentes.get(nome)
+                    if anterior is None or anterior[0] != assinatura:
+                        pendentes[nome] = (assinatura, agora)
+                    elif info.st_size and agora - anterior[1] >= self.espera:
+                        del pendentes[nome]
+                        enfileirados[nome] = assinatura
+                        self.logger.info(f"Novo arquivo na fila: {nome}")
+                        self.controle.adicionar()
+                        self.fila.put(nome)
+
+                # Com arquivos pendentes, volta a conferi-los mesmo sem eventos
+                timeout = min(self.intervalo, self.espera / 2) if pendentes else self.intervalo
+                candidatos = notificacoes.esperar(timeout)
+        except Exception as e:
+            self.logger.error(f"Erro ao vigiar a pasta: {str(e)}", exc_info=True)
+            self.controle.cancelar()
+        finally:
+            notificacoes.fechar()